@@ -1,20 +1,62 @@
 # analytics_service.py
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 import logging
 from database_service import DatabaseService
-import plotly.graph_objs as go
-import plotly.utils
-import json
+import chart_specs
+import profiling_service
+from profiling_service import profiled
+from response_encoding import compact_chart
+from hot_cache_service import HotSalesCache, SalesView, live_ranges
+from forecast_service import ForecastState, HISTORY_DAYS, MIN_SALES_DAYS, forecast_summary
+from downsampling import downsample
+from distinct_sketch import HyperLogLog
 
 logger = logging.getLogger(__name__)
 
+TREND_GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Longest series /api/sales/trend returns before downsampling
+TREND_MAX_POINTS = int(os.getenv('TREND_MAX_POINTS', 500))
+_TREND_LABELS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-%m-%d', 'month': '%Y-%m'}
+
+
+
+def _sketch_metrics(entry: Optional[Dict]) -> Dict:
+    """calculate_daily_sales metrics from a merged 'all' sketch entry (distinct invoices are estimated)"""
+    if not entry:
+        return {'total_revenue': 0, 'total_transactions': 0, 'average_transaction': 0, 'items_sold': 0}
+    transactions = entry['invoices'].count()
+    return {
+        'total_revenue': entry['revenue'],
+        'total_transactions': transactions,
+        'average_transaction': entry['revenue'] / transactions if transactions else 0,
+        'items_sold': int(entry['quantity'])
+    }
+
+
+def _top_sketch_items(entries: Dict[str, Dict], limit: int) -> List[Dict]:
+    """get_top_items rows from merged 'item' sketch entries"""
+    ranked = sorted(entries.items(), key=lambda pair: pair[1]['revenue'], reverse=True)[:limit]
+    return [
+        {
+            'item_number': item_number,
+            'description': entry['description'],
+            'quantity_sold': entry['quantity'],
+            'revenue': entry['revenue'],
+            'transactions': entry['invoices'].count()
+        }
+        for item_number, entry in ranked
+    ]
+
 class AnalyticsService:
-    def __init__(self):
-        self.db_service = DatabaseService()
+    def __init__(self, db_service: Optional[DatabaseService] = None):
+        self.db_service = db_service or DatabaseService()
+        self.hot_cache = HotSalesCache(self.db_service)
     
+    @profiled('analytics')
     def calculate_daily_sales(self, sales_data: List[Dict]) -> Dict:
         """Calculate daily sales metrics"""
         if not sales_data:
@@ -34,6 +76,7 @@ class AnalyticsService:
             'items_sold': int(df['quantity'].sum())
         }
     
+    @profiled('analytics')
     def get_top_items(self, sales_data: List[Dict], limit: int = 10) -> List[Dict]:
         """Get top selling items by revenue"""
         if not sales_data:
@@ -55,16 +98,159 @@ class AnalyticsService:
         
         return top_items.to_dict('records')
     
-    def calculate_demand_forecast(self, item_number: str, days_history: int = 365) -> Dict:
+    @profiled('analytics')
+    def summarize_period(self, view: SalesView, start_date: date, end_date: date,
+                         live_sales: List[Dict] = None, limit: int = 5, branch: Optional[str] = None) -> Dict:
+        """Sales metrics and top items for a period from the hot cache, with live line items
+        for the days not yet stored (see SalesView.live_ranges) merged in"""
+        stored = view.summary(start_date, end_date, branch)
+        live = self.calculate_daily_sales(live_sales or [])
+        
+        revenue = stored['total_revenue'] + live['total_revenue']
+        transactions = stored['total_transactions'] + live['total_transactions']
+        summary = {
+            'total_revenue': revenue,
+            'total_transactions': transactions,
+            'average_transaction': revenue / transactions if transactions else 0,
+            'items_sold': stored['items_sold'] + live['items_sold']
+        }
+        
+        if not live_sales:
+            return {'summary': summary, 'top_items': view.top_items(start_date, end_date, limit, branch)}
+        
+        # Fold the live lines into the cached per-item totals before ranking
+        totals = {name: values.copy() for name, values in view.item_totals(start_date, end_date, branch).items()}
+        extra = {}
+        for item in self.get_top_items(live_sales, limit=len(live_sales)):
+            code = view.items.code(item['item_number'])
+            if code is not None and code < len(totals['revenue']):
+                totals['revenue'][code] += item['revenue']
+                totals['quantity'][code] += item['quantity_sold']
+                totals['transactions'][code] += item['transactions']
+            else:
+                extra[item['item_number']] = item
+        
+        sold = np.flatnonzero(totals['transactions'])
+        sold = sold[np.argsort(-totals['revenue'][sold], kind='stable')][:limit]
+        top_items = [
+            {
+                'item_number': view.items[code],
+                'description': view.item_descriptions[code],
+                'quantity_sold': float(totals['quantity'][code]),
+                'revenue': float(totals['revenue'][code]),
+                'transactions': int(totals['transactions'][code])
+            }
+            for code in sold
+        ] + list(extra.values())
+        top_items.sort(key=lambda item: item['revenue'], reverse=True)
+        return {'summary': summary, 'top_items': top_items[:limit]}
+    
+    @profiled('analytics')
+    def summarize_sketches(self, start_date: date, end_date: date, live_sales: List[Dict] = None,
+                           limit: int = 5) -> Dict:
+        """Approximate summarize_period from the stored daily sketches, with live line items
+        for days not stored yet merged in. Distinct invoice counts carry the sketch error
+        (see distinct_sketch); revenue and quantities are exact."""
+        # Only ingested days have sketches, so the live days are never counted twice
+        total = self.db_service.get_sales_sketches('all', start_date, end_date).get('')
+        items = self.db_service.get_sales_sketches('item', start_date, end_date)
+        total = total or {'revenue': 0.0, 'quantity': 0.0, 'invoices': HyperLogLog()}
+        
+        if live_sales:
+            df = pd.DataFrame(live_sales)
+            total['revenue'] += float(df['extended_price'].sum())
+            total['quantity'] += float(df['quantity'].sum())
+            total['invoices'].update(HyperLogLog.of(df['invoice_id']))
+            for item_number, lines in df.groupby('item_number'):
+                entry = items.setdefault(item_number, {
+                    'revenue': 0.0, 'quantity': 0.0, 'invoices': HyperLogLog(),
+                    'description': lines['description'].iloc[0]
+                })
+                entry['revenue'] += float(lines['extended_price'].sum())
+                entry['quantity'] += float(lines['quantity'].sum())
+                entry['invoices'].update(HyperLogLog.of(lines['invoice_id']))
+        
+        return {'summary': _sketch_metrics(total), 'top_items': _top_sketch_items(items, limit)}
+    
+    def live_ranges(self, view: Optional[SalesView], start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        """Runs of days in a period that are not stored yet and have to come from ECI"""
+        if view is not None:
+            return view.live_ranges(start_date, end_date)
+        return live_ranges(self.db_service.get_stored_days(start_date, end_date), start_date, end_date)
+    
+    @profiled('analytics')
+    def get_sales_trend(self, view: Optional[SalesView], start_date: date, end_date: date,
+                        live_sales: List[Dict] = None, branch: Optional[str] = None, granularity: str = 'day',
+                        max_points: int = TREND_MAX_POINTS, downsample_mode: str = 'lttb') -> Dict:
+        """Revenue per hour, day, week or month, zero-filled, with live line items merged in.
+
+        Stored sales are read from the hot cache when a view is given and
+        from a SQL aggregate otherwise, in both cases for ingested days only
+        (the live days are in live_sales). Weeks start on Monday. A series longer
+        than max_points is downsampled (see downsampling).
+        """
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
+        hourly = granularity == 'hour'
+        slots_per_day = 24 if hourly else 1
+        slots = ((end_date - start_date).days + 1) * slots_per_day
+        index = pd.date_range(start_date, periods=slots, freq=pd.Timedelta(hours=24 // slots_per_day))
+        
+        if view is not None:
+            sales = view.revenue_by_hour(start_date, end_date, branch) if hourly else view.daily_revenue(start_date, end_date, branch)
+        else:
+            sales = np.zeros(slots)
+            rows = self.db_service.get_revenue_series(start_date, end_date, hourly, branch)
+            if rows:
+                stored_days = self.db_service.get_stored_days(start_date, end_date)
+                buckets, revenue = zip(*rows)
+                buckets = pd.DatetimeIndex(buckets)
+                positions = index.get_indexer(buckets)
+                valid = (positions >= 0) & np.isin(buckets.date, list(stored_days))
+                np.add.at(sales, positions[valid], np.asarray(revenue)[valid])
+        for sale in live_sales or []:
+            offset = (sale['invoice_date'].date() - start_date).days * slots_per_day
+            offset += sale['invoice_date'].hour if hourly else 0
+            if 0 <= offset < len(sales):
+                sales[offset] += sale['extended_price']
+        
+        series = pd.Series(sales, index=index)
+        if granularity in ('week', 'month'):
+            series = series.groupby(index.to_period('W' if granularity == 'week' else 'M')).sum()
+            labels = series.index.start_time.strftime(_TREND_LABELS[granularity])
+        else:
+            labels = index.strftime(_TREND_LABELS[granularity])
+        values = series.values
+        keep = downsample(values, max_points, downsample_mode)
+        return {
+            'dates': labels[keep].tolist(),
+            'sales': values[keep].tolist(),
+            'granularity': granularity,
+            'total_points': len(values),
+            'downsampled': downsample_mode if len(keep) < len(values) else None
+        }
+    
+    @profiled('analytics')
+    def calculate_demand_forecast(self, item_number: str, days_history: int = 365,
+                                  chart_format: str = 'plotly', precision: int = None) -> Dict:
         """Calculate demand forecast for an item using moving averages and trend analysis"""
         try:
-            # Get historical sales data from database
-            sales_history = self.db_service.get_item_sales_history(item_number, days_history)
-            
-            if not sales_history or len(sales_history) < 7:  # Need at least 7 days
+            # Running per-item state maintained at ingestion; raw history is only read
+            # for custom history lengths or before the states have been built
+            state = None
+            if days_history == HISTORY_DAYS:
+                with profiling_service.span('forecast.load_state', 'analytics'):
+                    state = self.db_service.get_forecast_state(item_number)
+            if state is None:
+                with profiling_service.span('forecast.load_history', 'analytics'):
+                    sales_history = self.db_service.get_item_sales_history(item_number, days_history)
+                    state = self._forecast_state_from_history(sales_history)
+            
+            if state is None or state.sales_days < MIN_SALES_DAYS:
+                sales_days = state.sales_days if state is not None else 0
                 return {
                     'item_number': item_number,
-                    'message': f'Insufficient data. Found {len(sales_history)} sales records. Need at least 7 days of history.',
+                    'message': f'Insufficient data. Found {sales_days} days with sales. Need at least 7 days of history.',
                     'current_metrics': {
                         'avg_daily_demand': 0,
                         'avg_weekly_demand': 0,
@@ -83,78 +269,33 @@ class AnalyticsService:
                     }
                 }
             
-            # Convert to DataFrame
-            df = pd.DataFrame(sales_history)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.set_index('date')
-            
-            # Resample to daily data (fill missing days with 0)
-            daily_sales = df['quantity'].resample('D').sum().fillna(0)
-            
-            # Calculate moving averages
-            ma_7 = daily_sales.rolling(window=7).mean()
-            ma_30 = daily_sales.rolling(window=30).mean()
-            ma_90 = daily_sales.rolling(window=90).mean()
-            
-            # Calculate trend
-            if len(daily_sales) >= 30:
-                # Use linear regression for trend
-                x = np.arange(len(daily_sales))
-                y = daily_sales.values
-                
-                # Remove zeros for better trend calculation
-                mask = y > 0
-                if mask.sum() > 10:  # Need at least 10 non-zero days
-                    x_filtered = x[mask]
-                    y_filtered = y[mask]
-                    
-                    # Calculate trend
-                    z = np.polyfit(x_filtered, y_filtered, 1)
-                    trend_slope = z[0]
-                else:
-                    trend_slope = 0
-            else:
-                trend_slope = 0
-            
-            # Calculate seasonality (day of week patterns)
-            dow_pattern = daily_sales.groupby(daily_sales.index.dayofweek).mean()
+            with profiling_service.span('forecast.trend', 'analytics'):
+                # Regression over non-zero days and weekday means come from the running sums
+                trend_slope = state.trend_slope()
+                dow_pattern = state.day_of_week_pattern()
             
             # Current metrics
-            current_avg_daily = float(ma_7.iloc[-1]) if not ma_7.empty and not np.isnan(ma_7.iloc[-1]) else 0
-            current_avg_weekly = current_avg_daily * 7
-            current_avg_monthly = float(ma_30.iloc[-1]) * 30 if not ma_30.empty and not np.isnan(ma_30.iloc[-1]) else 0
-            
-            # Forecast next 30 days
-            forecast_30_days = current_avg_daily * 30 * (1 + trend_slope * 0.1)  # Adjust for trend
-            
-            # Calculate reorder point (7-day lead time + safety stock)
-            lead_time_demand = current_avg_daily * 7
-            safety_stock = current_avg_daily * 3  # 3 days safety stock
-            reorder_point = lead_time_demand + safety_stock
+            current_avg_daily = state.window_sums[7] / 7 if state.span_days >= 7 else 0
+            current_avg_monthly = state.window_sums[30] if state.span_days >= 30 else 0
             
             # Create visualization data
-            chart_data = self._create_forecast_chart(daily_sales, ma_7, ma_30, ma_90)
+            with profiling_service.span('forecast.chart', 'analytics'):
+                daily_sales = pd.Series(
+                    state.daily_series(),
+                    index=pd.date_range(end=pd.Timestamp(state.as_of), periods=state.span_days, freq='D')
+                )
+                ma_7 = daily_sales.rolling(window=7).mean()
+                ma_30 = daily_sales.rolling(window=30).mean()
+                ma_90 = daily_sales.rolling(window=90).mean()
+                chart_data = self._create_forecast_chart(daily_sales, ma_7, ma_30, ma_90,
+                                                         chart_format=chart_format, precision=precision)
             
             return {
                 'item_number': item_number,
-                'current_metrics': {
-                    'avg_daily_demand': round(current_avg_daily, 2),
-                    'avg_weekly_demand': round(current_avg_weekly, 2),
-                    'avg_monthly_demand': round(current_avg_monthly, 2)
-                },
-                'forecast': {
-                    'next_7_days': round(current_avg_daily * 7, 2),
-                    'next_30_days': round(forecast_30_days, 2),
-                    'trend': 'increasing' if trend_slope > 0.1 else 'decreasing' if trend_slope < -0.1 else 'stable',
-                    'trend_percentage': round(trend_slope * 100, 2)
-                },
-                'inventory_planning': {
-                    'reorder_point': round(reorder_point, 0),
-                    'safety_stock': round(safety_stock, 0),
-                    'lead_time_demand': round(lead_time_demand, 0)
-                },
+                **forecast_summary(current_avg_daily, current_avg_monthly, trend_slope,
+                                   self.db_service.get_item_lead_time(item_number)),
                 'seasonality': {
-                    'day_of_week_pattern': dow_pattern.to_dict()
+                    'day_of_week_pattern': dow_pattern
                 },
                 'chart_data': chart_data
             }
@@ -167,11 +308,100 @@ class AnalyticsService:
                 'message': 'Error calculating forecast. Please check the item number and try again.'
             }
     
-    def get_sales_by_brand(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get sales aggregated by brand/vendor"""
+    def _forecast_state_from_history(self, sales_history: List[Dict]) -> Optional[ForecastState]:
+        """Build a forecast state ending at the item's last sale from raw history rows"""
+        if not sales_history:
+            return None
+        daily = {}
+        for sale in sales_history:
+            sale_date = pd.Timestamp(sale['date']).date()
+            daily[sale_date] = daily.get(sale_date, 0.0) + (sale['quantity'] or 0)
+        state = ForecastState(min(daily))
+        for sale_date in sorted(daily):
+            state.add(sale_date, daily[sale_date])
+        return state
+    
+    @profiled('analytics')
+    def get_customer_sales(self, account_number: str, start_date: date, end_date: date,
+                           today_sales: List[Dict] = None, limit: int = 10) -> Dict:
+        """Get customer sales from stored history, with today's live line items merged in.
+        
+        Closed days (start_date to the day before end_date) come from the database;
+        today_sales are the customer's line items for end_date fetched from ECI.
+        """
         try:
+            stored_end = end_date - timedelta(days=1)
+            item_rows = self.db_service.get_customer_item_sales(account_number, start_date, stored_end)
+            totals = self.db_service.get_customer_totals(account_number, start_date, stored_end)
+            
+            # Merge today's live line items into the stored aggregates
+            item_sales = {row['item_number']: row for row in item_rows}
+            today_invoices = set()
+            for sale in today_sales or []:
+                row = item_sales.setdefault(sale['item_number'], {
+                    'item_number': sale['item_number'],
+                    'description': sale['description'],
+                    'quantity': 0,
+                    'revenue': 0,
+                    'transactions': 0
+                })
+                row['quantity'] += sale['quantity']
+                row['revenue'] += sale['extended_price']
+                row['transactions'] += 1
+                totals['revenue'] += sale['extended_price']
+                totals['quantity'] += sale['quantity']
+                today_invoices.add(sale['invoice_id'])
+            totals['transactions'] += len(today_invoices)
+            
+            # Compare against the previous period of the same length
+            period_days = (end_date - start_date).days + 1
+            prev_end = start_date - timedelta(days=1)
+            prev_start = prev_end - timedelta(days=period_days - 1)
+            prev_totals = self.db_service.get_customer_totals(account_number, prev_start, prev_end)
+            
+            revenue_change = ((totals['revenue'] - prev_totals['revenue']) /
+                              prev_totals['revenue'] * 100) if prev_totals['revenue'] > 0 else 0
+            
+            top_items = sorted(item_sales.values(), key=lambda x: x['revenue'], reverse=True)[:limit]
+            
+            return {
+                'account_number': account_number,
+                'period': f"{start_date} to {end_date}",
+                'total_revenue': round(totals['revenue'], 2),
+                'total_quantity': totals['quantity'],
+                'transactions': totals['transactions'],
+                'total_items': len(item_sales),
+                'top_items': top_items,
+                'comparison': {
+                    'previous_period': f"{prev_start} to {prev_end}",
+                    'previous_revenue': round(prev_totals['revenue'], 2),
+                    'previous_transactions': prev_totals['transactions'],
+                    'revenue_change_percentage': round(revenue_change, 2)
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting customer sales: {str(e)}")
+            raise
+    
+    @profiled('analytics')
+    def get_sales_by_brand(self, start_date: date, end_date: date, branch: Optional[str] = None,
+                           approx: bool = False) -> List[Dict]:
+        """Get sales aggregated by brand/vendor, optionally for one branch.
+
+        With approx the stored daily vendor sketches are merged instead of
+        reading raw rows; unique_items and transactions are then estimates.
+        """
+        try:
+            if approx:
+                return self._brand_summary_from_sketches(start_date, end_date)
+            
+            view = self.hot_cache.view(start_date)
+            if view is not None:
+                return view.brand_summary(start_date, end_date, branch)
+            
             # Get sales data with vendor information
-            sales_data = self.db_service.get_sales_by_vendor(start_date, end_date)
+            sales_data = self.db_service.get_sales_by_vendor(start_date, end_date, branch)
             
             if not sales_data:
                 return []
@@ -201,24 +431,97 @@ class AnalyticsService:
             logger.error(f"Error getting sales by brand: {str(e)}")
             return []
     
-    def generate_daily_report(self, report_date: str) -> Dict:
-        """Generate comprehensive daily report"""
+    def _brand_summary_from_sketches(self, start_date: date, end_date: date) -> List[Dict]:
+        vendors = self.db_service.get_sales_sketches('vendor', start_date, end_date)
+        total_revenue = sum(entry['revenue'] for entry in vendors.values())
+        brand_summary = [
+            {
+                'brand': vendor or 'Unknown',
+                'units_sold': entry['quantity'],
+                'revenue': entry['revenue'],
+                'unique_items': entry['items'].count(),
+                'transactions': entry['invoices'].count(),
+                'revenue_percentage': round(entry['revenue'] / total_revenue * 100, 2) if total_revenue else 0
+            }
+            for vendor, entry in vendors.items()
+        ]
+        brand_summary.sort(key=lambda brand: brand['revenue'], reverse=True)
+        return brand_summary
+    
+    @profiled('analytics')
+    def generate_daily_report(self, report_date: str, branch: Optional[str] = None, approx: bool = False,
+                              use_hot_cache: bool = True) -> Dict:
+        """Generate comprehensive daily report, company-wide or for one branch.
+
+        With approx every figure comes from the stored daily sketches, so no
+        sales rows are read: distinct counts are estimates and the hourly
+        chart is omitted (sketches are kept per day). Without use_hot_cache
+        the sales rows are read from the database even when the hot cache
+        covers the day.
+        """
         try:
             date_obj = datetime.strptime(report_date, '%Y-%m-%d').date()
+            prev_date = date_obj - timedelta(days=1)
             
             # Get various metrics
-            sales_data = self.db_service.get_daily_sales_data(date_obj)
-            inventory_alerts = self.db_service.get_low_inventory_items()
-            top_customers = self.db_service.get_top_customers_by_date(date_obj, limit=10)
-            
-            # Calculate metrics
-            daily_metrics = self.calculate_daily_sales(sales_data)
-            top_items = self.get_top_items(sales_data, limit=10)
-            
-            # Compare to previous period
-            prev_date = date_obj - timedelta(days=1)
-            prev_sales_data = self.db_service.get_daily_sales_data(prev_date)
-            prev_metrics = self.calculate_daily_sales(prev_sales_data)
+            with profiling_service.span('report.load', 'analytics'):
+                inventory_alerts = self.db_service.get_low_inventory_items(branch=branch)
+                if not approx:
+                    top_customers = self.db_service.get_top_customers_by_date(date_obj, limit=10, branch=branch)
+            
+            view = self.hot_cache.view(prev_date) if use_hot_cache and not approx else None
+            if approx:
+                with profiling_service.span('report.load', 'analytics'):
+                    daily_metrics = _sketch_metrics(self.db_service.get_sales_sketches('all', date_obj, date_obj).get(''))
+                    prev_metrics = _sketch_metrics(self.db_service.get_sales_sketches('all', prev_date, prev_date).get(''))
+                    items = self.db_service.get_sales_sketches('item', date_obj, date_obj)
+                    accounts = self.db_service.get_sales_sketches('account', date_obj, date_obj)
+                top_items = _top_sketch_items(items, limit=10)
+                top_customers = [
+                    {
+                        'account_number': account_number,
+                        'total_revenue': entry['revenue'],
+                        'transactions': entry['invoices'].count()
+                    }
+                    for account_number, entry in sorted(
+                        accounts.items(), key=lambda pair: pair[1]['revenue'], reverse=True
+                    )[:10]
+                ]
+                descriptions = {}
+                for entry in items.values():
+                    descriptions[entry['description']] = descriptions.get(entry['description'], 0.0) + entry['revenue']
+                charts = {
+                    'hourly_sales': None,
+                    'category_breakdown': self._pie_chart(
+                        sorted(descriptions.items(), key=lambda pair: pair[1], reverse=True)[:10]
+                    )
+                }
+            elif view is not None:
+                # Both days are in the hot cache: aggregate the columns directly
+                daily_metrics = view.summary(date_obj, date_obj, branch)
+                top_items = view.top_items(date_obj, date_obj, limit=10, branch=branch)
+                prev_metrics = view.summary(prev_date, prev_date, branch)
+                hourly_revenue = view.hourly_revenue(date_obj, date_obj, branch)
+                hours = np.flatnonzero(hourly_revenue)
+                charts = {
+                    'hourly_sales': self._bar_chart(hours, hourly_revenue[hours]) if len(hours) else None,
+                    'category_breakdown': self._pie_chart(
+                        view.description_revenue(date_obj, date_obj, limit=10, branch=branch)
+                    )
+                }
+            else:
+                with profiling_service.span('report.load', 'analytics'):
+                    sales_data = self.db_service.get_daily_sales_data(date_obj, branch)
+                    prev_sales_data = self.db_service.get_daily_sales_data(prev_date, branch)
+                
+                # Calculate metrics
+                daily_metrics = self.calculate_daily_sales(sales_data)
+                top_items = self.get_top_items(sales_data, limit=10)
+                prev_metrics = self.calculate_daily_sales(prev_sales_data)
+                charts = {
+                    'hourly_sales': self._get_hourly_sales_chart(sales_data),
+                    'category_breakdown': self._get_category_breakdown_chart(sales_data)
+                }
             
             # Calculate changes
             revenue_change = ((daily_metrics['total_revenue'] - prev_metrics['total_revenue']) / 
@@ -226,6 +529,8 @@ class AnalyticsService:
             
             return {
                 'report_date': report_date,
+                'branch': branch,
+                'approximate': approx,
                 'summary': {
                     'total_revenue': daily_metrics['total_revenue'],
                     'total_transactions': daily_metrics['total_transactions'],
@@ -236,60 +541,205 @@ class AnalyticsService:
                 'top_selling_items': top_items,
                 'inventory_alerts': inventory_alerts[:10],
                 'top_customers': top_customers,
-                'charts': {
-                    'hourly_sales': self._get_hourly_sales_chart(sales_data),
-                    'category_breakdown': self._get_category_breakdown_chart(sales_data)
-                }
+                'charts': charts
             }
             
         except Exception as e:
             logger.error(f"Error generating daily report: {str(e)}")
             return {'error': str(e)}
     
-    def _create_forecast_chart(self, daily_sales, ma_7, ma_30, ma_90):
+    def report_totals(self, sales_data: List[Dict]) -> Dict:
+        """Full per-item, per-customer, per-hour and per-description totals of one day's lines.
+
+        Stored next to each rendered report so range reports can merge days
+        exactly; every invoice belongs to one day, so per-day distinct
+        invoice counts add up.
+        """
+        if not sales_data:
+            return {'revenue': 0.0, 'transactions': 0, 'items_sold': 0, 'hourly': [0.0] * 24,
+                    'items': {}, 'customers': {}, 'categories': {}}
+        
+        df = pd.DataFrame(sales_data)
+        hours = pd.to_datetime(df['invoice_date']).dt.hour.values
+        items = df.groupby('item_number').agg(
+            description=('description', 'first'),
+            quantity=('quantity', 'sum'),
+            revenue=('extended_price', 'sum'),
+            transactions=('invoice_id', 'nunique')
+        )
+        customers = df.groupby('account_number').agg(
+            revenue=('extended_price', 'sum'),
+            transactions=('invoice_id', 'nunique')
+        )
+        return {
+            'revenue': float(df['extended_price'].sum()),
+            'transactions': int(df['invoice_id'].nunique()),
+            'items_sold': int(df['quantity'].sum()),
+            'hourly': np.bincount(hours, weights=df['extended_price'].values, minlength=24).tolist(),
+            'items': {
+                row.Index: [row.description, float(row.quantity), float(row.revenue), int(row.transactions)]
+                for row in items.itertuples()
+            },
+            'customers': {
+                row.Index: [float(row.revenue), int(row.transactions)]
+                for row in customers.itertuples()
+            },
+            'categories': {
+                description: float(revenue)
+                for description, revenue in df.groupby('description')['extended_price'].sum().items()
+            }
+        }
+    
+    def is_closed_day(self, day: date) -> bool:
+        """A day before today whose sales are ingested per the coverage ledger; its report
+        only changes if later ingestion adds rows, which drops the stored report"""
+        return day < date.today() and day in self.db_service.get_stored_days(day, day)
+    
+    def render_daily_report(self, report_date: date, branch: Optional[str] = None) -> Optional[Dict]:
+        """Compute a closed day's report and its totals once and store them"""
+        # Read from the primary, bypassing the hot cache: a report rendered from a lagging
+        # replica or a cache that has not seen the latest ingestion would be stored stale
+        with self.db_service.primary_reads():
+            report = self.generate_daily_report(report_date.isoformat(), branch, use_hot_cache=False)
+            if 'error' in report:
+                return None
+            totals = self.report_totals(self.db_service.get_daily_sales_data(report_date, branch))
+        self.db_service.store_daily_report(report_date, branch, report, totals)
+        return {'report': report, 'totals': totals}
+    
+    def materialize_daily_reports(self, start_date: date, end_date: date, branches: List[Optional[str]]) -> int:
+        """Render and store every closed day's report in the range not stored yet; returns how many.
+
+        Days missing from the coverage ledger (not ingested, or a gap) are skipped.
+        """
+        end_date = min(end_date, date.today() - timedelta(days=1))
+        if end_date < start_date:
+            return 0
+        with self.db_service.primary_reads():
+            closed = self.db_service.get_stored_days(start_date, end_date)
+        rendered = 0
+        for branch in branches:
+            stored = self.db_service.get_daily_reports(start_date, end_date, branch)
+            for day in sorted(closed):
+                if day not in stored and self.render_daily_report(day, branch):
+                    rendered += 1
+        return rendered
+    
+    @profiled('analytics')
+    def get_daily_report(self, report_date: str, branch: Optional[str] = None, approx: bool = False) -> Dict:
+        """Daily report for /api/reports/daily: closed days are served from the report store
+        (rendered on first request if the nightly job has not), today is computed on demand"""
+        try:
+            date_obj = datetime.strptime(report_date, '%Y-%m-%d').date()
+        except ValueError as e:
+            return {'error': str(e)}
+        if approx or not self.is_closed_day(date_obj):
+            return self.generate_daily_report(report_date, branch, approx)
+        stored = self.db_service.get_daily_reports(date_obj, date_obj, branch).get(date_obj)
+        if stored is None:
+            stored = self.render_daily_report(date_obj, branch)
+        return stored['report'] if stored else self.generate_daily_report(report_date, branch)
+    
+    @profiled('analytics')
+    def get_range_report(self, start_date: date, end_date: date, branch: Optional[str] = None) -> Dict:
+        """Report over closed days from start_date through end_date, merged from stored daily reports"""
+        through = min(end_date, date.today() - timedelta(days=1))
+        self.materialize_daily_reports(start_date, through, [branch])
+        stored = self.db_service.get_daily_reports(start_date, through, branch)
+        
+        hourly = np.zeros(24)
+        revenue, transactions, items_sold = 0.0, 0, 0
+        items, customers, categories = {}, {}, {}
+        daily_revenue = []
+        for day in sorted(stored):
+            totals = stored[day]['totals']
+            revenue += totals['revenue']
+            transactions += totals['transactions']
+            items_sold += totals['items_sold']
+            hourly += totals['hourly']
+            daily_revenue.append({'date': day.isoformat(), 'revenue': totals['revenue']})
+            for item_number, (description, quantity, item_revenue, item_transactions) in totals['items'].items():
+                merged = items.setdefault(item_number, [description, 0.0, 0.0, 0])
+                merged[1] += quantity
+                merged[2] += item_revenue
+                merged[3] += item_transactions
+            for account_number, (account_revenue, account_transactions) in totals['customers'].items():
+                merged = customers.setdefault(account_number, [0.0, 0])
+                merged[0] += account_revenue
+                merged[1] += account_transactions
+            for description, description_revenue in totals['categories'].items():
+                categories[description] = categories.get(description, 0.0) + description_revenue
+        
+        top_items = sorted(items.items(), key=lambda pair: pair[1][2], reverse=True)[:10]
+        top_customers = sorted(customers.items(), key=lambda pair: pair[1][0], reverse=True)[:10]
+        hours = np.flatnonzero(hourly)
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': through.isoformat(),
+            'branch': branch,
+            'days': len(stored),
+            'summary': {
+                'total_revenue': revenue,
+                'total_transactions': transactions,
+                'average_transaction': revenue / transactions if transactions else 0,
+                'items_sold': items_sold
+            },
+            'daily_revenue': daily_revenue,
+            'top_selling_items': [
+                {
+                    'item_number': item_number,
+                    'description': description,
+                    'quantity_sold': quantity,
+                    'revenue': item_revenue,
+                    'transactions': item_transactions
+                }
+                for item_number, (description, quantity, item_revenue, item_transactions) in top_items
+            ],
+            'top_customers': [
+                {'account_number': account_number, 'total_revenue': account_revenue, 'transactions': account_transactions}
+                for account_number, (account_revenue, account_transactions) in top_customers
+            ],
+            # Alerts as of the last closed day in the range
+            'inventory_alerts': stored[max(stored)]['report']['inventory_alerts'] if stored else [],
+            'charts': {
+                'hourly_sales': self._bar_chart(hours, hourly[hours]) if len(hours) else None,
+                'category_breakdown': self._pie_chart(
+                    sorted(categories.items(), key=lambda pair: pair[1], reverse=True)[:10]
+                )
+            }
+        }
+    
+    def _create_forecast_chart(self, daily_sales, ma_7, ma_30, ma_90,
+                               chart_format: str = 'plotly', precision: int = None):
         """Create forecast visualization data"""
         try:
+            series = [
+                ('Daily Sales', daily_sales, dict(color='lightgray', width=1)),
+                ('7-Day MA', ma_7, dict(color='blue', width=2)),
+                ('30-Day MA', ma_30, dict(color='green', width=2)),
+                ('90-Day MA', ma_90, dict(color='red', width=2))
+            ]
+            
+            if chart_format == 'compact':
+                # All four series share the daily index, so send the dates once
+                return compact_chart(daily_sales.index, [
+                    {'name': name, 'mode': 'lines', 'line': line, 'y': values.values}
+                    for name, values, line in series
+                ], precision=precision)
+            
             # Create traces
             traces = [
-                go.Scatter(
-                    x=daily_sales.index.tolist(),
-                    y=daily_sales.values.tolist(),
-                    mode='lines',
-                    name='Daily Sales',
-                    line=dict(color='lightgray', width=1)
-                ),
-                go.Scatter(
-                    x=ma_7.index.tolist(),
-                    y=ma_7.values.tolist(),
-                    mode='lines',
-                    name='7-Day MA',
-                    line=dict(color='blue', width=2)
-                ),
-                go.Scatter(
-                    x=ma_30.index.tolist(),
-                    y=ma_30.values.tolist(),
-                    mode='lines',
-                    name='30-Day MA',
-                    line=dict(color='green', width=2)
-                ),
-                go.Scatter(
-                    x=ma_90.index.tolist(),
-                    y=ma_90.values.tolist(),
-                    mode='lines',
-                    name='90-Day MA',
-                    line=dict(color='red', width=2)
-                )
+                chart_specs.scatter(values.index, values.values, mode='lines', name=name, line=line)
+                for name, values, line in series
             ]
             
-            # Convert to JSON
-            graphJSON = json.dumps(traces, cls=plotly.utils.PlotlyJSONEncoder)
-            
-            return graphJSON
+            return chart_specs.to_json(traces)
             
         except Exception as e:
             logger.error(f"Error creating forecast chart: {str(e)}")
             return None
     
+    @profiled('analytics')
     def _get_hourly_sales_chart(self, sales_data: List[Dict]) -> str:
         """Create hourly sales chart data"""
         try:
@@ -301,18 +751,13 @@ class AnalyticsService:
             
             hourly_sales = df.groupby('hour')['extended_price'].sum().reset_index()
             
-            trace = go.Bar(
-                x=hourly_sales['hour'].tolist(),
-                y=hourly_sales['extended_price'].tolist(),
-                marker=dict(color='blue')
-            )
-            
-            return json.dumps([trace], cls=plotly.utils.PlotlyJSONEncoder)
+            return self._bar_chart(hourly_sales['hour'].values, hourly_sales['extended_price'].values)
             
         except Exception as e:
             logger.error(f"Error creating hourly sales chart: {str(e)}")
             return None
     
+    @profiled('analytics')
     def _get_category_breakdown_chart(self, sales_data: List[Dict]) -> str:
         """Create category breakdown pie chart"""
         try:
@@ -324,13 +769,17 @@ class AnalyticsService:
             # Group by description (or you could use actual categories if available)
             category_sales = df.groupby('description')['extended_price'].sum().nlargest(10)
             
-            trace = go.Pie(
-                labels=category_sales.index.tolist(),
-                values=category_sales.values.tolist()
-            )
-            
-            return json.dumps([trace], cls=plotly.utils.PlotlyJSONEncoder)
+            return self._pie_chart(list(category_sales.items()))
             
         except Exception as e:
             logger.error(f"Error creating category breakdown chart: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+    
+    def _bar_chart(self, hours, revenue) -> str:
+        return chart_specs.to_json([chart_specs.bar(hours, revenue, marker=dict(color='blue'))])
+    
+    def _pie_chart(self, label_values: List[Tuple[str, float]]) -> str:
+        if not label_values:
+            return None
+        labels, values = zip(*label_values)
+        return chart_specs.to_json([chart_specs.pie(list(labels), list(values))])
\ No newline at end of file
@@ -6,18 +6,33 @@ import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, g, Response
 from flask_cors import CORS
 from flask_caching import Cache
+from flask_compress import Compress
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
+import time
+import math
+import json
+import base64
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # Import services
-from eci_api_service import ECIApiService
-from analytics_service import AnalyticsService
-from database_service import DatabaseService
+from eci_api_service import ECIApiService, ECIServiceError, ECI_BRANCHES, DEFAULT_BRANCH
+from analytics_service import AnalyticsService, TREND_GRANULARITIES, TREND_MAX_POINTS
+from database_service import DatabaseService, CUSTOMER_WINDOWS
+from item_search_service import ItemSearchIndex, SHORT_PREFIX_TOP
+from forecast_service import refresh_in_subprocess
+from reorder_service import ReorderEngine
+from response_encoding import negotiate_encoding, MSGPACK_MIMETYPE
+from downsampling import MODES as DOWNSAMPLE_MODES
+from distinct_sketch import RELATIVE_ERROR
+import metrics_service
+import profiling_service
+import cache_serializer
+from resilience_service import UpstreamGuard, UpstreamUnavailableError
 
 # Load environment variables
 load_dotenv()
@@ -28,34 +43,167 @@ CORS(app)
 
 # Configure caching
 cache = Cache(app, config={
-    'CACHE_TYPE': 'redis',
+    'CACHE_TYPE': os.getenv('CACHE_TYPE', 'redis'),
     'CACHE_REDIS_URL': os.getenv('REDIS_URL', 'redis://localhost:6379')
 })
 
+# Count cache hits/misses per endpoint; store entries as compressed msgpack (see cache_serializer)
+with app.app_context():
+    metrics_service.instrument_cache(cache.cache)
+    cache_codec = cache_serializer.install(cache.cache)
+
+# Seconds ECI sales lines for not-yet-stored days are shared between endpoints
+LIVE_SALES_CACHE_TIMEOUT = int(os.getenv('LIVE_SALES_CACHE_TIMEOUT', 120))
+
+# Configure response compression (brotli preferred, gzip fallback)
+app.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_MIMETYPES=['application/json', MSGPACK_MIMETYPE, 'text/html'],
+    COMPRESS_MIN_SIZE=int(os.getenv('COMPRESS_MIN_SIZE', 500))
+)
+Compress(app)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize services
+# Shared rate limit and circuit breaker across all workers (see resilience_service)
+eci_guard = UpstreamGuard.from_env('eci') if os.getenv('ECI_GUARD_ENABLED', 'true').lower() == 'true' else None
 eci_service = ECIApiService(
     endpoint=os.getenv('ECI_API_ENDPOINT'),
-    api_key=os.getenv('ECI_API_KEY')
+    api_key=os.getenv('ECI_API_KEY'),
+    guard=eci_guard
 )
-analytics_service = AnalyticsService()
+# One DatabaseService (and engine) shared by every service in the process
 db_service = DatabaseService(os.getenv('DATABASE_URL'))
+analytics_service = AnalyticsService(db_service)
+item_index = ItemSearchIndex(db_service)
+reorder_engine = ReorderEngine(db_service)
+
+# Days the nightly ingestion re-checks against ECI for late or edited invoices
+COVERAGE_LOOKBACK_DAYS = int(os.getenv('COVERAGE_LOOKBACK_DAYS', 7))
 
 # Initialize scheduler for background data collection
 scheduler = BackgroundScheduler()
 scheduler.start()
 
+# Registered after Compress so responses are re-encoded before compression
+@app.after_request
+def encode_response(response):
+    return negotiate_encoding(request, response)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    mode = profiling_service.requested_mode(request)
+    g.profile_requested = mode is not None
+    if mode or profiling_service.PROFILE_ALWAYS:
+        profiling_service.start(f'{request.method} {request.path}', mode or 'spans')
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        duration = time.perf_counter() - g.request_start
+        metrics_service.observe_route(
+            request.endpoint or 'unknown',
+            request.method,
+            response.status_code,
+            duration
+        )
+        
+        profile = profiling_service.finish()
+        if profile is not None:
+            response.headers['Server-Timing'] = profile.server_timing()
+            # Explicitly profiled requests are always kept; sampled ones only when slow
+            if g.profile_requested or duration * 1000 >= profiling_service.PROFILE_SLOW_MS:
+                try:
+                    response.headers['X-Profile-Id'] = profile.save()
+                except Exception as e:
+                    logger.error(f"Error saving request profile: {str(e)}")
+    return response
+
+@app.teardown_request
+def discard_request_profile(exc):
+    profiling_service.finish()
+
+@app.teardown_request
+def close_request_sessions(exc):
+    db_service.end_request()
+
+def is_cacheable(rv) -> bool:
+    """Only cache successful responses, so errors and degraded data are never served as real"""
+    status = rv[1] if isinstance(rv, tuple) else getattr(rv, 'status_code', 200)
+    return status == 200
+
+def degraded_response(error: Exception):
+    """Explicit 503 when ECI is failing, rate limited or returned incomplete data"""
+    logger.error(f"ECI unavailable, serving degraded response: {str(error)}")
+    retry_after = max(int(math.ceil(getattr(error, 'retry_after', 0) or 30)), 1)
+    response = jsonify({
+        'error': str(error),
+        'degraded': True,
+        'retry_after': retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 # Routes
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def get_live_sales(ranges, branch=None) -> list:
+    """ECI sales lines for the (first, last) day runs not stored yet, cached per run so the
+    dashboard's endpoints share one fetch"""
+    live_sales = []
+    for start_date, end_date in ranges:
+        key = f'live_sales:{start_date}:{end_date}:{branch or ""}'
+        try:
+            sales = cache.get(key)
+        except Exception as e:
+            logger.error(f"Error reading live sales from cache: {str(e)}")
+            sales = None
+        if sales is None:
+            sales = eci_service.get_daily_sales(start_date, end_date, branch=branch)
+            try:
+                cache.set(key, sales, timeout=LIVE_SALES_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Error caching live sales: {str(e)}")
+        live_sales.extend(sales)
+    return live_sales
+
+def parse_branch(value: str, allow_all: bool = False):
+    """Branch code from a query value; absent means no branch filter"""
+    if value in (None, ''):
+        return None
+    if value in ECI_BRANCHES or (allow_all and value == 'all'):
+        return value
+    choices = ', '.join(ECI_BRANCHES + (['all'] if allow_all else []))
+    raise ValueError(f"branch must be one of {choices}")
+
+def parse_approx(value: str, branch) -> bool:
+    """Approximate (sketch-based) mode flag; sketches are company-wide so it excludes a branch filter"""
+    approx = (value or '').lower() in ('1', 'true', 'yes')
+    if approx and branch:
+        raise ValueError("approx is not available for a single branch")
+    return approx
+
+def approximate_response(payload):
+    """JSON response flagged with the relative standard error of its distinct counts"""
+    response = jsonify(payload)
+    response.headers['X-Distinct-Count-Error'] = f'{RELATIVE_ERROR:.4f}'
+    return response
+
 @app.route('/api/dashboard/summary')
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(timeout=300, query_string=True, response_filter=is_cacheable)
 def dashboard_summary():
+    try:
+        branch = parse_branch(request.args.get('branch'))
+        approx = parse_approx(request.args.get('approx'), branch)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         # Get date parameters or default to last 7 days
         end_date = request.args.get('end_date')
@@ -71,71 +219,234 @@ def dashboard_summary():
         else:
             start_date = end_date - timedelta(days=7)
         
-        # Fetch data for the date range
-        sales_data = eci_service.get_daily_sales(start_date, end_date)
-        inventory_alerts = eci_service.get_inventory_alerts()
+        view = None if approx else analytics_service.hot_cache.view(start_date)
+        if approx:
+            # Stored days come from the merged daily sketches; ECI is only asked for days not ingested yet
+            live_sales = get_live_sales(analytics_service.live_ranges(None, start_date, end_date))
+            period = analytics_service.summarize_sketches(start_date, end_date, live_sales, limit=5)
+            sales_summary, top_items = period['summary'], period['top_items']
+        elif view is not None:
+            # Stored days come from the hot cache; ECI is only asked for days not ingested yet
+            live_sales = get_live_sales(view.live_ranges(start_date, end_date), branch)
+            period = analytics_service.summarize_period(view, start_date, end_date, live_sales, limit=5, branch=branch)
+            sales_summary, top_items = period['summary'], period['top_items']
+        else:
+            # Fetch data for the date range
+            sales_data = eci_service.get_daily_sales(start_date, end_date, branch=branch)
+            sales_summary = analytics_service.calculate_daily_sales(sales_data)
+            top_items = analytics_service.get_top_items(sales_data, limit=5)
+        inventory_alerts = db_service.count_inventory_alerts(branch or DEFAULT_BRANCH)
         
         summary = {
-            'today_sales': analytics_service.calculate_daily_sales(sales_data),
-            'inventory_alerts': len(inventory_alerts),
-            'top_selling_items': analytics_service.get_top_items(sales_data, limit=5),
+            'today_sales': sales_summary,
+            'inventory_alerts': inventory_alerts,
+            'top_selling_items': top_items,
             'last_updated': datetime.now().isoformat(),
-            'period_label': f'{start_date} to {end_date}'
+            'period_label': f'{start_date} to {end_date}',
+            'branch': branch,
+            'approximate': approx
         }
         
-        return jsonify(summary)
+        return approximate_response(summary) if approx else jsonify(summary)
+    except (ECIServiceError, UpstreamUnavailableError) as e:
+        return degraded_response(e)
     except Exception as e:
         logger.error(f"Error in dashboard summary: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def encode_cursor(sort: str, key) -> str:
+    """Opaque page cursor for a keyset (sort value, item_number)"""
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        cursor_sort, value, item_number = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ValueError('cursor belongs to a different sort')
+    return value, item_number
+
 @app.route('/api/inventory/alerts')
-@cache.cached(timeout=300)
+@cache.cached(timeout=300, query_string=True, response_filter=is_cacheable)
 def inventory_alerts():
     try:
-        alerts = eci_service.get_inventory_alerts()
-        return jsonify(alerts)
+        branch = parse_branch(request.args.get('branch'), allow_all=True) or DEFAULT_BRANCH
+        sort = request.args.get('sort', 'qty_available')
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor, sort) if cursor else None
+        page = db_service.get_inventory_alerts(
+            None if branch == 'all' else branch, sort, order == 'desc', after, limit,
+            search=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting inventory alerts: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'items': page['items'],
+        'next_cursor': encode_cursor(sort, page['next']) if page['next'] else None,
+        'branch': branch,
+        'sort': sort,
+        'order': order,
+        'limit': limit
+    })
+
+@app.route('/api/inventory/reorder')
+@cache.cached(timeout=300, query_string=True, response_filter=is_cacheable)
+def reorder_recommendations():
+    try:
+        sort = request.args.get('sort', 'days_of_supply')
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        status = request.args.get('status', 'reorder')
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        page = reorder_engine.recommendations(sort, order == 'desc', status, limit, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting reorder recommendations: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(dict(page, sort=sort, order=order, status=status, limit=limit, offset=offset))
+
+@app.route('/api/inventory/items/<item_number>')
+@cache.cached(timeout=300, response_filter=is_cacheable)
+def item_inventory(item_number):
+    try:
+        inventory = db_service.get_item_inventory(item_number)
+    except Exception as e:
+        logger.error(f"Error getting item inventory: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    if inventory is None:
+        return jsonify({'error': f'No inventory for item {item_number}'}), 404
+    return jsonify(inventory)
+
+@app.route('/api/branches')
+@cache.cached(timeout=300, response_filter=is_cacheable)
+def branches():
+    try:
+        totals = {row['branch']: row for row in db_service.get_branch_inventory_totals()}
+        return jsonify({
+            'branches': ECI_BRANCHES,
+            'inventory': [totals.get(branch, {'branch': branch, 'items': 0}) for branch in ECI_BRANCHES]
+        })
+    except Exception as e:
+        logger.error(f"Error getting branch totals: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/sales/by-customer')
+@cache.cached(timeout=120, query_string=True, response_filter=is_cacheable)
 def sales_by_customer():
     try:
         account_number = request.args.get('account_number')
+        if not account_number:
+            return jsonify({'error': 'account_number is required'}), 400
         days = int(request.args.get('days', 30))
         
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        sales_data = eci_service.get_customer_sales(
-            account_number, start_date, end_date
+        # History comes from the local store; only today's invoices are fetched from ECI
+        today_sales = eci_service.get_daily_sales(end_date, end_date, account_number=account_number)
+        sales_data = analytics_service.get_customer_sales(
+            account_number, start_date, end_date, today_sales
         )
         
         return jsonify(sales_data)
+    except (ECIServiceError, UpstreamUnavailableError) as e:
+        return degraded_response(e)
     except Exception as e:
         logger.error(f"Error getting customer sales: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/sales/by-brand')
-@cache.cached(timeout=3600)
+@cache.cached(timeout=3600, query_string=True, response_filter=is_cacheable)
 def sales_by_brand():
+    try:
+        branch = parse_branch(request.args.get('branch'))
+        approx = parse_approx(request.args.get('approx'), branch)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         days = int(request.args.get('days', 30))
         
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        brand_sales = analytics_service.get_sales_by_brand(start_date, end_date)
+        brand_sales = analytics_service.get_sales_by_brand(start_date, end_date, branch, approx)
         
-        return jsonify(brand_sales)
+        return approximate_response(brand_sales) if approx else jsonify(brand_sales)
     except Exception as e:
         logger.error(f"Error getting brand sales: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def parse_window(value: str):
+    """Rolling window in days from a query value; 'all' (or absent) means all-time"""
+    if value in (None, '', 'all'):
+        return None
+    days = int(value)
+    if days not in CUSTOMER_WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(map(str, CUSTOMER_WINDOWS))} or 'all'")
+    return days
+
+@app.route('/api/customers/top')
+@cache.cached(timeout=300, query_string=True, response_filter=is_cacheable)
+def top_customers():
+    try:
+        window = parse_window(request.args.get('window'))
+        limit = min(max(int(request.args.get('limit', 20)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        customers = db_service.get_top_customers(window, limit, offset)
+        return jsonify({
+            'window': window or 'all',
+            'limit': limit,
+            'offset': offset,
+            'customers': customers
+        })
+    except Exception as e:
+        logger.error(f"Error getting top customers: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/customers/ranking')
+@cache.cached(timeout=300, query_string=True, response_filter=is_cacheable)
+def customer_ranking():
+    account_number = request.args.get('account_number')
+    if not account_number:
+        return jsonify({'error': 'account_number is required'}), 400
+    try:
+        window = parse_window(request.args.get('window'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        ranking = db_service.get_customer_rank(account_number, window)
+        if ranking is None:
+            return jsonify({'error': f'No metrics for account {account_number}'}), 404
+        return jsonify(dict(ranking, window=window or 'all'))
+    except Exception as e:
+        logger.error(f"Error getting customer ranking: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/demand/forecast/<item_number>')
 def demand_forecast(item_number):
     try:
-        forecast_data = analytics_service.calculate_demand_forecast(item_number)
+        chart_format = request.args.get('chart_format', 'plotly')
+        precision = request.args.get('precision')
+        
+        forecast_data = analytics_service.calculate_demand_forecast(
+            item_number,
+            chart_format=chart_format,
+            precision=int(precision) if precision is not None else None
+        )
         return jsonify(forecast_data)
     except Exception as e:
         logger.error(f"Error calculating demand forecast: {str(e)}")
@@ -143,17 +454,50 @@ def demand_forecast(item_number):
 
 @app.route('/api/reports/daily')
 def daily_report():
+    try:
+        branch = parse_branch(request.args.get('branch'))
+        approx = parse_approx(request.args.get('approx'), branch)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         report_date = request.args.get('date', datetime.now().date().isoformat())
-        report_data = analytics_service.generate_daily_report(report_date)
+        report_data = analytics_service.get_daily_report(report_date, branch, approx)
         
-        return jsonify(report_data)
+        return approximate_response(report_data) if approx else jsonify(report_data)
     except Exception as e:
         logger.error(f"Error generating daily report: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/reports/monthly')
+def monthly_report():
+    try:
+        branch = parse_branch(request.args.get('branch'))
+        month = datetime.strptime(request.args.get('month', datetime.now().strftime('%Y-%m')), '%Y-%m').date()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        report_data = analytics_service.get_range_report(month, next_month - timedelta(days=1), branch)
+        report_data['month'] = month.strftime('%Y-%m')
+        
+        return jsonify(report_data)
+    except Exception as e:
+        logger.error(f"Error generating monthly report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sales/trend')
 def sales_trend():
+    try:
+        branch = parse_branch(request.args.get('branch'))
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
+        max_points = min(max(int(request.args.get('points', TREND_MAX_POINTS)), 10), 5000)
+        downsample_mode = request.args.get('downsample', 'lttb')
+        if downsample_mode not in DOWNSAMPLE_MODES:
+            raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLE_MODES)}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         end_date = request.args.get('end_date')
         start_date = request.args.get('start_date')
@@ -168,31 +512,15 @@ def sales_trend():
         else:
             start_date = end_date - timedelta(days=30)
         
-        # Get daily sales totals
-        sales_data = eci_service.get_daily_sales(start_date, end_date)
-        
-        # Aggregate by date
-        daily_totals = {}
-        for sale in sales_data:
-            date_str = sale['invoice_date'].strftime('%Y-%m-%d')
-            if date_str not in daily_totals:
-                daily_totals[date_str] = 0
-            daily_totals[date_str] += sale['extended_price']
-        
-        # Fill missing dates with 0
-        dates = []
-        sales = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            dates.append(date_str)
-            sales.append(daily_totals.get(date_str, 0))
-            current_date += timedelta(days=1)
-        
-        return jsonify({
-            'dates': dates,
-            'sales': sales
-        })
+        # Stored days come from the hot cache, or a SQL aggregate when the range starts before it;
+        # ECI is only asked for days not ingested yet
+        view = analytics_service.hot_cache.view(start_date)
+        live_sales = get_live_sales(analytics_service.live_ranges(view, start_date, end_date), branch)
+        return jsonify(analytics_service.get_sales_trend(
+            view, start_date, end_date, live_sales, branch, granularity, max_points, downsample_mode
+        ))
+    except (ECIServiceError, UpstreamUnavailableError) as e:
+        return degraded_response(e)
     except Exception as e:
         logger.error(f"Error getting sales trend: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -204,25 +532,19 @@ def check_data_availability():
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=365)
         
-        # Get all sales in the period
-        sales_data = eci_service.get_daily_sales(start_date, end_date)
+        # Per-day counts come from the coverage ledger maintained by ingestion
+        coverage = db_service.get_sales_coverage(start_date, end_date)
+        dates = {day['date']: day['row_count'] for day in coverage if day['row_count']}
         
-        if sales_data:
-            # Group by date
-            dates = {}
-            for sale in sales_data:
-                date_str = sale['invoice_date'].strftime('%Y-%m-%d')
-                if date_str not in dates:
-                    dates[date_str] = 0
-                dates[date_str] += 1
-            
+        if dates:
             return jsonify({
-                'total_records': len(sales_data),
+                'total_records': sum(dates.values()),
                 'date_range': f"{start_date} to {end_date}",
                 'dates_with_data': sorted(dates.keys()),
-                'first_sale': min(dates.keys()) if dates else None,
-                'last_sale': max(dates.keys()) if dates else None,
-                'sales_by_date': dates
+                'first_sale': min(dates.keys()),
+                'last_sale': max(dates.keys()),
+                'sales_by_date': dates,
+                'coverage': coverage
             })
         else:
             return jsonify({
@@ -233,41 +555,48 @@ def check_data_availability():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/debug/cache')
+def cache_stats():
+    """Bytes this worker wrote to the cache before and after compression"""
+    if cache_codec is None:
+        return jsonify({'serializer': 'pickle', 'compression': 'none'})
+    return jsonify(cache_codec.stats())
+
+@app.route('/api/items/search')
+def search_items():
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(int(request.args.get('limit', 10)), 1), SHORT_PREFIX_TOP)
+        return jsonify({'query': query, 'items': item_index.search(query, limit)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/items/top')
+def top_items():
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        return jsonify({
+            'items': item_index.top(limit),
+            'days': item_index.sales_days
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting top items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/debug/items')
 def debug_items():
-    """Get list of items with recent sales for testing"""
+    """Get list of items with recent sales for testing, from the item index"""
     try:
-        # Get items from last 90 days
         end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=90)
-        
-        sales_data = eci_service.get_daily_sales(start_date, end_date)
-        
-        # Aggregate by item
-        item_sales = {}
-        for sale in sales_data:
-            item_num = sale['item_number']
-            if item_num not in item_sales:
-                item_sales[item_num] = {
-                    'item_number': item_num,
-                    'description': sale['description'],
-                    'total_quantity': 0,
-                    'sale_count': 0,
-                    'last_sale': sale['invoice_date'].strftime('%Y-%m-%d')
-                }
-            item_sales[item_num]['total_quantity'] += sale['quantity']
-            item_sales[item_num]['sale_count'] += 1
-            
-        # Get top 20 items by sale count
-        top_items = sorted(
-            item_sales.values(), 
-            key=lambda x: x['sale_count'], 
-            reverse=True
-        )[:20]
-        
+        start_date = end_date - timedelta(days=item_index.sales_days)
         return jsonify({
             'message': 'Top items with sales history',
-            'items': top_items,
+            'items': item_index.top(20),
             'date_range': f'{start_date} to {end_date}'
         })
         
@@ -275,7 +604,34 @@ def debug_items():
         logger.error(f"Error getting top items: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+def metrics():
+    data, content_type = metrics_service.render_latest()
+    return Response(data, headers={'Content-Type': content_type})
+
+@app.route('/api/debug/profiles/<profile_id>')
+def get_profile(profile_id):
+    if not profiling_service.authorized(request):
+        # Indistinguishable from a missing profile, so ids cannot be probed without the token
+        return jsonify({'error': 'Profile not found'}), 404
+    profile = profiling_service.load_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(profile)
+
 # Background jobs
+def ingest_sales_gaps(start_date, end_date) -> list:
+    """Fetch only the days whose stored sales differ from ECI's invoice headers and replace their rows"""
+    summaries = eci_service.get_invoice_summaries(start_date, end_date)
+    gaps = db_service.find_coverage_gaps(summaries)
+    for day in gaps:
+        if db_service.replace_sales_day(day, eci_service.get_daily_sales(day, day)):
+            db_service.mark_coverage_verified(day, summaries[day])
+        else:
+            logger.error(f"Storing sales for {day} failed; it stays a gap")
+    logger.info(f"Sales ingestion: {len(gaps)} of {len(summaries)} days fetched ({', '.join(map(str, gaps)) or 'none'})")
+    return gaps
+
 def collect_daily_data():
     """Scheduled job to collect and store daily data"""
     try:
@@ -284,13 +640,49 @@ def collect_daily_data():
         # Collect yesterday's data
         yesterday = datetime.now().date() - timedelta(days=1)
         
-        # Get sales data
-        sales_data = eci_service.get_daily_sales(yesterday, yesterday)
-        db_service.store_sales_data(sales_data)
+        # Customer metrics, item forecast states and daily sketches are maintained by store_sales_data;
+        # backfill them once from existing history before the new day is folded in
+        if not db_service.has_customer_metrics():
+            db_service.rebuild_customer_metrics(yesterday - timedelta(days=1))
+        if not db_service.has_forecast_states():
+            db_service.rebuild_forecast_states(yesterday - timedelta(days=1))
+        if not db_service.has_sales_sketches():
+            db_service.rebuild_sales_sketches()
+        if not db_service.has_sales_coverage():
+            db_service.rebuild_sales_coverage()
+        
+        # Get sales for yesterday plus any recent day that is missing or changed at the source
+        ingest_sales_gaps(yesterday - timedelta(days=COVERAGE_LOOKBACK_DAYS - 1), yesterday)
+        
+        # Keep the customer windows moving on days without sales
+        db_service.advance_customer_windows(yesterday)
         
-        # Update inventory levels
-        inventory_data = eci_service.get_all_inventory()
-        db_service.update_inventory_levels(inventory_data)
+        # Nightly catalogue forecast and reorder-point refresh across all cores, in its own process;
+        # on failure the previous forecasts stay and the rest of the job still runs
+        try:
+            refresh_in_subprocess(db_service.database_url)
+        except Exception as e:
+            logger.error(f"Error refreshing forecasts: {str(e)}")
+        
+        # Update inventory levels for every configured branch, fetched concurrently
+        for branch, inventory_data in eci_service.get_inventory_by_branch().items():
+            if not db_service.update_inventory_levels(inventory_data):
+                logger.error(f"Inventory update failed for branch {branch}")
+        db_service.refresh_days_of_supply()
+        
+        # Render each closed day's report once, company-wide and per branch
+        report_branches = [None] + (ECI_BRANCHES if len(ECI_BRANCHES) > 1 else [])
+        analytics_service.materialize_daily_reports(
+            yesterday - timedelta(days=COVERAGE_LOOKBACK_DAYS - 1), yesterday, report_branches
+        )
+        
+        # Pick up new items and sales ranks
+        item_index.build()
+        reorder_engine.invalidate()
+        
+        # Share the refreshed sales window with every worker on this host
+        if analytics_service.hot_cache.snapshot_dir:
+            analytics_service.hot_cache.publish_snapshot()
         
         logger.info("Daily data collection completed")
     except Exception as e:
@@ -305,6 +697,23 @@ scheduler.add_job(
     id='daily_data_collection'
 )
 
+def maintain_sales_partitions():
+    """Scheduled job to create upcoming sales_data partitions and archive expired ones"""
+    try:
+        result = db_service.partitions.maintain()
+        logger.info(f"Partition maintenance completed: {result}")
+    except Exception as e:
+        logger.error(f"Error in partition maintenance: {str(e)}")
+
+# Partition upkeep runs daily after collection; it is a no-op on SQLite
+scheduler.add_job(
+    maintain_sales_partitions,
+    'cron',
+    hour=2,
+    minute=30,
+    id='sales_partition_maintenance'
+)
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,69 @@
+# benchmarks/bench_cache_serializer.py
+"""Size and load time of cache entries: cachelib's pickle vs msgpack with zstd/lz4 compression.
+
+Entries are a day of ECI sales lines (the live-sales cache) and a cached
+/api/inventory/alerts response.
+
+Usage:
+    python benchmarks/bench_cache_serializer.py [--invoices 500] [--repeat 50]
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import numpy as np
+
+import eci_stub
+import harness
+from cache_serializer import CacheSerializer
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    transport = eci_stub.StubTransport(eci_stub.SyntheticECI(invoices_per_day=args.invoices))
+    app_module = harness.load_app(transport, f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    harness.seed_database(app_module.eci_service, app_module.db_service, 1)
+    yesterday = date.today() - timedelta(days=1)
+    with app_module.app.test_request_context():
+        entries = {
+            'sales lines': app_module.eci_service.get_daily_sales(yesterday, yesterday),
+            # The undecorated view, so the response is built rather than read from the cache
+            'alerts response': app_module.inventory_alerts.__wrapped__(),
+        }
+
+    serializers = {'msgpack': CacheSerializer('none'), 'msgpack+zstd': CacheSerializer('zstd'),
+                   'msgpack+lz4': CacheSerializer('lz4')}
+    print(f"cache entry encoding, median of {args.repeat}")
+    for name, value in entries.items():
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        print(f"  {name:<16} pickle        {len(pickled) / 1e3:8.1f} kB  load {median_ms(lambda: pickle.loads(pickled), args.repeat):6.2f} ms")
+        for label, serializer in serializers.items():
+            stored = serializer.dumps(value)
+            load = median_ms(lambda: serializer.loads(stored), args.repeat)
+            print(f"  {'':<16} {label:<13} {len(stored) / 1e3:8.1f} kB  load {load:6.2f} ms  "
+                  f"{len(pickled) / len(stored):5.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
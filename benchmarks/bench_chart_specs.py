@@ -0,0 +1,92 @@
+# benchmarks/bench_chart_specs.py
+"""Compare plotly graph-object chart serialization against chart_specs trace dicts.
+
+Usage:
+    python benchmarks/bench_chart_specs.py [--points 365] [--repeat 50]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import numpy as np
+import pandas as pd
+
+import chart_specs
+
+
+def make_series(points: int):
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=points, freq='D')
+    daily = pd.Series(np.random.poisson(5, points).astype(float), index=index)
+    return [
+        ('Daily Sales', daily, dict(color='lightgray', width=1)),
+        ('7-Day MA', daily.rolling(7).mean(), dict(color='blue', width=2)),
+        ('30-Day MA', daily.rolling(30).mean(), dict(color='green', width=2)),
+        ('90-Day MA', daily.rolling(90).mean(), dict(color='red', width=2))
+    ]
+
+
+def plotly_path(series) -> str:
+    import plotly.graph_objs as go
+    import plotly.utils
+    traces = [
+        go.Scatter(x=values.index.tolist(), y=values.values.tolist(), mode='lines', name=name, line=line)
+        for name, values, line in series
+    ]
+    return json.dumps(traces, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def spec_path(series) -> str:
+    traces = [
+        chart_specs.scatter(values.index, values.values, mode='lines', name=name, line=line)
+        for name, values, line in series
+    ]
+    return chart_specs.to_json(traces)
+
+
+def time_call(fn, repeat: int) -> float:
+    """Return the median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def import_time(module: str) -> float:
+    """Measure a cold import in a fresh interpreter (numpy/pandas preloaded), in milliseconds"""
+    code = ("import time, numpy, pandas; s = time.perf_counter(); "
+            f"import {module}; print((time.perf_counter() - s) * 1000)")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                         cwd=os.path.dirname(current_dir))
+    return float(out.stdout.strip() or 'nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    series = make_series(args.points)
+    assert json.loads(plotly_path(series)) == json.loads(spec_path(series)), 'chart payloads differ'
+
+    plotly_ms = time_call(lambda: plotly_path(series), args.repeat)
+    spec_ms = time_call(lambda: spec_path(series), args.repeat)
+
+    print(f"forecast chart, 4 x {args.points} points (median of {args.repeat})")
+    print(f"  plotly graph_objs + PlotlyJSONEncoder: {plotly_ms:8.2f} ms")
+    print(f"  chart_specs dicts + json.dumps:        {spec_ms:8.2f} ms  ({plotly_ms / spec_ms:.1f}x faster)")
+    print("cold import")
+    print(f"  plotly.graph_objs + plotly.utils: {import_time('plotly.graph_objs, plotly.utils; plotly.graph_objs.Scatter'):8.1f} ms")
+    print(f"  chart_specs:                      {import_time('chart_specs'):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
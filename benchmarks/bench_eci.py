@@ -0,0 +1,107 @@
+# benchmarks/bench_eci.py
+"""End-to-end benchmarks for ECIApiService, data collection and the Flask routes.
+
+Everything runs against the local ECI stand-in in eci_stub.py.
+
+Standalone report (throughput, p50/p99 latency, upstream calls per run):
+    python benchmarks/bench_eci.py --invoices-per-day 50 --items 5000 --latency-ms 20
+
+pytest-benchmark (SQLite always, PostgreSQL when --postgres-url or
+BENCH_POSTGRES_URL is set):
+    pytest benchmarks/bench_eci.py --benchmark-only --eci-latency-ms 5
+"""
+import os
+import sys
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import pytest
+
+import harness
+import eci_stub
+
+ROUTES = list(harness.route_paths('', '').keys())
+
+
+def _record_calls(benchmark, transport, rounds_hint=None):
+    """Attach per-round upstream call counts and the p99 latency to the benchmark record"""
+    rounds = benchmark.stats.stats.rounds if benchmark.stats else rounds_hint or 1
+    benchmark.extra_info['upstream_calls'] = {op: n / rounds for op, n in sorted(transport.calls.items())}
+    if benchmark.stats:
+        benchmark.extra_info['p99_ms'] = harness.percentile(benchmark.stats.stats.data, 99) * 1000
+
+
+def test_get_daily_sales(benchmark, stub_transport, eci_service, bench_days):
+    end_date = date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=bench_days - 1)
+    stub_transport.reset_calls()
+    benchmark(eci_service.get_daily_sales, start_date, end_date)
+    _record_calls(benchmark, stub_transport)
+
+
+def test_get_all_inventory(benchmark, stub_transport, eci_service):
+    stub_transport.reset_calls()
+    benchmark(eci_service.get_all_inventory)
+    _record_calls(benchmark, stub_transport)
+
+
+def test_collect_daily_data(benchmark, stub_transport, bench_app):
+    stub_transport.reset_calls()
+    benchmark(bench_app.collect_daily_data)
+    _record_calls(benchmark, stub_transport)
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_route(benchmark, route, stub_transport, bench_app, bench_client, bench_paths):
+    path = bench_paths[route]
+    stub_transport.reset_calls()
+    response = benchmark(bench_client.get, path)
+    assert response.status_code == 200, response.data[:200]
+    _record_calls(benchmark, stub_transport)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ECI-backed services against a local stub')
+    parser.add_argument('--invoices-per-day', type=int, default=20)
+    parser.add_argument('--lines-per-invoice', type=int, default=3)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--days', type=int, default=30, help='days of history to load and query')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite file')
+    parser.add_argument('--cache-type', default='NullCache', help='flask_caching backend for the app')
+    args = parser.parse_args()
+
+    data = eci_stub.SyntheticECI(args.invoices_per_day, args.lines_per_invoice, args.items)
+    transport = eci_stub.StubTransport(data, latency_ms=args.latency_ms)
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    app_module = harness.load_app(transport, database_url, args.cache_type)
+    eci_service = app_module.eci_service
+    harness.seed_database(eci_service, app_module.db_service, args.days)
+
+    end_date = date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=args.days - 1)
+    results = [
+        harness.measure('get_daily_sales', lambda: eci_service.get_daily_sales(start_date, end_date),
+                        args.iterations, transport=transport),
+        harness.measure('get_all_inventory', eci_service.get_all_inventory, args.iterations, transport=transport),
+        harness.measure('collect_daily_data', app_module.collect_daily_data, args.iterations, transport=transport)
+    ]
+
+    client = app_module.app.test_client()
+    for route, path in harness.route_paths(data.item_number(0), data.account_number(1)).items():
+        results.append(harness.measure(f'GET {route}', lambda p=path: client.get(p), args.iterations,
+                                       transport=transport))
+
+    print(f"database: {database_url.split('@')[-1]}  volumes: {args.invoices_per_day} invoices/day x "
+          f"{args.lines_per_invoice} lines, {args.items} items, {args.latency_ms:g} ms latency")
+    print(harness.format_report(results))
+
+
+if __name__ == '__main__':
+    main()
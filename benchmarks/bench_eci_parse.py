@@ -0,0 +1,88 @@
+# benchmarks/bench_eci_parse.py
+"""Per-page parse cost of GetItems/GetInvoices replies: zeep object tree vs the streaming parser.
+
+Both parsers read the same pre-built 999-row reply, so only parsing plus
+the conversion to the dicts ECIApiService returns is measured.
+
+Usage:
+    python benchmarks/bench_eci_parse.py [--rows 999] [--repeat 20]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from datetime import date
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import numpy as np
+import requests
+
+import eci_stub
+from eci_fast_parser import SPECS, parse_page
+
+
+def build_reply(operation: str, rows: int) -> bytes:
+    data = eci_stub.SyntheticECI(items=rows, invoices_per_day=rows)
+    if operation == 'GetItems':
+        body = ''.join(eci_stub._record('Items', data.item(n, 'MAIN')) for n in range(rows))
+    else:
+        body = ''.join(
+            eci_stub._record('Invoices', dict(invoice, Total=0.0))
+            for invoice in data.invoices_for_day(date(2024, 3, 4))
+        )
+    return eci_stub._envelope(operation, body)
+
+
+def measure(parse, content: bytes, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(content)
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return np.percentile(samples, 50), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=999)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    service = eci_stub.make_service()
+    binding = service.client.service._binding
+
+    print(f"reply parse, {args.rows} rows per page, median of {args.repeat}")
+    for operation, spec in SPECS.items():
+        content = build_reply(operation, args.rows)
+        fields = spec.record._fields
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/xml; charset=utf-8'
+        response._content = content
+
+        def with_zeep(body):
+            result = binding.process_reply(service.client, binding.get(operation), response)
+            return [{field: getattr(record, field) for field in fields} for record in getattr(result, spec.tag)]
+
+        def streaming(body):
+            result = parse_page(body, spec)
+            return [{field: getattr(record, field) for field in fields} for record in getattr(result, spec.tag)]
+
+        assert with_zeep(content) == streaming(content)
+        zeep_ms, zeep_mb = measure(with_zeep, content, args.repeat)
+        fast_ms, fast_mb = measure(streaming, content, args.repeat)
+        print(f"  {operation:<12} {len(content) / 1e6:5.2f} MB reply  "
+              f"zeep {zeep_ms:7.1f} ms / peak {zeep_mb:6.1f} MB   "
+              f"streaming {fast_ms:7.1f} ms / peak {fast_mb:6.1f} MB   {zeep_ms / fast_ms:4.1f}x")
+
+
+if __name__ == '__main__':
+    main()
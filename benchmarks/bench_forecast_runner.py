@@ -0,0 +1,69 @@
+# benchmarks/bench_forecast_runner.py
+"""Measure the catalogue forecast refresh across worker counts on synthetic demand.
+
+Usage:
+    python benchmarks/bench_forecast_runner.py [--items 50000] [--workers 1,2,4,8,16]
+"""
+import os
+import sys
+import argparse
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import numpy as np
+
+import forecast_service
+from forecast_service import ForecastRunner, HISTORY_DAYS
+
+
+class StateSource:
+    """Stands in for DatabaseService's forecast state reads and bulk forecast writes"""
+
+    def __init__(self, items: int, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.as_of = date.today() - timedelta(days=1)
+        rates = np.minimum(rng.pareto(1.5, (items, 1)) / 4, 0.95)
+        rings = np.where(rng.random((items, HISTORY_DAYS)) < rates, rng.integers(1, 12, (items, HISTORY_DAYS)), 0)
+        # Items last sold up to 60 days ago, so workers also roll states forward
+        idle = rng.integers(0, 60, items)
+        self.records = [
+            (f'SKU{n:06d}', self.as_of - timedelta(days=int(idle[n])),
+             self.as_of - timedelta(days=HISTORY_DAYS - 1), rings[n].astype(np.float64).tobytes())
+            for n in range(items)
+        ]
+        self.stored = 0
+
+    def get_forecast_rings(self):
+        return self.as_of, self.records
+
+    def get_lead_times(self):
+        # No stored lead times: every item uses the default
+        return {}
+
+    def store_item_forecasts(self, forecasts):
+        self.stored = len(forecasts)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--workers', default='1,2,4,8,16')
+    args = parser.parse_args()
+
+    forecast_service.PARALLEL_MIN_ITEMS = 0
+    source = StateSource(args.items)
+    print(f"forecast refresh, {args.items} items, {os.cpu_count()} cores")
+
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        stats = ForecastRunner(source, workers).run()
+        baseline = baseline or stats['compute_seconds']
+        print(f"  workers {workers:>3}: load {stats['load_seconds']:7.3f} s  compute {stats['compute_seconds']:7.3f} s  "
+              f"store {stats['store_seconds']:7.3f} s  speedup {baseline / max(stats['compute_seconds'], 1e-9):5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_item_search.py
+"""Measure item search index build time and query latency on a synthetic catalogue.
+
+Usage:
+    python benchmarks/bench_item_search.py [--items 50000] [--queries 2000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import numpy as np
+
+from item_search_service import ItemSearchIndex
+
+WORDS = ('valve pipe fitting elbow tee coupling copper pvc brass steel galvanized flange gasket '
+         'washer bolt nut screw anchor hose clamp adapter bushing nipple cap plug union reducer '
+         'ball gate check drain trap flex supply line heater filter pump motor seal ring kit').split()
+
+
+class CatalogueSource:
+    """Stands in for DatabaseService.get_item_catalogue with a generated catalogue"""
+
+    def __init__(self, items: int, seed: int = 42):
+        rng = random.Random(seed)
+        self.catalogue = []
+        for n in range(items):
+            sale_count = int(rng.paretovariate(1.1)) - 1 if rng.random() < 0.6 else 0
+            self.catalogue.append({
+                'item_number': f'{rng.choice("ABCDEFGH")}{rng.randint(0, 99):02d}-{n:06d}',
+                'description': ' '.join(rng.sample(WORDS, rng.randint(2, 5))) + f' {rng.randint(1, 48)}in',
+                'sale_count': sale_count,
+                'total_quantity': float(sale_count * rng.randint(1, 6)),
+                'last_sale': None,
+                'qty_available': float(rng.randint(0, 200))
+            })
+
+    def get_item_catalogue(self, days: int = 90):
+        return [dict(item) for item in self.catalogue]
+
+
+def make_queries(source: CatalogueSource, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        item = rng.choice(source.catalogue)
+        kind = rng.random()
+        if kind < 0.3:
+            queries.append(item['item_number'][:rng.randint(1, 6)])
+        elif kind < 0.7:
+            word = rng.choice(item['description'].split())
+            queries.append(word[:rng.randint(1, len(word))])
+        else:
+            words = item['description'].split()[:2]
+            queries.append(' '.join(w[:rng.randint(2, len(w))] for w in words))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=15)
+    args = parser.parse_args()
+
+    source = CatalogueSource(args.items)
+    index = ItemSearchIndex(source)
+    start = time.perf_counter()
+    index.build()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    samples = []
+    for query in make_queries(source, args.queries):
+        start = time.perf_counter()
+        index.search(query, args.limit)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"item search, {args.items} items, {args.queries} queries, limit {args.limit}")
+    print(f"  build:  {build_ms:8.1f} ms")
+    print(f"  search: p50 {np.percentile(samples, 50):.3f} ms  p99 {np.percentile(samples, 99):.3f} ms  "
+          f"max {max(samples):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/conftest.py
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import pytest
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('eci-bench', 'ECI stub benchmark volumes')
+    group.addoption('--eci-invoices-per-day', type=int, default=20)
+    group.addoption('--eci-lines-per-invoice', type=int, default=3)
+    group.addoption('--eci-items', type=int, default=2000)
+    group.addoption('--eci-latency-ms', type=float, default=0)
+    group.addoption('--bench-days', type=int, default=30, help='days of history to load and query')
+    group.addoption('--postgres-url', default=os.getenv('BENCH_POSTGRES_URL'),
+                    help='PostgreSQL URL for the postgresql database parameter')
+
+
+@pytest.fixture(scope='session')
+def bench_days(request):
+    return request.config.getoption('--bench-days')
+
+
+@pytest.fixture(scope='session')
+def stub_transport(request):
+    import eci_stub
+    data = eci_stub.SyntheticECI(
+        invoices_per_day=request.config.getoption('--eci-invoices-per-day'),
+        lines_per_invoice=request.config.getoption('--eci-lines-per-invoice'),
+        items=request.config.getoption('--eci-items')
+    )
+    return eci_stub.StubTransport(data, latency_ms=request.config.getoption('--eci-latency-ms'))
+
+
+@pytest.fixture(scope='session')
+def eci_service(stub_transport):
+    import eci_stub
+    return eci_stub.make_service(stub_transport)
+
+
+@pytest.fixture(scope='session', params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path_factory):
+    if request.param == 'sqlite':
+        return f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    url = request.config.getoption('--postgres-url')
+    if not url:
+        pytest.skip('set --postgres-url or BENCH_POSTGRES_URL to benchmark PostgreSQL')
+    return url
+
+
+@pytest.fixture(scope='session')
+def bench_app(stub_transport, database_url, bench_days):
+    import harness
+    app_module = harness.load_app(stub_transport, database_url)
+    harness.seed_database(app_module.eci_service, app_module.db_service, bench_days)
+    return app_module
+
+
+@pytest.fixture(scope='session')
+def bench_client(bench_app):
+    return bench_app.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def bench_paths(stub_transport):
+    import harness
+    data = stub_transport.data
+    return harness.route_paths(data.item_number(0), data.account_number(1))
@@ -0,0 +1,357 @@
+# benchmarks/eci_stub.py
+"""Local stand-in for the ECI ecommerce SOAP API.
+
+StubTransport is a zeep transport that serves a synthetic WSDL and answers
+GetInvoices, GetInvoiceDetail and GetItems from a deterministic generated
+dataset, so ECIApiService can be driven without a live ECI endpoint.
+"""
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import List, Dict, Optional
+from xml.sax.saxutils import escape
+
+import requests
+from lxml import etree
+
+import eci_api_service
+
+STUB_ENDPOINT = 'http://eci-stub.local/api/ecommerce.asmx'
+NAMESPACE = 'http://eci-stub.local/'
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+WSDL = f"""<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+                  xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+                  xmlns:s="http://www.w3.org/2001/XMLSchema"
+                  xmlns:tns="{NAMESPACE}"
+                  targetNamespace="{NAMESPACE}">
+  <wsdl:types>
+    <s:schema elementFormDefault="qualified" targetNamespace="{NAMESPACE}">
+      <s:complexType name="InvoiceFilter">
+        <s:sequence>
+          <s:element minOccurs="0" name="AccountNumber" type="s:string"/>
+          <s:element minOccurs="0" name="DateRangeStart" type="s:string"/>
+          <s:element minOccurs="0" name="DateRangeEnd" type="s:string"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="InvoiceTypes" type="s:int"/>
+          <s:element minOccurs="0" name="RowMaxCount" type="s:int"/>
+          <s:element minOccurs="0" name="RowStart" type="s:int"/>
+          <s:element minOccurs="0" name="SearchText" type="s:string"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="ItemFilter">
+        <s:sequence>
+          <s:element minOccurs="0" name="RowMaxCount" type="s:int"/>
+          <s:element minOccurs="0" name="RowStart" type="s:int"/>
+          <s:element minOccurs="0" name="Branch" type="s:string"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="Invoice">
+        <s:sequence>
+          <s:element name="DocID" type="s:string"/>
+          <s:element name="IssueDate" type="s:dateTime"/>
+          <s:element name="AccountNumber" type="s:string"/>
+          <s:element name="Branch" type="s:string"/>
+          <s:element name="Total" type="s:double"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="LineItem">
+        <s:sequence>
+          <s:element name="ItemNumber" type="s:string"/>
+          <s:element name="Description" type="s:string"/>
+          <s:element name="QuantitySold" type="s:double"/>
+          <s:element name="UnitPrice" type="s:double"/>
+          <s:element name="ExtendedPrice" type="s:double"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="Item">
+        <s:sequence>
+          <s:element name="ItemNumber" type="s:string"/>
+          <s:element name="Description" type="s:string"/>
+          <s:element name="QtyAvailable" type="s:double"/>
+          <s:element name="QtyOnHand" type="s:double"/>
+          <s:element name="OnOrder" type="s:double"/>
+          <s:element name="CustomerPrice" type="s:double"/>
+          <s:element name="SOAverageCost" type="s:double"/>
+          <s:element name="TrackOnHand" type="s:boolean"/>
+          <s:element name="LastModifiedDateTime" type="s:dateTime"/>
+          <s:element name="LeadTime" type="s:int"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="InvoicesResult">
+        <s:sequence>
+          <s:element name="Success" type="s:boolean"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="ErrorMessages" type="s:string"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="Invoices" type="tns:Invoice"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="InvoiceDetailResult">
+        <s:sequence>
+          <s:element name="Success" type="s:boolean"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="ErrorMessages" type="s:string"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="Items" type="tns:LineItem"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="ItemsResult">
+        <s:sequence>
+          <s:element name="Success" type="s:boolean"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="ErrorMessages" type="s:string"/>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="Items" type="tns:Item"/>
+        </s:sequence>
+      </s:complexType>
+      <s:element name="GetInvoices">
+        <s:complexType><s:sequence>
+          <s:element name="apikey" type="s:string"/>
+          <s:element name="invoicefilter" type="tns:InvoiceFilter"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetInvoicesResponse">
+        <s:complexType><s:sequence>
+          <s:element name="GetInvoicesResult" type="tns:InvoicesResult"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetInvoiceDetail">
+        <s:complexType><s:sequence>
+          <s:element name="apikey" type="s:string"/>
+          <s:element name="docID" type="s:string"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetInvoiceDetailResponse">
+        <s:complexType><s:sequence>
+          <s:element name="GetInvoiceDetailResult" type="tns:InvoiceDetailResult"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetItems">
+        <s:complexType><s:sequence>
+          <s:element name="apikey" type="s:string"/>
+          <s:element name="itemFilter" type="tns:ItemFilter"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetItemsResponse">
+        <s:complexType><s:sequence>
+          <s:element name="GetItemsResult" type="tns:ItemsResult"/>
+        </s:sequence></s:complexType>
+      </s:element>
+    </s:schema>
+  </wsdl:types>
+  <wsdl:message name="GetInvoicesSoapIn"><wsdl:part name="parameters" element="tns:GetInvoices"/></wsdl:message>
+  <wsdl:message name="GetInvoicesSoapOut"><wsdl:part name="parameters" element="tns:GetInvoicesResponse"/></wsdl:message>
+  <wsdl:message name="GetInvoiceDetailSoapIn"><wsdl:part name="parameters" element="tns:GetInvoiceDetail"/></wsdl:message>
+  <wsdl:message name="GetInvoiceDetailSoapOut"><wsdl:part name="parameters" element="tns:GetInvoiceDetailResponse"/></wsdl:message>
+  <wsdl:message name="GetItemsSoapIn"><wsdl:part name="parameters" element="tns:GetItems"/></wsdl:message>
+  <wsdl:message name="GetItemsSoapOut"><wsdl:part name="parameters" element="tns:GetItemsResponse"/></wsdl:message>
+  <wsdl:portType name="ECommerceSoap">
+    <wsdl:operation name="GetInvoices">
+      <wsdl:input message="tns:GetInvoicesSoapIn"/><wsdl:output message="tns:GetInvoicesSoapOut"/>
+    </wsdl:operation>
+    <wsdl:operation name="GetInvoiceDetail">
+      <wsdl:input message="tns:GetInvoiceDetailSoapIn"/><wsdl:output message="tns:GetInvoiceDetailSoapOut"/>
+    </wsdl:operation>
+    <wsdl:operation name="GetItems">
+      <wsdl:input message="tns:GetItemsSoapIn"/><wsdl:output message="tns:GetItemsSoapOut"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="ECommerceSoap" type="tns:ECommerceSoap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="GetInvoices">
+      <soap:operation soapAction="{NAMESPACE}GetInvoices" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input><wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+    <wsdl:operation name="GetInvoiceDetail">
+      <soap:operation soapAction="{NAMESPACE}GetInvoiceDetail" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input><wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+    <wsdl:operation name="GetItems">
+      <soap:operation soapAction="{NAMESPACE}GetItems" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input><wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="ECommerce">
+    <wsdl:port name="ECommerceSoap" binding="tns:ECommerceSoap">
+      <soap:address location="{STUB_ENDPOINT}"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+"""
+
+
+class SyntheticECI:
+    """Deterministic synthetic invoice and item data with configurable volumes"""
+
+    def __init__(self, invoices_per_day: int = 20, lines_per_invoice: int = 3, items: int = 2000,
+                 accounts: int = 200, branches: List[str] = None, seed: int = 42):
+        self.invoices_per_day = invoices_per_day
+        self.lines_per_invoice = lines_per_invoice
+        self.items = items
+        self.accounts = accounts
+        self.branches = branches or ['MAIN']
+        self.seed = seed
+
+    def item_number(self, n: int) -> str:
+        return f'SKU{n:06d}'
+
+    def account_number(self, n: int) -> str:
+        return f'A{n:05d}'
+
+    @lru_cache(maxsize=4096)
+    def invoices_for_day(self, day: date) -> List[Dict]:
+        rng = random.Random(f'{self.seed}:inv:{day.isoformat()}')
+        invoices = []
+        for n in range(self.invoices_per_day):
+            issued = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=rng.randint(7, 18), minutes=rng.randint(0, 59))
+            invoices.append({
+                'DocID': f'{day:%Y%m%d}-{n:05d}',
+                'IssueDate': issued,
+                'AccountNumber': self.account_number(rng.randrange(self.accounts)),
+                'Branch': self.branches[n % len(self.branches)]
+            })
+        return invoices
+
+    @lru_cache(maxsize=65536)
+    def invoice_lines(self, doc_id: str) -> List[Dict]:
+        rng = random.Random(f'{self.seed}:lines:{doc_id}')
+        lines = []
+        for _ in range(self.lines_per_invoice):
+            # Skew item popularity so top-item rankings are meaningful
+            n = min(int(rng.paretovariate(1.2)) - 1, self.items - 1)
+            n = (n * 7919) % self.items
+            qty = float(rng.randint(1, 12))
+            price = round(1 + (n % 97) * 0.75, 2)
+            lines.append({
+                'ItemNumber': self.item_number(n),
+                'Description': f'Synthetic item {n}',
+                'QuantitySold': qty,
+                'UnitPrice': price,
+                'ExtendedPrice': round(qty * price, 2)
+            })
+        return lines
+
+    def invoices(self, start: date, end: date, account_number: Optional[str] = None,
+                 search_text: Optional[str] = None) -> List[Dict]:
+        result = []
+        day = start
+        while day <= end:
+            for invoice in self.invoices_for_day(day):
+                if account_number and invoice['AccountNumber'] != account_number:
+                    continue
+                if search_text and not any(l['ItemNumber'] == search_text
+                                           for l in self.invoice_lines(invoice['DocID'])):
+                    continue
+                result.append(invoice)
+            day += timedelta(days=1)
+        return result
+
+    def item(self, n: int, branch: str) -> Dict:
+        rng = random.Random(f'{self.seed}:item:{branch}:{n}')
+        return {
+            'ItemNumber': self.item_number(n),
+            'Description': f'Synthetic item {n}',
+            'QtyAvailable': float(rng.randint(-2, 200)),
+            'QtyOnHand': float(rng.randint(0, 200)),
+            'OnOrder': float(rng.choice([0, 0, 0, 12, 24])),
+            'CustomerPrice': round(1 + (n % 97) * 0.75, 2),
+            'SOAverageCost': round((1 + (n % 97) * 0.75) * 0.6, 2),
+            'TrackOnHand': n % 10 != 0,
+            'LastModifiedDateTime': datetime(2024, 1, 1) + timedelta(minutes=n),
+            'LeadTime': 3 + n % 12
+        }
+
+
+def _text(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return escape(str(value))
+
+
+def _record(tag: str, record: Dict) -> str:
+    fields = ''.join(f'<{k}>{_text(v)}</{k}>' for k, v in record.items())
+    return f'<{tag}>{fields}</{tag}>'
+
+
+def _envelope(operation: str, body: str) -> bytes:
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?>'
+        f'<soap:Envelope xmlns:soap="{SOAP_ENV}"><soap:Body>'
+        f'<{operation}Response xmlns="{NAMESPACE}"><{operation}Result>'
+        f'<Success>true</Success>{body}'
+        f'</{operation}Result></{operation}Response>'
+        f'</soap:Body></soap:Envelope>'
+    ).encode('utf-8')
+
+
+class StubTransport(eci_api_service.ECITransport):
+    """zeep transport that answers ECI operations locally with optional simulated latency"""
+
+    def __init__(self, data: SyntheticECI = None, latency_ms: float = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.data = data or SyntheticECI()
+        self.latency_ms = latency_ms
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def load(self, url):
+        return WSDL.encode('utf-8')
+
+    def post(self, address, message, headers):
+        operation = headers.get('SOAPAction', '').strip('"').rsplit('/', 1)[-1]
+        with self._lock:
+            self.calls[operation] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        request = etree.fromstring(message).find(f'{{{SOAP_ENV}}}Body')[0]
+        handler = getattr(self, f'_handle_{operation}')
+        content = _envelope(operation, handler(request))
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/xml; charset=utf-8'
+        response._content = content
+        response.encoding = 'utf-8'
+        response.url = address
+        return response
+
+    def _handle_GetInvoices(self, request) -> str:
+        f = request.find('{*}invoicefilter')
+        start = date.fromisoformat(f.findtext('{*}DateRangeStart'))
+        end = date.fromisoformat(f.findtext('{*}DateRangeEnd'))
+        row_start = int(f.findtext('{*}RowStart') or 0)
+        row_max = int(f.findtext('{*}RowMaxCount') or 999)
+        invoices = self.data.invoices(start, end, f.findtext('{*}AccountNumber'), f.findtext('{*}SearchText'))
+        page = invoices[row_start:row_start + row_max]
+        return ''.join(
+            _record('Invoices', {**inv, 'Total': sum(l['ExtendedPrice'] for l in self.data.invoice_lines(inv['DocID']))})
+            for inv in page
+        )
+
+    def _handle_GetInvoiceDetail(self, request) -> str:
+        doc_id = request.findtext('{*}docID')
+        return ''.join(_record('Items', line) for line in self.data.invoice_lines(doc_id))
+
+    def _handle_GetItems(self, request) -> str:
+        f = request.find('{*}itemFilter')
+        row_start = int(f.findtext('{*}RowStart') or 0)
+        row_max = int(f.findtext('{*}RowMaxCount') or 999)
+        branch = f.findtext('{*}Branch') or self.data.branches[0]
+        end = min(row_start + row_max, self.data.items)
+        return ''.join(_record('Items', self.data.item(n, branch)) for n in range(row_start, end))
+
+
+def make_service(transport: StubTransport = None) -> 'eci_api_service.ECIApiService':
+    """Create an ECIApiService wired to a stub transport"""
+    return eci_api_service.ECIApiService(STUB_ENDPOINT, 'bench-key', transport=transport or StubTransport())
+
+
+def install(transport: StubTransport):
+    """Route every ECIApiService created afterwards (e.g. by app.py) through the stub transport"""
+    eci_api_service.ECITransport = lambda **kwargs: transport
@@ -0,0 +1,120 @@
+# benchmarks/harness.py
+"""Shared helpers for driving the services and Flask app against the ECI stand-in"""
+import os
+import sys
+import time
+import importlib
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+sys.path.insert(0, current_dir)
+
+import numpy as np
+
+import eci_stub
+from database_service import DatabaseService
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q)) if samples else 0.0
+
+
+def measure(name: str, fn: Callable, iterations: int = 10, warmup: int = 1,
+            transport: Optional[eci_stub.StubTransport] = None) -> Dict:
+    """Run fn repeatedly and report throughput, latency percentiles and upstream calls per run"""
+    for _ in range(warmup):
+        fn()
+    if transport is not None:
+        transport.reset_calls()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+
+    calls = dict(transport.calls) if transport is not None else {}
+    return {
+        'name': name,
+        'iterations': iterations,
+        'throughput_rps': iterations / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p99_ms': percentile(samples, 99),
+        'mean_ms': float(np.mean(samples)),
+        'upstream_calls': {op: count / iterations for op, count in sorted(calls.items())}
+    }
+
+
+def format_report(results: List[Dict]) -> str:
+    lines = [f"{'benchmark':<42} {'req/s':>9} {'p50 ms':>10} {'p99 ms':>10}  upstream calls/run"]
+    for r in results:
+        calls = ', '.join(f'{op}={n:g}' for op, n in r['upstream_calls'].items()) or '-'
+        lines.append(f"{r['name']:<42} {r['throughput_rps']:>9.1f} {r['p50_ms']:>10.2f} {r['p99_ms']:>10.2f}  {calls}")
+    return '\n'.join(lines)
+
+
+def seed_database(eci_service, db_service: DatabaseService, days: int, end_date: date = None):
+    """Load `days` closed days of synthetic sales plus every branch's item catalogue into the database"""
+    end_date = end_date or date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=days - 1)
+    db_service.store_sales_data(eci_service.get_daily_sales(start_date, end_date))
+    for inventory in eci_service.get_inventory_by_branch().values():
+        db_service.update_inventory_levels(inventory)
+    db_service.refresh_days_of_supply()
+
+
+def load_app(transport: eci_stub.StubTransport, database_url: str, cache_type: str = 'NullCache'):
+    """Import app.py wired to the stub ECI transport and the given database.
+
+    app.py builds its services at import time, so the first call configures
+    the environment before importing; later calls swap in a new database.
+    """
+    os.environ.setdefault('ECI_API_ENDPOINT', eci_stub.STUB_ENDPOINT)
+    os.environ.setdefault('ECI_API_KEY', 'bench-key')
+    # The shared rate limiter would throttle the benchmark itself; opt back in to measure it
+    os.environ.setdefault('ECI_GUARD_ENABLED', 'false')
+    os.environ['CACHE_TYPE'] = cache_type
+    os.environ['DATABASE_URL'] = database_url
+    eci_stub.install(transport)
+
+    app_module = importlib.import_module('app')
+    if app_module.db_service.database_url != database_url:
+        db_service = DatabaseService(database_url)
+        app_module.db_service = db_service
+        app_module.analytics_service.db_service = db_service
+        app_module.item_index.db_service = db_service
+        app_module.reorder_engine.db_service = db_service
+        app_module.analytics_service.hot_cache.db_service = db_service
+    return app_module
+
+
+def route_paths(item_number: str, account_number: str, today: date = None) -> Dict[str, str]:
+    """One representative request per Flask route, except the token-gated profile download"""
+    today = today or date.today()
+    start = today - timedelta(days=30)
+    last_month = (today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+    return {
+        'dashboard_summary': f'/api/dashboard/summary?start_date={start}&end_date={today}',
+        'inventory_alerts': '/api/inventory/alerts',
+        'sales_by_customer': f'/api/sales/by-customer?account_number={account_number}&days=30',
+        'sales_by_brand': '/api/sales/by-brand?days=30',
+        'demand_forecast': f'/api/demand/forecast/{item_number}',
+        'daily_report': f'/api/reports/daily?date={today - timedelta(days=1)}',
+        'sales_trend': f'/api/sales/trend?start_date={start}&end_date={today}',
+        'data_availability': '/api/debug/data-availability',
+        'debug_items': '/api/debug/items',
+        'item_search': f'/api/items/search?q={item_number[:3]}',
+        'top_items': '/api/items/top',
+        'top_customers': '/api/customers/top?window=30',
+        'customer_ranking': f'/api/customers/ranking?account_number={account_number}&window=30',
+        'reorder_recommendations': '/api/inventory/reorder',
+        'item_inventory': f'/api/inventory/items/{item_number}',
+        'branches': '/api/branches',
+        'monthly_report': f'/api/reports/monthly?month={last_month}',
+        'cache_stats': '/api/debug/cache',
+        'metrics': '/metrics'
+    }
@@ -0,0 +1,345 @@
+# benchmarks/load_replay.py
+"""Replay dashboard sessions against the app to size web workers and the cache.
+
+Each virtual user repeats one dashboard session. A session is the request
+mix templates/index.html sends:
+
+- page load: the 30-day range (summary, then the inventory alerts it
+  triggers; the trend; sales by brand) and the top items for the forecast
+  suggestions;
+- range changes: the range buttons (1, 7 or 90 days) reload the summary,
+  alerts, trend and brand sales;
+- auto-refresh: every 5 minutes the summary and alerts reload.
+
+Requests a page fires together are sent concurrently; alerts wait for the
+summary, as in the page. Recorded sessions can be replayed instead with
+--sessions FILE. The file is JSON lines, one list of request paths per
+session, sent in order.
+
+The app runs in N forked worker processes that accept on one shared
+socket, the same model as gunicorn sync workers, against the ECI stand-in
+with --latency-ms of simulated upstream latency. Each worker count gets a
+fresh cache, except that SimpleCache is per process (as in production
+without Redis) while --cache-type RedisCache with REDIS_URL is shared.
+
+Time between requests is compressed to --think-ms, so the 5-minute
+refresh arrives well inside cache timeouts. Hit rates are therefore an
+upper bound for users who really wait 5 minutes.
+
+Reported per worker count: sustained requests/s, p50/p95/p99 latency,
+ECI calls per user session, and cache hit rate per endpoint.
+
+Usage:
+    python benchmarks/load_replay.py --workers 1,2,4 --users 16 --duration 30 --latency-ms 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import socket
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.dirname(current_dir))
+
+import requests
+
+import eci_stub
+import harness
+
+RANGE_BUTTONS = (1, 7, 30, 90)
+# index.html asks for half the chart width in points; the fallback width is 800px
+TREND_POINTS = 400
+
+
+def trend_granularity(days: int) -> str:
+    """The 'auto' granularity index.html picks for a range"""
+    days += 1
+    return 'hour' if days <= 3 else 'day' if days <= 180 else 'week' if days <= 730 else 'month'
+
+
+def range_step(days: int, today: date = None) -> List[List[str]]:
+    """Requests for setDateRange(days): concurrent chains, each chain sent in order"""
+    today = today or date.today()
+    start = today - timedelta(days=days)
+    window = f'start_date={start}&end_date={today}'
+    return [
+        [f'/api/dashboard/summary?{window}', '/api/inventory/alerts?limit=10&sort=qty_available'],
+        [f'/api/sales/trend?{window}&granularity={trend_granularity(days)}&points={TREND_POINTS}'],
+        ['/api/sales/by-brand?days=30']
+    ]
+
+
+def refresh_step(days: int, today: date = None) -> List[List[str]]:
+    """Requests for the 5-minute auto-refresh: the summary, then the alerts it reloads"""
+    return range_step(days, today)[:1]
+
+
+def synthetic_session(rng: random.Random, range_changes: int, refreshes: int) -> List[List[List[str]]]:
+    """One session as a list of steps: page load, range changes, then auto-refreshes"""
+    load = range_step(30)
+    load.append(['/api/items/top'])
+    steps = [load]
+    days = 30
+    for _ in range(range_changes):
+        days = rng.choice([d for d in RANGE_BUTTONS if d != days])
+        steps.append(range_step(days))
+    steps.extend(refresh_step(days) for _ in range(refreshes))
+    return steps
+
+
+def load_sessions(path: str) -> List[List[List[List[str]]]]:
+    """Recorded sessions: each JSON line is a list of paths, replayed one request per step"""
+    sessions = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                sessions.append([[[p]] for p in json.loads(line)])
+    return sessions
+
+
+# --- workers -----------------------------------------------------------------
+
+def _cache_counts(metrics_service) -> Dict[str, Dict[str, float]]:
+    counts = defaultdict(dict)
+    for metric in metrics_service.CACHE_REQUESTS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith('_total'):
+                counts[sample.labels['endpoint']][sample.labels['result']] = sample.value
+    return dict(counts)
+
+
+def _serve(app_module, transport, sock: socket.socket, conn):
+    """Worker process: serve the app on the shared socket and answer stats requests on conn"""
+    from werkzeug.serving import make_server
+    import metrics_service
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    transport.reset_calls()
+    server = make_server('127.0.0.1', 0, app_module.app, fd=sock.fileno())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while True:
+        command = conn.recv()
+        if command == 'stats':
+            conn.send({'eci_calls': dict(transport.calls), 'cache': _cache_counts(metrics_service)})
+        elif command == 'stop':
+            server.shutdown()
+            conn.close()
+            return
+
+
+def start_workers(app_module, transport, count: int):
+    """Fork `count` workers accepting on one listening socket; returns (base_url, [(process, conn)])"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(128)
+    context = multiprocessing.get_context('fork')
+    workers = []
+    for _ in range(count):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_serve, args=(app_module, transport, sock, child_conn), daemon=True)
+        process.start()
+        workers.append((process, parent_conn))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f'http://127.0.0.1:{port}', workers
+
+
+def collect_stats(workers) -> Dict:
+    eci_calls, cache = Counter(), defaultdict(Counter)
+    for _, conn in workers:
+        conn.send('stats')
+        stats = conn.recv()
+        eci_calls.update(stats['eci_calls'])
+        for endpoint, results in stats['cache'].items():
+            cache[endpoint].update(results)
+    return {'eci_calls': eci_calls, 'cache': cache}
+
+
+def stop_workers(workers):
+    for process, conn in workers:
+        conn.send('stop')
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+
+
+# --- load generation -----------------------------------------------------------
+
+class Recorder:
+    """Latencies and errors per Flask endpoint, matching the labels of the cache metrics"""
+
+    def __init__(self, app):
+        self._urls = app.url_map.bind('localhost')
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.sessions = 0
+
+    def endpoint(self, path: str) -> str:
+        try:
+            return self._urls.match(path.split('?', 1)[0])[0]
+        except Exception:
+            return 'unknown'
+
+    def request(self, path: str, elapsed_ms: float, ok: bool):
+        endpoint = self.endpoint(path)
+        with self._lock:
+            self.latencies[endpoint].append(elapsed_ms)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+
+def _run_chain(http: requests.Session, base_url: str, chain: List[str], recorder: Recorder):
+    for path in chain:
+        start = time.perf_counter()
+        try:
+            ok = http.get(base_url + path, timeout=120).status_code == 200
+        except requests.RequestException:
+            ok = False
+        recorder.request(path, (time.perf_counter() - start) * 1000, ok)
+
+
+def virtual_user(base_url: str, sessions, deadline: float, think_ms: float, recorder: Recorder, seed: int):
+    """Replay sessions back to back until the deadline; only finished sessions are counted"""
+    rng = random.Random(seed)
+    http = requests.Session()
+    # Browsers keep up to 6 connections per host open
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=6)
+    http.mount('http://', adapter)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        while time.perf_counter() < deadline:
+            for step in sessions(rng):
+                if time.perf_counter() >= deadline:
+                    return
+                for future in [pool.submit(_run_chain, http, base_url, chain, recorder) for chain in step]:
+                    future.result()
+                if think_ms:
+                    time.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+            recorder.session_done()
+
+
+def run(app_module, transport, worker_count: int, args, sessions) -> Dict:
+    # Cold cache for every run; a no-op for SimpleCache, which lives in the forked workers
+    app_module.cache.clear()
+    base_url, workers = start_workers(app_module, transport, worker_count)
+    try:
+        _wait_ready(base_url)
+        before = collect_stats(workers)
+        recorder = Recorder(app_module.app)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        users = [
+            threading.Thread(target=virtual_user, args=(base_url, sessions, deadline, args.think_ms, recorder, seed))
+            for seed in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - started
+        after = collect_stats(workers)
+    finally:
+        stop_workers(workers)
+
+    eci_calls = after['eci_calls'] - before['eci_calls']
+    cache = {
+        endpoint: results - before['cache'].get(endpoint, Counter())
+        for endpoint, results in after['cache'].items()
+    }
+    return {'workers': worker_count, 'elapsed': elapsed, 'recorder': recorder,
+            'eci_calls': eci_calls, 'cache': cache}
+
+
+def _wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            requests.get(base_url + '/metrics', timeout=5)
+            return
+        except requests.RequestException:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def format_run(result: Dict) -> str:
+    recorder = result['recorder']
+    samples = [ms for latencies in recorder.latencies.values() for ms in latencies]
+    sessions = recorder.sessions or 1
+    requests_done = len(samples)
+    lines = [
+        f"workers={result['workers']}: {requests_done / result['elapsed']:.1f} req/s, "
+        f"{recorder.sessions} sessions, p50 {harness.percentile(samples, 50):.1f} ms, "
+        f"p95 {harness.percentile(samples, 95):.1f} ms, p99 {harness.percentile(samples, 99):.1f} ms, "
+        f"{sum(recorder.errors.values())} errors",
+        '  ECI calls/session: ' + (', '.join(
+            f'{op}={n / sessions:.2f}' for op, n in sorted(result['eci_calls'].items())) or '-'),
+        f"  {'endpoint':<24} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'cache hit':>10}"
+    ]
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        counts = result['cache'].get(endpoint, Counter())
+        lookups = counts.get('hit', 0) + counts.get('miss', 0)
+        hit_rate = f"{counts.get('hit', 0) / lookups:.0%}" if lookups else '-'
+        lines.append(f"  {endpoint:<24} {len(latencies):>9} {harness.percentile(latencies, 50):>9.1f} "
+                     f"{harness.percentile(latencies, 99):>9.1f} {hit_rate:>10}")
+    total_hits = sum(c.get('hit', 0) for c in result['cache'].values())
+    total_lookups = total_hits + sum(c.get('miss', 0) for c in result['cache'].values())
+    if total_lookups:
+        lines.append(f"  overall cache hit rate {total_hits / total_lookups:.0%} of {total_lookups:g} lookups")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker process counts')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per worker count')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between page steps')
+    parser.add_argument('--range-changes', type=int, default=2, help='range button clicks per session')
+    parser.add_argument('--refreshes', type=int, default=2, help='5-minute auto-refreshes per session')
+    parser.add_argument('--sessions', default=None, help='JSON lines of recorded request paths to replay')
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated ECI latency')
+    parser.add_argument('--days', type=int, default=90, help='days of history to seed')
+    parser.add_argument('--invoices-per-day', type=int, default=20)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite file')
+    parser.add_argument('--cache-type', default='SimpleCache', help='flask_caching backend for the app')
+    args = parser.parse_args()
+
+    if args.sessions:
+        recorded = load_sessions(args.sessions)
+        sessions = lambda rng: rng.choice(recorded)
+    else:
+        sessions = lambda rng: synthetic_session(rng, args.range_changes, args.refreshes)
+
+    data = eci_stub.SyntheticECI(args.invoices_per_day, items=args.items)
+    transport = eci_stub.StubTransport(data, latency_ms=0)
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'replay.db')}"
+    app_module = harness.load_app(transport, database_url, args.cache_type)
+    harness.seed_database(app_module.eci_service, app_module.db_service, args.days)
+    transport.latency_ms = args.latency_ms
+
+    print(f"database: {database_url.split('@')[-1]}  cache: {args.cache_type}  users: {args.users}  "
+          f"ECI latency: {args.latency_ms:g} ms  {args.duration:g} s per run")
+    for count in [int(n) for n in args.workers.split(',')]:
+        print(format_run(run(app_module, transport, count, args, sessions)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+# cache_serializer.py
+"""msgpack serializer with optional compression for flask_caching backends.
+
+Replaces cachelib's pickle serializer (set as backend.serializer). Values
+are packed with msgpack and, above CACHE_COMPRESS_MIN_SIZE bytes,
+compressed with zstd or lz4. Supported values are:
+
+- cached Flask responses: status, headers and body;
+- datetimes, dates and tuples, through msgpack extension types;
+- lists of same-keyed dicts (sales lines and other records). These are
+  stored column by column. Numeric and datetime columns are packed as
+  raw numpy buffers, so a hit rebuilds the records without parsing every
+  value.
+
+Anything msgpack cannot represent is pickled, and is still compressed.
+Entries written by the pickle serializer (b'!' prefix) and plain integers
+(used by Redis counters) are still read.
+
+Entry layout: one format byte (b'm' msgpack, b'p' pickle), one codec
+byte (b'-' none, b'z' zstd, b'l' lz4), then the payload.
+"""
+import os
+import pickle
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import msgpack
+from flask import Response
+
+import metrics_service
+
+logger = logging.getLogger(__name__)
+
+CACHE_SERIALIZER = os.getenv('CACHE_SERIALIZER', 'msgpack')
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'zstd')
+CACHE_COMPRESS_MIN_SIZE = int(os.getenv('CACHE_COMPRESS_MIN_SIZE', 1024))
+
+_MSGPACK, _PICKLE, _LEGACY_PICKLE = b'm', b'p', b'!'
+_CODEC_BYTES = {'none': b'-', 'zstd': b'z', 'lz4': b'l'}
+
+_EXT_RESPONSE, _EXT_TUPLE, _EXT_DATETIME, _EXT_DATE, _EXT_RECORDS = 1, 2, 3, 4, 5
+# Column kinds: float64, int64 and naive datetime columns travel as numpy buffers
+_NUMPY_COLUMNS = {'f': np.float64, 'i': np.int64, 't': 'datetime64[us]'}
+
+
+def _load_codec(name: str):
+    """(compress, decompress) functions for a codec name, or None when unavailable"""
+    try:
+        if name == 'zstd':
+            import zstandard
+            compressor, decompressor = zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor()
+            return compressor.compress, decompressor.decompress
+        if name == 'lz4':
+            import lz4.frame
+            return lz4.frame.compress, lz4.frame.decompress
+    except ImportError:
+        logger.error(f"{name} is not installed; cache entries are stored uncompressed")
+    return None
+
+
+def _column_kind(values: List) -> str:
+    first = type(values[0])
+    if first is float and all(type(value) is float for value in values):
+        return 'f'
+    if first is int and all(type(value) is int for value in values):
+        return 'i'
+    if first is datetime and all(type(value) is datetime and value.tzinfo is None for value in values):
+        return 't'
+    return 'o'
+
+
+def _pack_records(records: List[Dict]) -> bytes:
+    keys = list(records[0])
+    columns = []
+    for key in keys:
+        values = [record[key] for record in records]
+        kind = _column_kind(values)
+        if kind == 'o':
+            columns.append((kind, values))
+        else:
+            try:
+                columns.append((kind, np.array(values, dtype=_NUMPY_COLUMNS[kind]).tobytes()))
+            except OverflowError:
+                columns.append(('o', values))
+    return _packb([keys, columns])
+
+
+def _unpack_records(data: bytes) -> List[Dict]:
+    keys, columns = _unpackb(data)
+    values = [
+        column if kind == 'o' else np.frombuffer(column, dtype=_NUMPY_COLUMNS[kind]).tolist()
+        for kind, column in columns
+    ]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def _is_records(value: List) -> bool:
+    if len(value) < 2 or type(value[0]) is not dict:
+        return False
+    keys = value[0].keys()
+    return all(isinstance(key, str) for key in keys) and all(
+        type(record) is dict and record.keys() == keys for record in value
+    )
+
+
+def _default(value: Any):
+    if isinstance(value, Response):
+        return msgpack.ExtType(_EXT_RESPONSE, _packb([value.status_code, list(value.headers.items()), value.get_data()]))
+    if isinstance(value, tuple):
+        return msgpack.ExtType(_EXT_TUPLE, _packb(list(value)))
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not msgpack serializable")
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == _EXT_RESPONSE:
+        status, headers, body = _unpackb(data)
+        return Response(body, status=status, headers=headers)
+    if code == _EXT_TUPLE:
+        return tuple(_unpackb(data))
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == _EXT_RECORDS:
+        return _unpack_records(data)
+    return msgpack.ExtType(code, data)
+
+
+def _prepare(value: Any) -> Any:
+    """Replace record lists inside plain containers with their columnar extension"""
+    if type(value) is list:
+        if _is_records(value):
+            return msgpack.ExtType(_EXT_RECORDS, _pack_records(value))
+        if value and isinstance(value[0], (list, dict)):
+            return [_prepare(item) for item in value]
+    elif type(value) is dict:
+        return {key: _prepare(item) for key, item in value.items()}
+    return value
+
+
+def _packb(value: Any) -> bytes:
+    # strict_types sends tuples and dict subclasses through _default instead of packing them as lists/maps
+    return msgpack.packb(_prepare(value), default=_default, strict_types=True, use_bin_type=True)
+
+
+def _unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+class CacheSerializer:
+    """cachelib serializer (dumps/loads) packing with msgpack and compressing large entries"""
+
+    def __init__(self, compression: str = CACHE_COMPRESSION, min_size: int = CACHE_COMPRESS_MIN_SIZE):
+        if compression not in _CODEC_BYTES:
+            raise ValueError(f"compression must be one of {', '.join(_CODEC_BYTES)}")
+        codec = _load_codec(compression)
+        self.compression = compression if codec else 'none'
+        self.min_size = min_size
+        self._compress = codec[0] if codec else None
+        # Other codecs are loaded on first read of an entry written with them
+        self._decompressors = {_CODEC_BYTES[compression]: codec[1]} if codec else {}
+        self._lock = threading.Lock()
+        self._serialized_bytes = 0
+        self._stored_bytes = 0
+
+    def dumps(self, value: Any) -> bytes:
+        if type(value) is int:
+            # Plain integers stay readable by Redis INCR/DECR
+            return str(value).encode('ascii')
+        try:
+            kind, payload = _MSGPACK, _packb(value)
+        except (TypeError, ValueError, OverflowError):
+            kind, payload = _PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        codec = _CODEC_BYTES['none']
+        stored = payload
+        if self._compress is not None and len(payload) >= self.min_size:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                codec, stored = _CODEC_BYTES[self.compression], compressed
+        self._observe(len(payload), len(stored) + 2)
+        return kind + codec + stored
+
+    def loads(self, value: Optional[bytes]) -> Any:
+        if value is None:
+            return None
+        kind = value[:1]
+        if kind == _LEGACY_PICKLE:
+            try:
+                return pickle.loads(value[1:])
+            except pickle.PickleError:
+                return None
+        if kind not in (_MSGPACK, _PICKLE):
+            try:
+                return int(value)
+            except ValueError:
+                return value
+        payload = value[2:]
+        codec = value[1:2]
+        if codec != _CODEC_BYTES['none']:
+            decompress = self._decompressors.get(codec) or self._decompressor(codec)
+            if decompress is None:
+                # Written by a worker with a codec this one lacks: treat as a miss
+                return None
+            payload = decompress(payload)
+        return _unpackb(payload) if kind == _MSGPACK else pickle.loads(payload)
+
+    def _decompressor(self, codec: bytes):
+        name = next(name for name, code in _CODEC_BYTES.items() if code == codec)
+        loaded = _load_codec(name)
+        self._decompressors[codec] = loaded[1] if loaded else None
+        return self._decompressors[codec]
+
+    def _observe(self, serialized: int, stored: int):
+        with self._lock:
+            self._serialized_bytes += serialized
+            self._stored_bytes += stored
+        metrics_service.observe_cache_value(serialized, stored)
+
+    def stats(self) -> Dict:
+        """Bytes written by this process before and after compression, and their ratio"""
+        with self._lock:
+            serialized, stored = self._serialized_bytes, self._stored_bytes
+        return {
+            'serializer': 'msgpack',
+            'compression': self.compression,
+            'min_size': self.min_size,
+            'serialized_bytes': serialized,
+            'stored_bytes': stored,
+            'compression_ratio': round(serialized / stored, 3) if stored else None
+        }
+
+
+def install(backend) -> Optional[CacheSerializer]:
+    """Swap a cachelib backend's pickle serializer for CacheSerializer (CACHE_SERIALIZER=msgpack)"""
+    if CACHE_SERIALIZER != 'msgpack' or not hasattr(backend, 'serializer'):
+        return None
+    backend.serializer = CacheSerializer()
+    return backend.serializer
@@ -0,0 +1,59 @@
+# chart_specs.py
+import json
+import math
+import logging
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _to_list(values) -> List:
+    """Convert array-like values to a JSON-safe list (NaN/inf -> None, dates -> ISO strings)"""
+    if isinstance(values, (pd.DatetimeIndex, pd.Series)) and pd.api.types.is_datetime64_any_dtype(values):
+        return np.datetime_as_string(pd.DatetimeIndex(values).values, unit='s').tolist()
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return np.datetime_as_string(arr, unit='s').tolist()
+    if np.issubdtype(arr.dtype, np.floating):
+        result = arr.tolist()
+        if not np.isfinite(arr).all():
+            result = [v if math.isfinite(v) else None for v in result]
+        return result
+    return arr.tolist()
+
+
+def _trace(trace_type: str, data: Dict[str, Any], attrs: Dict[str, Any]) -> Dict:
+    trace = dict(attrs)
+    for key, values in data.items():
+        trace[key] = _to_list(values)
+    trace['type'] = trace_type
+    return trace
+
+
+def scatter(x, y, **attrs) -> Dict:
+    """Build a scatter trace dict equivalent to plotly.graph_objs.Scatter(...).to_plotly_json()"""
+    return _trace('scatter', {'x': x, 'y': y}, attrs)
+
+
+def bar(x, y, **attrs) -> Dict:
+    """Build a bar trace dict equivalent to plotly.graph_objs.Bar(...).to_plotly_json()"""
+    return _trace('bar', {'x': x, 'y': y}, attrs)
+
+
+def pie(labels, values, **attrs) -> Dict:
+    """Build a pie trace dict equivalent to plotly.graph_objs.Pie(...).to_plotly_json()"""
+    return _trace('pie', {'labels': labels, 'values': values}, attrs)
+
+
+def to_json(traces: List[Dict]) -> str:
+    """Serialize trace dicts to the same JSON the PlotlyJSONEncoder path produced"""
+    return json.dumps(traces)
+
+
+def to_figure(traces: List[Dict], layout: Dict = None):
+    """Build a validated plotly Figure; plotly is only imported when this is called"""
+    import plotly.graph_objs as go
+    return go.Figure(data=traces, layout=layout or {})
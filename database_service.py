@@ -1,23 +1,138 @@
 # services/database_service.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Date, ForeignKey, Index
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Date, Boolean, LargeBinary, Text, ForeignKey, Index, func, case, cast, inspect, text, select, tuple_
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker, relationship, scoped_session, Session as SQLSession
+from sqlalchemy.pool import QueuePool
 from datetime import datetime, date, timedelta
+from contextlib import contextmanager
+from contextvars import ContextVar
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import os
+import json
+import time
+import threading
+import numpy as np
+from flask import has_request_context, request
+import metrics_service
+from metrics_service import track_db
+import profiling_service
+from partition_service import PartitionManager
+from forecast_service import ForecastState, HISTORY_DAYS, NO_DEMAND_DAYS_OF_SUPPLY
+from distinct_sketch import HyperLogLog, hash_values
 
 Base = declarative_base()
 logger = logging.getLogger(__name__)
 
+# Branch recorded for inventory rows that predate per-branch stock
+DEFAULT_BRANCH = os.getenv('DEFAULT_BRANCH', 'MAIN')
+
+# Connection pool for file and server databases (in-memory SQLite keeps its single-connection pool)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# PostgreSQL streaming replica for read-only analytics queries (see DatabaseService.ReadSession)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+# One engine per database URL per process, shared by every DatabaseService
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+_prepared_urls = set()
+_schema_lock = threading.Lock()
+# Set while reads must see the latest writes, e.g. when rendering a report that is stored
+_primary_reads: ContextVar[bool] = ContextVar('primary_reads', default=False)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a connection"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics_service.observe_pool_wait(self._orig_logging_name or 'primary', time.perf_counter() - start)
+
+
+class RequestSession(SQLSession):
+    """Session reused by every DatabaseService call in the Flask request that opened it.
+
+    Inside the request close() only ends the transaction, rolling back whatever a
+    method left uncommitted (including after a caught error), so no connection sits
+    idle in a transaction between calls; the session is discarded at end_request.
+    """
+    
+    def close(self):
+        if not self.info.get('request_scoped'):
+            super().close()
+            return
+        # Detach first so loaded objects stay readable rather than being expired by the rollback
+        self.expunge_all()
+        self.rollback()
+
+
+def _request_scope():
+    return id(request._get_current_object())
+
+
+def _engine_options(database_url: str, role: str) -> Dict:
+    options = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_logging_name': role}
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    return options
+
+
+def get_engine(database_url: str, role: str = 'primary') -> Engine:
+    """The process-wide engine for a database URL, created with the pool settings on first use"""
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            engine = create_engine(database_url, **_engine_options(database_url, role))
+            profiling_service.instrument_engine(engine)
+            
+            @event.listens_for(engine, 'checkout')
+            def on_checkout(dbapi_connection, record, proxy):
+                record.info['checked_out_at'] = time.perf_counter()
+            
+            @event.listens_for(engine, 'checkin')
+            def on_checkin(dbapi_connection, record):
+                started = record.info.pop('checked_out_at', None)
+                if started is not None:
+                    metrics_service.observe_connection_held(role, time.perf_counter() - started)
+            
+            _engines[database_url] = engine
+        return engine
+
+
+def _dispose_engines_after_fork():
+    # Connections inherited from the parent stay with the parent
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
 # Database Models
 class SalesData(Base):
     __tablename__ = 'sales_data'
     
     id = Column(Integer, primary_key=True)
     invoice_id = Column(String(50), index=True)
-    invoice_date = Column(DateTime, index=True)
-    account_number = Column(String(50), index=True)
+    # invoice_date and account_number lookups are served by the composite indexes below
+    invoice_date = Column(DateTime)
+    account_number = Column(String(50))
     item_number = Column(String(50), index=True)
     description = Column(String(255))
     quantity = Column(Float)
@@ -30,13 +145,16 @@ class SalesData(Base):
     __table_args__ = (
         Index('idx_sales_date_item', 'invoice_date', 'item_number'),
         Index('idx_sales_account_date', 'account_number', 'invoice_date'),
+        # High-water-mark scans for incremental readers such as the hot sales cache
+        Index('idx_sales_created_at', 'created_at'),
     )
 
 class InventoryLevel(Base):
     __tablename__ = 'inventory_levels'
     
     id = Column(Integer, primary_key=True)
-    item_number = Column(String(50), unique=True, index=True)
+    item_number = Column(String(50), index=True)
+    branch = Column(String(10), default=DEFAULT_BRANCH)
     description = Column(String(255))
     qty_available = Column(Float)
     qty_on_hand = Column(Float)
@@ -44,52 +162,338 @@ class InventoryLevel(Base):
     reorder_point = Column(Float, default=10)
     lead_time = Column(Integer, default=7)
     last_cost = Column(Float)
+    track_on_hand = Column(Boolean, default=True)
+    # qty_available over the item's forecast demand, refreshed nightly by refresh_days_of_supply
+    days_of_supply = Column(Integer, default=NO_DEMAND_DAYS_OF_SUPPLY)
     last_updated = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # One row per item per branch; cross-branch totals are grouped by item_number
+        Index('uq_inventory_item_branch', 'item_number', 'branch', unique=True),
+        # Keyset pagination of a branch's alerts in either sort order
+        Index('idx_inventory_alert_qty', 'branch', 'qty_available', 'item_number'),
+        Index('idx_inventory_alert_supply', 'branch', 'days_of_supply', 'item_number'),
+    )
+    
 class CustomerMetrics(Base):
     __tablename__ = 'customer_metrics'
     
     id = Column(Integer, primary_key=True)
-    account_number = Column(String(50), index=True)
+    account_number = Column(String(50), unique=True, index=True)
     customer_name = Column(String(255))
-    total_revenue = Column(Float)
+    total_revenue = Column(Float, index=True)
     total_orders = Column(Integer)
     last_order_date = Column(Date)
+    # Rolling revenue over the N days ending at windows_as_of
+    revenue_30d = Column(Float, default=0, index=True)
+    revenue_90d = Column(Float, default=0, index=True)
+    revenue_365d = Column(Float, default=0, index=True)
+    windows_as_of = Column(Date)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class ItemForecastState(Base):
+    __tablename__ = 'item_forecast_state'
+    
+    id = Column(Integer, primary_key=True)
+    item_number = Column(String(50), unique=True, index=True)
+    # Serialized ForecastState: daily quantity ring ending at as_of plus running statistics
+    as_of = Column(Date)
+    first_day = Column(Date)
+    ring = Column(LargeBinary)
+    sum_7d = Column(Float, default=0)
+    sum_30d = Column(Float, default=0)
+    sum_90d = Column(Float, default=0)
+    regression = Column(LargeBinary)
+    dow_sums = Column(LargeBinary)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ItemForecast(Base):
+    __tablename__ = 'item_forecasts'
+    
+    id = Column(Integer, primary_key=True)
+    item_number = Column(String(50), unique=True, index=True)
+    avg_daily_demand = Column(Float)
+    avg_weekly_demand = Column(Float)
+    avg_monthly_demand = Column(Float)
+    next_7_days = Column(Float)
+    next_30_days = Column(Float)
+    trend = Column(String(20))
+    trend_percentage = Column(Float)
+    reorder_point = Column(Float)
+    safety_stock = Column(Float)
+    lead_time_demand = Column(Float)
+    sales_days = Column(Integer)
+    as_of = Column(Date)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class DailySalesSketch(Base):
+    __tablename__ = 'daily_sales_sketches'
+    
+    id = Column(Integer, primary_key=True)
+    sale_date = Column(Date, nullable=False)
+    # 'all' (one row per day, empty member), 'vendor', 'account' or 'item'
+    dimension = Column(String(10), nullable=False)
+    member = Column(String(50), nullable=False, default='')
+    revenue = Column(Float, default=0)
+    quantity = Column(Float, default=0)
+    # Serialized HyperLogLog sketches of distinct invoices, items and accounts (see SKETCH_DIMENSIONS)
+    invoices = Column(LargeBinary)
+    items = Column(LargeBinary)
+    accounts = Column(LargeBinary)
+    description = Column(String(255))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('uq_sketch_dimension_member_date', 'dimension', 'member', 'sale_date', unique=True),
+        Index('idx_sketch_dimension_date', 'dimension', 'sale_date'),
+    )
+
+class SalesCoverage(Base):
+    __tablename__ = 'sales_coverage'
+    
+    id = Column(Integer, primary_key=True)
+    sale_date = Column(Date, unique=True, index=True, nullable=False)
+    # What is stored, maintained by store_sales_data
+    row_count = Column(Integer, default=0)
+    invoice_count = Column(Integer, default=0)
+    revenue = Column(Float, default=0)
+    last_ingested_at = Column(DateTime)
+    # Set when replace_sales_day swapped out stored rows; readers holding copies of rows reload
+    replaced_at = Column(DateTime)
+    # What ECI reported for the day when it was last verified (see ECIApiService.get_invoice_summaries)
+    source_invoices = Column(Integer)
+    source_total = Column(Float)
+    source_checksum = Column(String(40))
+    checked_at = Column(DateTime)
+
+class DailyReport(Base):
+    __tablename__ = 'daily_reports'
+    
+    id = Column(Integer, primary_key=True)
+    report_date = Column(Date, nullable=False)
+    # Empty for the company-wide report
+    branch = Column(String(10), nullable=False, default='')
+    # The rendered /api/reports/daily payload and the full per-day totals range reports merge (JSON)
+    report = Column(Text, nullable=False)
+    totals = Column(Text, nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('uq_daily_report_date_branch', 'report_date', 'branch', unique=True),
+    )
+
+CUSTOMER_WINDOWS = (30, 90, 365)
+# Sales column each sketch dimension groups by, and the distinct counts sketched for every member
+SKETCH_DIMENSIONS = {
+    'all': (None, ('invoices', 'items', 'accounts')),
+    'vendor': ('vendor_code', ('invoices', 'items')),
+    'account': ('account_number', ('invoices',)),
+    'item': ('item_number', ('invoices',)),
+}
+_SKETCH_SOURCES = {'invoices': 'invoice_id', 'items': 'item_number', 'accounts': 'account_number'}
+ALERT_SORTS = ('qty_available', 'days_of_supply')
+
+
+def _window_column(days: Optional[int]) -> str:
+    """CustomerMetrics revenue column for a rolling window in days, or all-time when None"""
+    if days is None:
+        return 'total_revenue'
+    if days not in CUSTOMER_WINDOWS:
+        raise ValueError(f"Unsupported window: {days} days")
+    return f'revenue_{days}d'
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _combine_lines(sales_data: List[Dict]) -> Dict[Tuple[Any, str], Dict]:
+    """Sales lines keyed by (invoice_id, item_number); repeated lines for one item on an invoice are combined"""
+    lines = {}
+    for sale in sales_data:
+        key = (sale['invoice_id'], sale['item_number'])
+        if key in lines:
+            lines[key]['quantity'] += sale['quantity']
+            lines[key]['extended_price'] += sale['extended_price']
+        else:
+            lines[key] = dict(sale)
+    return lines
+
+
+def _json_default(value):
+    """Serialize numpy scalars and dates left in report payloads"""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _daily_sketches(sales: List[Dict]) -> Dict[Tuple[date, str, str], Dict]:
+    """Revenue, quantity and distinct-count sketches of sales lines per (day, dimension, member)"""
+    hashes = {
+        name: hash_values([str(sale.get(column) or '') for sale in sales])
+        for name, column in _SKETCH_SOURCES.items()
+    }
+    groups = {}
+    for position, sale in enumerate(sales):
+        day = _as_date(sale['invoice_date'])
+        for dimension, (column, _) in SKETCH_DIMENSIONS.items():
+            member = '' if column is None else (sale.get(column) or '')
+            group = groups.get((day, dimension, member))
+            if group is None:
+                group = groups[(day, dimension, member)] = {
+                    'revenue': 0.0, 'quantity': 0.0, 'positions': [],
+                    'description': sale.get('description') if dimension == 'item' else None
+                }
+            group['revenue'] += sale['extended_price'] or 0
+            group['quantity'] += sale['quantity'] or 0
+            group['positions'].append(position)
+    
+    for (_, dimension, _), group in groups.items():
+        positions = np.asarray(group.pop('positions'))
+        for name in SKETCH_DIMENSIONS[dimension][1]:
+            group[name] = HyperLogLog()
+            group[name].add_hashes(hashes[name][positions])
+    return groups
+
+
 class DatabaseService:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, replica_url: str = None):
         self.database_url = database_url or os.getenv('DATABASE_URL', 'sqlite:///eci_dashboard.db')
-        self.engine = create_engine(self.database_url)
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        self.engine = get_engine(self.database_url)
+        # On PostgreSQL sales_data is created range-partitioned by month before create_all sees it
+        self.partitions = PartitionManager(self.engine, SalesData.__table__)
+        with _schema_lock:
+            if self.database_url not in _prepared_urls:
+                try:
+                    self.partitions.prepare()
+                except Exception as e:
+                    logger.error(f"Error preparing sales_data partitions: {str(e)}")
+                Base.metadata.create_all(self.engine)
+                self._migrate_schema()
+                _prepared_urls.add(self.database_url)
+        
+        # Read-only analytics queries go to the replica when the primary is PostgreSQL and one is configured
+        replica_url = replica_url or DATABASE_REPLICA_URL
+        if replica_url and self.engine.dialect.name == 'postgresql':
+            self.read_engine = get_engine(replica_url, 'replica')
+        else:
+            self.read_engine = self.engine
+        self._factories = {'primary': sessionmaker(bind=self.engine, class_=RequestSession)}
+        self._factories['replica'] = (
+            sessionmaker(bind=self.read_engine, class_=RequestSession)
+            if self.read_engine is not self.engine else self._factories['primary']
+        )
+        self._request_sessions = {'primary': scoped_session(self._factories['primary'], scopefunc=_request_scope)}
+        self._request_sessions['replica'] = (
+            scoped_session(self._factories['replica'], scopefunc=_request_scope)
+            if self.read_engine is not self.engine else self._request_sessions['primary']
+        )
+    
+    def Session(self) -> SQLSession:
+        """Session on the primary; inside a Flask request the same one is returned until end_request"""
+        return self._open_session('primary')
     
+    def ReadSession(self) -> SQLSession:
+        """Session for read-only analytics queries, on the replica unless primary_reads() is active"""
+        return self._open_session('primary' if _primary_reads.get() else 'replica')
+    
+    def _open_session(self, role: str) -> SQLSession:
+        if not has_request_context():
+            return self._factories[role]()
+        session = self._request_sessions[role]()
+        session.info['request_scoped'] = True
+        return session
+    
+    def end_request(self):
+        """Close the sessions the current request used (Flask teardown)"""
+        for registry in {id(registry): registry for registry in self._request_sessions.values()}.values():
+            if registry.registry.has():
+                registry().info['request_scoped'] = False
+                registry.remove()
+    
+    @contextmanager
+    def primary_reads(self):
+        """Route ReadSession to the primary, for reads whose result is written back"""
+        token = _primary_reads.set(True)
+        try:
+            yield
+        finally:
+            _primary_reads.reset(token)
+    
+    def _migrate_schema(self):
+        """Add model columns missing from existing tables (create_all never alters a table)"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                        logger.info(f"Added column {table.name}.{column.name}")
+            self._migrate_inventory(conn, inspector)
+    
+    def _migrate_inventory(self, conn, inspector):
+        """Move single-branch inventory tables to one row per item per branch and fill new columns"""
+        table = InventoryLevel.__table__
+        indexes = {index['name']: index for index in inspector.get_indexes(table.name)}
+        legacy = indexes.get('ix_inventory_levels_item_number')
+        if legacy is not None and legacy['unique']:
+            # item_number used to be unique on its own; the index is recreated non-unique below
+            conn.execute(text('DROP INDEX ix_inventory_levels_item_number'))
+            logger.info(f"Dropped unique index on {table.name}.item_number")
+        updated = conn.execute(
+            table.update().where(table.c.branch.is_(None)).values(branch=DEFAULT_BRANCH)
+        ).rowcount
+        if updated:
+            logger.info(f"Assigned {updated} inventory rows to branch {DEFAULT_BRANCH}")
+        conn.execute(self._days_of_supply_update().where(table.c.days_of_supply.is_(None)))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    
+    @track_db
     def store_sales_data(self, sales_data: List[Dict]) -> bool:
-        """Store sales data in the database"""
+        """Store sales data in the database and fold new rows into customer metrics"""
+        try:
+            # Partitions are created on their own connection and need an exclusive lock on
+            # sales_data, so this must happen before our session reads the table
+            self.partitions.ensure_months(_as_date(sale['invoice_date']) for sale in sales_data)
+        except Exception as e:
+            logger.error(f"Error creating sales_data partitions: {str(e)}")
+            return False
         session = self.Session()
         try:
-            for sale in sales_data:
-                # Check if record already exists
-                existing = session.query(SalesData).filter_by(
-                    invoice_id=sale['invoice_id'],
-                    item_number=sale['item_number']
-                ).first()
-                
-                if not existing:
-                    record = SalesData(
-                        invoice_id=sale['invoice_id'],
-                        invoice_date=sale['invoice_date'],
-                        account_number=sale['account_number'],
-                        item_number=sale['item_number'],
-                        description=sale.get('description', ''),
-                        quantity=sale['quantity'],
-                        unit_price=sale.get('unit_price', 0),
-                        extended_price=sale['extended_price'],
-                        branch=sale.get('branch', ''),
-                        vendor_code=sale.get('vendor_code', '')
+            lines = _combine_lines(sales_data)
+            
+            # Look up already-stored lines per batch of invoices rather than per row
+            invoice_ids = list({invoice_id for invoice_id, _ in lines})
+            existing = set()
+            for i in range(0, len(invoice_ids), 500):
+                existing.update(
+                    (row.invoice_id, row.item_number)
+                    for row in session.query(SalesData.invoice_id, SalesData.item_number).filter(
+                        SalesData.invoice_id.in_(invoice_ids[i:i + 500])
                     )
-                    session.add(record)
+                )
+            known_invoices = {invoice_id for invoice_id, _ in existing}
+            new_sales = [sale for key, sale in lines.items() if key not in existing]
+            
+            if new_sales:
+                # Roll the windows forward before inserting so expiring days are read from stored rows only
+                as_of = self._advance_customer_windows(
+                    session, max(_as_date(sale['invoice_date']) for sale in new_sales)
+                )
+                self._insert_sales(session, new_sales)
+                self._apply_customer_metrics(session, new_sales, known_invoices, as_of)
+                self._apply_forecast_states(session, new_sales)
+                self._apply_sales_sketches(session, new_sales)
+                self._apply_sales_coverage(session, new_sales, known_invoices)
+                self._invalidate_daily_reports(session, new_sales)
             
             session.commit()
             return True
@@ -101,32 +505,889 @@ class DatabaseService:
         finally:
             session.close()
     
+    @track_db
+    def replace_sales_day(self, sale_date: date, sales_data: List[Dict]) -> bool:
+        """Replace one day's stored sales with a fresh fetch of that day.
+
+        Unlike store_sales_data, lines edited or removed at the source are
+        repaired. The stored rows' revenue and quantities are taken back out
+        of customer metrics and forecast states, and orders of invoices that
+        disappeared are taken off their customers. The day's sketches and
+        ledger counts are rebuilt from the new rows, as distinct counts
+        cannot be subtracted.
+        """
+        try:
+            self.partitions.ensure_months([sale_date])
+        except Exception as e:
+            logger.error(f"Error creating sales_data partitions: {str(e)}")
+            return False
+        session = self.Session()
+        try:
+            day_start = datetime.combine(sale_date, datetime.min.time())
+            in_day = (SalesData.invoice_date >= day_start, SalesData.invoice_date < day_start + timedelta(days=1))
+            stored = [
+                row._asdict()
+                for row in session.query(
+                    SalesData.invoice_id, SalesData.invoice_date, SalesData.account_number,
+                    SalesData.item_number, SalesData.quantity, SalesData.extended_price
+                ).filter(*in_day)
+            ]
+            new_sales = list(_combine_lines(sales_data).values())
+            if not stored and not new_sales:
+                return True
+            
+            as_of = self._advance_customer_windows(session, sale_date)
+            stored_invoices = {row['invoice_id'] for row in stored}
+            if stored:
+                removed = [
+                    dict(row, quantity=-(row['quantity'] or 0), extended_price=-(row['extended_price'] or 0))
+                    for row in stored
+                ]
+                self._apply_customer_metrics(session, removed, stored_invoices, as_of)
+                self._apply_forecast_states(session, removed)
+                session.query(SalesData).filter(*in_day).delete(synchronize_session=False)
+                self._remove_customer_orders(
+                    session, stored, stored_invoices - {sale['invoice_id'] for sale in new_sales}
+                )
+            session.query(DailySalesSketch).filter(
+                DailySalesSketch.sale_date == sale_date
+            ).delete(synchronize_session=False)
+            
+            record = session.query(SalesCoverage).filter(SalesCoverage.sale_date == sale_date).first()
+            if record is None:
+                record = SalesCoverage(sale_date=sale_date)
+                session.add(record)
+            record.row_count, record.invoice_count, record.revenue = 0, 0, 0.0
+            record.last_ingested_at = datetime.utcnow()
+            if stored:
+                record.replaced_at = record.last_ingested_at
+            
+            self._insert_sales(session, new_sales)
+            self._apply_customer_metrics(session, new_sales, stored_invoices, as_of)
+            self._apply_forecast_states(session, new_sales)
+            self._apply_sales_sketches(session, new_sales)
+            self._apply_sales_coverage(session, new_sales, set())
+            self._invalidate_daily_reports(session, stored + new_sales)
+            
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error replacing sales for {sale_date}: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    def _insert_sales(self, session, new_sales: List[Dict]):
+        for sale in new_sales:
+            session.add(SalesData(
+                invoice_id=sale['invoice_id'],
+                invoice_date=sale['invoice_date'],
+                account_number=sale['account_number'],
+                item_number=sale['item_number'],
+                description=sale.get('description', ''),
+                quantity=sale['quantity'],
+                unit_price=sale.get('unit_price', 0),
+                extended_price=sale['extended_price'],
+                branch=sale.get('branch', ''),
+                vendor_code=sale.get('vendor_code', '')
+            ))
+    
+    def _remove_customer_orders(self, session, stored: List[Dict], gone_invoices: set):
+        """Take deleted invoices off their customers' order counts and last order dates;
+        customers left without any stored sales are dropped"""
+        gone = {}
+        for row in stored:
+            if row['invoice_id'] in gone_invoices:
+                gone.setdefault(row['account_number'], set()).add(row['invoice_id'])
+        if not gone:
+            return
+        last_orders = dict(session.query(
+            SalesData.account_number, func.max(SalesData.invoice_date)
+        ).filter(SalesData.account_number.in_(list(gone))).group_by(SalesData.account_number).all())
+        for record in session.query(CustomerMetrics).filter(CustomerMetrics.account_number.in_(list(gone))):
+            if record.account_number not in last_orders:
+                session.delete(record)
+                continue
+            record.total_orders = max((record.total_orders or 0) - len(gone[record.account_number]), 0)
+            record.last_order_date = _as_date(last_orders[record.account_number])
+    
+    def _apply_sales_sketches(self, session, new_sales: List[Dict]):
+        """Fold newly stored lines into the per-day sketches; merging is a register maximum,
+        so invoices already counted on a day are not counted twice"""
+        groups = _daily_sketches(new_sales)
+        records = {}
+        days = sorted({day for day, _, _ in groups})
+        for record in session.query(DailySalesSketch).filter(DailySalesSketch.sale_date.in_(days)):
+            records[(record.sale_date, record.dimension, record.member)] = record
+        
+        for (day, dimension, member), group in groups.items():
+            record = records.get((day, dimension, member))
+            if record is None:
+                session.add(DailySalesSketch(**self._sketch_mapping(day, dimension, member, group)))
+                continue
+            record.revenue = (record.revenue or 0) + group['revenue']
+            record.quantity = (record.quantity or 0) + group['quantity']
+            record.description = record.description or group['description']
+            for name in SKETCH_DIMENSIONS[dimension][1]:
+                stored = getattr(record, name)
+                if stored is not None:
+                    group[name].update(HyperLogLog.from_bytes(stored))
+                setattr(record, name, group[name].to_bytes())
+    
+    def _sketch_mapping(self, day: date, dimension: str, member: str, group: Dict) -> Dict:
+        mapping = {
+            'sale_date': day, 'dimension': dimension, 'member': member,
+            'revenue': group['revenue'], 'quantity': group['quantity'], 'description': group['description']
+        }
+        for name in SKETCH_DIMENSIONS[dimension][1]:
+            mapping[name] = group[name].to_bytes()
+        return mapping
+    
+    @track_db
+    def rebuild_sales_sketches(self) -> bool:
+        """Recompute every day's sketches from stored sales, a month of rows at a time"""
+        session = self.Session()
+        try:
+            session.query(DailySalesSketch).delete()
+            first, last = session.query(func.min(SalesData.invoice_date), func.max(SalesData.invoice_date)).one()
+            day = _as_date(first)
+            while first is not None and day <= _as_date(last):
+                chunk_end = day + timedelta(days=31)
+                rows = session.query(
+                    SalesData.invoice_id, SalesData.invoice_date, SalesData.account_number, SalesData.item_number,
+                    SalesData.description, SalesData.quantity, SalesData.extended_price, SalesData.vendor_code
+                ).filter(
+                    SalesData.invoice_date >= datetime.combine(day, datetime.min.time()),
+                    SalesData.invoice_date < datetime.combine(chunk_end, datetime.min.time())
+                )
+                groups = _daily_sketches([row._asdict() for row in rows])
+                session.bulk_insert_mappings(DailySalesSketch, [
+                    self._sketch_mapping(*key, group) for key, group in groups.items()
+                ])
+                day = chunk_end
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding sales sketches: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def has_sales_sketches(self) -> bool:
+        session = self.Session()
+        try:
+            return session.query(DailySalesSketch.id).first() is not None
+        finally:
+            session.close()
+    
+    @track_db
+    def get_sales_sketches(self, dimension: str, start_date: date, end_date: date) -> Dict[str, Dict]:
+        """Revenue, quantity and merged distinct-count sketches per member of a dimension
+        over stored days from start_date through end_date"""
+        if dimension not in SKETCH_DIMENSIONS:
+            raise ValueError(f"dimension must be one of {', '.join(SKETCH_DIMENSIONS)}")
+        names = SKETCH_DIMENSIONS[dimension][1]
+        session = self.ReadSession()
+        try:
+            rows = session.query(
+                DailySalesSketch.member, DailySalesSketch.revenue, DailySalesSketch.quantity,
+                DailySalesSketch.description, *[getattr(DailySalesSketch, name) for name in names]
+            ).filter(
+                DailySalesSketch.dimension == dimension,
+                DailySalesSketch.sale_date >= start_date,
+                DailySalesSketch.sale_date <= end_date
+            )
+            merged = {}
+            for row in rows:
+                entry = merged.get(row.member)
+                if entry is None:
+                    entry = merged[row.member] = dict(
+                        {name: HyperLogLog() for name in names},
+                        revenue=0.0, quantity=0.0, description=row.description
+                    )
+                entry['revenue'] += row.revenue or 0
+                entry['quantity'] += row.quantity or 0
+                for name in names:
+                    entry[name].update(HyperLogLog.from_bytes(getattr(row, name)))
+            return merged
+        finally:
+            session.close()
+    
+    def _apply_sales_coverage(self, session, new_sales: List[Dict], known_invoices: set):
+        """Add newly stored rows to the coverage ledger's per-day counts"""
+        days = {}
+        for sale in new_sales:
+            day = days.setdefault(_as_date(sale['invoice_date']), {'rows': 0, 'revenue': 0.0, 'invoices': set()})
+            day['rows'] += 1
+            day['revenue'] += sale['extended_price'] or 0
+            if sale['invoice_id'] not in known_invoices:
+                day['invoices'].add(sale['invoice_id'])
+        
+        records = {
+            record.sale_date: record
+            for record in session.query(SalesCoverage).filter(SalesCoverage.sale_date.in_(list(days)))
+        }
+        now = datetime.utcnow()
+        for sale_date, day in days.items():
+            record = records.get(sale_date)
+            if record is None:
+                record = SalesCoverage(sale_date=sale_date, row_count=0, invoice_count=0, revenue=0.0)
+                session.add(record)
+            record.row_count = (record.row_count or 0) + day['rows']
+            record.invoice_count = (record.invoice_count or 0) + len(day['invoices'])
+            record.revenue = (record.revenue or 0) + day['revenue']
+            record.last_ingested_at = now
+    
+    def _invalidate_daily_reports(self, session, new_sales: List[Dict]):
+        """Drop stored reports of days that gained rows, and of the following days that compare against them"""
+        days = {_as_date(sale['invoice_date']) for sale in new_sales}
+        days |= {day + timedelta(days=1) for day in days}
+        session.query(DailyReport).filter(DailyReport.report_date.in_(list(days))).delete(synchronize_session=False)
+    
+    @track_db
+    def store_daily_report(self, report_date: date, branch: Optional[str], report: Dict, totals: Dict) -> bool:
+        """Persist a closed day's rendered report, replacing any stored one"""
+        session = self.Session()
+        try:
+            session.query(DailyReport).filter(
+                DailyReport.report_date == report_date,
+                DailyReport.branch == (branch or '')
+            ).delete(synchronize_session=False)
+            session.add(DailyReport(
+                report_date=report_date,
+                branch=branch or '',
+                report=json.dumps(report, default=_json_default),
+                totals=json.dumps(totals, default=_json_default)
+            ))
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error storing daily report for {report_date}: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def get_daily_reports(self, start_date: date, end_date: date, branch: Optional[str] = None) -> Dict[date, Dict]:
+        """Stored reports from start_date through end_date as {date: {'report', 'totals', 'generated_at'}}"""
+        session = self.Session()
+        try:
+            return {
+                record.report_date: {
+                    'report': json.loads(record.report),
+                    'totals': json.loads(record.totals),
+                    'generated_at': record.generated_at
+                }
+                for record in session.query(DailyReport).filter(
+                    DailyReport.report_date >= start_date,
+                    DailyReport.report_date <= end_date,
+                    DailyReport.branch == (branch or '')
+                )
+            }
+        finally:
+            session.close()
+    
+    @track_db
+    def rebuild_sales_coverage(self) -> bool:
+        """Recompute the ledger's stored counts for every day from sales_data, keeping source checksums"""
+        session = self.Session()
+        try:
+            sale_day = func.date(SalesData.invoice_date)
+            results = session.query(
+                sale_day.label('day'),
+                func.count(SalesData.id).label('rows'),
+                func.count(func.distinct(SalesData.invoice_id)).label('invoices'),
+                func.sum(SalesData.extended_price).label('revenue'),
+                func.max(SalesData.created_at).label('ingested')
+            ).group_by(sale_day).all()
+            
+            records = {record.sale_date: record for record in session.query(SalesCoverage)}
+            for result in results:
+                # SQLite returns date() as an ISO string
+                day = date.fromisoformat(result.day) if isinstance(result.day, str) else _as_date(result.day)
+                record = records.pop(day, None)
+                if record is None:
+                    record = SalesCoverage(sale_date=day)
+                    session.add(record)
+                record.row_count = result.rows
+                record.invoice_count = result.invoices
+                record.revenue = float(result.revenue or 0)
+                record.last_ingested_at = result.ingested
+            for record in records.values():
+                record.row_count, record.invoice_count, record.revenue = 0, 0, 0.0
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding sales coverage: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def has_sales_coverage(self) -> bool:
+        session = self.Session()
+        try:
+            return session.query(SalesCoverage.id).first() is not None
+        finally:
+            session.close()
+    
+    @track_db
+    def get_sales_coverage(self, start_date: date, end_date: date) -> List[Dict]:
+        """Ledger rows for stored days from start_date through end_date, oldest first"""
+        session = self.Session()
+        try:
+            return [
+                {
+                    'date': record.sale_date.isoformat(),
+                    'row_count': record.row_count or 0,
+                    'invoice_count': record.invoice_count or 0,
+                    'revenue': round(record.revenue or 0, 2),
+                    'last_ingested_at': record.last_ingested_at.isoformat() if record.last_ingested_at else None,
+                    'source_invoices': record.source_invoices,
+                    'source_total': record.source_total,
+                    'source_checksum': record.source_checksum,
+                    'checked_at': record.checked_at.isoformat() if record.checked_at else None
+                }
+                for record in session.query(SalesCoverage).filter(
+                    SalesCoverage.sale_date >= start_date,
+                    SalesCoverage.sale_date <= end_date
+                ).order_by(SalesCoverage.sale_date)
+            ]
+        finally:
+            session.close()
+
+    @track_db
+    def get_stored_days(self, start_date: date, end_date: date) -> set:
+        """Days from start_date through end_date whose sales are ingested, per the coverage ledger.
+
+        Days without a ledger row (never ingested, or a gap) must come from ECI.
+        Until the ledger has been built, days with any stored rows count instead.
+        """
+        session = self.ReadSession()
+        try:
+            days = {
+                record.sale_date
+                for record in session.query(SalesCoverage.sale_date).filter(
+                    SalesCoverage.sale_date >= start_date,
+                    SalesCoverage.sale_date <= end_date
+                )
+            }
+            if days or session.query(SalesCoverage.id).first() is not None:
+                return days
+
+            sale_day = func.date(SalesData.invoice_date)
+            results = session.query(sale_day).filter(
+                SalesData.invoice_date >= datetime.combine(start_date, datetime.min.time()),
+                SalesData.invoice_date <= datetime.combine(end_date, datetime.max.time())
+            ).distinct()
+            # SQLite returns date() as an ISO string
+            return {date.fromisoformat(day) if isinstance(day, str) else _as_date(day) for day, in results}
+        finally:
+            session.close()
+
+    @track_db
+    def get_last_replacement(self) -> Optional[datetime]:
+        """When replace_sales_day last swapped out stored rows, or None if it never has"""
+        session = self.ReadSession()
+        try:
+            return session.query(func.max(SalesCoverage.replaced_at)).scalar()
+        finally:
+            session.close()
+
+    @track_db
+    def find_coverage_gaps(self, summaries: Dict[date, Dict]) -> List[date]:
+        """Days whose stored sales do not match the source summaries and need fetching.
+
+        A day verified before is a gap when the source's header checksum has
+        changed since. A day never verified (rows ingested before the ledger
+        existed) matches when its stored invoice ids are exactly the source's;
+        header totals include tax and freight, so they are not compared with
+        stored line revenue. Matching days are stamped with the source
+        checksum so later checks compare digests only.
+        """
+        session = self.Session()
+        try:
+            records = {
+                record.sale_date: record
+                for record in session.query(SalesCoverage).filter(SalesCoverage.sale_date.in_(list(summaries)))
+            }
+            unverified = [day for day in summaries if records.get(day) is None or records[day].source_checksum is None]
+            stored_invoices = self._invoice_ids_by_day(session, unverified)
+            gaps = []
+            now = datetime.utcnow()
+            for day in sorted(summaries):
+                source = summaries[day]
+                record = records.get(day)
+                if record is not None and record.source_checksum is not None:
+                    if record.source_checksum != source['checksum']:
+                        gaps.append(day)
+                elif stored_invoices.get(day, set()) == set(source['documents']):
+                    self._stamp_source(session, record, day, source, now)
+                else:
+                    gaps.append(day)
+            session.commit()
+            return gaps
+            
+        except Exception as e:
+            logger.error(f"Error finding coverage gaps: {str(e)}")
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def _invoice_ids_by_day(self, session, days: List[date]) -> Dict[date, set]:
+        """Stored invoice ids, as strings, for each of the given days that has rows"""
+        if not days:
+            return {}
+        sale_day = func.date(SalesData.invoice_date)
+        results = session.query(sale_day, SalesData.invoice_id).filter(
+            SalesData.invoice_date >= datetime.combine(min(days), datetime.min.time()),
+            SalesData.invoice_date < datetime.combine(max(days) + timedelta(days=1), datetime.min.time())
+        ).distinct()
+        wanted = set(days)
+        by_day = {}
+        for day, invoice_id in results:
+            # SQLite returns date() as an ISO string
+            day = date.fromisoformat(day) if isinstance(day, str) else _as_date(day)
+            if day in wanted:
+                by_day.setdefault(day, set()).add(str(invoice_id))
+        return by_day
+    
+    @track_db
+    def mark_coverage_verified(self, sale_date: date, source: Dict) -> bool:
+        """Record the source summary a day was just ingested against"""
+        session = self.Session()
+        try:
+            record = session.query(SalesCoverage).filter(SalesCoverage.sale_date == sale_date).first()
+            self._stamp_source(session, record, sale_date, source, datetime.utcnow())
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error recording coverage for {sale_date}: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    def _stamp_source(self, session, record: Optional[SalesCoverage], sale_date: date, source: Dict, checked_at: datetime):
+        if record is None:
+            record = SalesCoverage(sale_date=sale_date, row_count=0, invoice_count=0, revenue=0.0)
+            session.add(record)
+        record.source_invoices = source['invoices']
+        record.source_total = source['total']
+        record.source_checksum = source['checksum']
+        record.checked_at = checked_at
+    
+    def _apply_customer_metrics(self, session, new_sales: List[Dict], known_invoices: set, as_of: date):
+        """Add newly stored sales to each customer's running totals and rolling windows"""
+        deltas = {}
+        for sale in new_sales:
+            delta = deltas.setdefault(sale['account_number'], {
+                'revenue': 0.0, 'invoices': set(), 'last_order_date': None,
+                'windows': {days: 0.0 for days in CUSTOMER_WINDOWS}
+            })
+            sale_date = _as_date(sale['invoice_date'])
+            delta['revenue'] += sale['extended_price']
+            if sale['invoice_id'] not in known_invoices:
+                delta['invoices'].add(sale['invoice_id'])
+            if delta['last_order_date'] is None or sale_date > delta['last_order_date']:
+                delta['last_order_date'] = sale_date
+            for days in CUSTOMER_WINDOWS:
+                if as_of - timedelta(days=days) < sale_date <= as_of:
+                    delta['windows'][days] += sale['extended_price']
+        
+        accounts = list(deltas)
+        metrics = {}
+        for i in range(0, len(accounts), 500):
+            for record in session.query(CustomerMetrics).filter(
+                CustomerMetrics.account_number.in_(accounts[i:i + 500])
+            ):
+                metrics[record.account_number] = record
+        
+        for account_number, delta in deltas.items():
+            record = metrics.get(account_number)
+            if record is None:
+                record = CustomerMetrics(
+                    account_number=account_number,
+                    total_revenue=0.0,
+                    total_orders=0,
+                    revenue_30d=0.0,
+                    revenue_90d=0.0,
+                    revenue_365d=0.0,
+                    windows_as_of=as_of
+                )
+                session.add(record)
+            record.total_revenue = (record.total_revenue or 0) + delta['revenue']
+            record.total_orders = (record.total_orders or 0) + len(delta['invoices'])
+            if record.last_order_date is None or delta['last_order_date'] > record.last_order_date:
+                record.last_order_date = delta['last_order_date']
+            for days, amount in delta['windows'].items():
+                column = _window_column(days)
+                setattr(record, column, (getattr(record, column) or 0) + amount)
+    
+    def _advance_customer_windows(self, session, target_date: date) -> date:
+        """Move every customer's rolling windows forward to end at target_date.
+
+        Only the days leaving each window are read back, so advancing one day
+        costs one small grouped query per window. A jump longer than a window
+        recomputes that window instead. Returns the windows' end date.
+        """
+        as_of = session.query(func.max(CustomerMetrics.windows_as_of)).scalar()
+        if as_of is None or target_date <= as_of:
+            return as_of or target_date
+        
+        records = {record.account_number: record for record in session.query(CustomerMetrics)}
+        for days in CUSTOMER_WINDOWS:
+            column = _window_column(days)
+            if (target_date - as_of).days >= days:
+                sums = self._revenue_by_account(session, target_date - timedelta(days=days), target_date)
+                for account_number, record in records.items():
+                    setattr(record, column, sums.get(account_number, 0.0))
+            else:
+                leaving = self._revenue_by_account(
+                    session, as_of - timedelta(days=days), target_date - timedelta(days=days)
+                )
+                for account_number, amount in leaving.items():
+                    record = records.get(account_number)
+                    if record is not None:
+                        setattr(record, column, max((getattr(record, column) or 0) - amount, 0.0))
+        for record in records.values():
+            record.windows_as_of = target_date
+        return target_date
+    
+    def _revenue_by_account(self, session, after: date, through: date) -> Dict[str, float]:
+        """Revenue per account for invoice dates in (after, through]"""
+        results = session.query(
+            SalesData.account_number,
+            func.sum(SalesData.extended_price).label('revenue')
+        ).filter(
+            SalesData.invoice_date >= datetime.combine(after + timedelta(days=1), datetime.min.time()),
+            SalesData.invoice_date < datetime.combine(through + timedelta(days=1), datetime.min.time())
+        ).group_by(SalesData.account_number).all()
+        return {result.account_number: float(result.revenue or 0) for result in results}
+    
+    @track_db
+    def advance_customer_windows(self, as_of: date) -> bool:
+        """Roll customer revenue windows forward, e.g. over days with no sales"""
+        session = self.Session()
+        try:
+            self._advance_customer_windows(session, as_of)
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error advancing customer windows: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def rebuild_customer_metrics(self, as_of: date = None) -> bool:
+        """Recompute all customer metrics from stored sales (initial backfill or repair)"""
+        session = self.Session()
+        try:
+            as_of = as_of or date.today() - timedelta(days=1)
+            window_end = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+            
+            def window_sum(days):
+                window_start = window_end - timedelta(days=days)
+                return func.sum(case(
+                    (
+                        (SalesData.invoice_date >= window_start) & (SalesData.invoice_date < window_end),
+                        SalesData.extended_price
+                    ),
+                    else_=0
+                ))
+            
+            results = session.query(
+                SalesData.account_number,
+                func.sum(SalesData.extended_price).label('total_revenue'),
+                func.count(func.distinct(SalesData.invoice_id)).label('total_orders'),
+                func.max(SalesData.invoice_date).label('last_order'),
+                *[window_sum(days).label(_window_column(days)) for days in CUSTOMER_WINDOWS]
+            ).group_by(SalesData.account_number).all()
+            
+            session.query(CustomerMetrics).delete()
+            session.bulk_insert_mappings(CustomerMetrics, [
+                {
+                    'account_number': result.account_number,
+                    'total_revenue': float(result.total_revenue or 0),
+                    'total_orders': result.total_orders,
+                    'last_order_date': _as_date(result.last_order) if result.last_order else None,
+                    **{
+                        _window_column(days): float(getattr(result, _window_column(days)) or 0)
+                        for days in CUSTOMER_WINDOWS
+                    },
+                    'windows_as_of': as_of
+                }
+                for result in results
+            ])
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding customer metrics: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def has_customer_metrics(self) -> bool:
+        session = self.Session()
+        try:
+            return session.query(CustomerMetrics.id).first() is not None
+        finally:
+            session.close()
+    
+    def _apply_forecast_states(self, session, new_sales: List[Dict]):
+        """Fold newly stored quantities into each item's forecast state, one day at a time"""
+        daily = {}
+        for sale in new_sales:
+            days = daily.setdefault(sale['item_number'], {})
+            sale_date = _as_date(sale['invoice_date'])
+            days[sale_date] = days.get(sale_date, 0.0) + (sale['quantity'] or 0)
+        
+        items = list(daily)
+        records = {}
+        for i in range(0, len(items), 500):
+            for record in session.query(ItemForecastState).filter(
+                ItemForecastState.item_number.in_(items[i:i + 500])
+            ):
+                records[record.item_number] = record
+        
+        for item_number, days in daily.items():
+            record = records.get(item_number)
+            if record is None:
+                state = ForecastState(min(days))
+                record = ItemForecastState(item_number=item_number)
+                session.add(record)
+            else:
+                state = ForecastState.from_record(record)
+            for sale_date in sorted(days):
+                state.add(sale_date, days[sale_date])
+            for column, value in state.to_record().items():
+                setattr(record, column, value)
+    
+    @track_db
+    def rebuild_forecast_states(self, as_of: date = None) -> bool:
+        """Recompute every item's forecast state from the last year of stored sales"""
+        session = self.Session()
+        try:
+            as_of = as_of or date.today() - timedelta(days=1)
+            window_start = datetime.combine(as_of - timedelta(days=HISTORY_DAYS - 1), datetime.min.time())
+            window_end = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+            sale_day = func.date(SalesData.invoice_date)
+            results = session.query(
+                SalesData.item_number,
+                sale_day.label('day'),
+                func.sum(SalesData.quantity).label('quantity')
+            ).filter(
+                SalesData.invoice_date >= window_start,
+                SalesData.invoice_date < window_end
+            ).group_by(SalesData.item_number, sale_day).order_by(SalesData.item_number, sale_day).all()
+            
+            states = {}
+            for result in results:
+                # SQLite returns date() as an ISO string
+                day = date.fromisoformat(result.day) if isinstance(result.day, str) else _as_date(result.day)
+                state = states.get(result.item_number)
+                if state is None:
+                    state = states[result.item_number] = ForecastState(day)
+                state.add(day, float(result.quantity or 0))
+            
+            session.query(ItemForecastState).delete()
+            session.bulk_insert_mappings(ItemForecastState, [
+                dict(state.to_record(), item_number=item_number)
+                for item_number, state in states.items()
+            ])
+            session.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding forecast states: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def has_forecast_states(self) -> bool:
+        session = self.Session()
+        try:
+            return session.query(ItemForecastState.id).first() is not None
+        finally:
+            session.close()
+    
+    @track_db
+    def get_forecast_state(self, item_number: str) -> Optional[ForecastState]:
+        """Get an item's forecast state rolled forward to the latest ingested day.
+        
+        States are only written when an item sells, so the copy returned here is
+        advanced over the idle days since. None when no states have been built.
+        """
+        session = self.Session()
+        try:
+            latest = session.query(func.max(ItemForecastState.as_of)).scalar()
+            if latest is None:
+                return None
+            record = session.query(ItemForecastState).filter(
+                ItemForecastState.item_number == item_number
+            ).first()
+            if record is None:
+                return ForecastState(latest)
+            state = ForecastState.from_record(record)
+            state.advance_to(latest)
+            return state
+        except Exception as e:
+            logger.error(f"Error getting forecast state: {str(e)}")
+            return None
+        finally:
+            session.close()
+    
+    @track_db
+    def get_forecast_rings(self) -> Tuple[Optional[date], List[Tuple]]:
+        """Get (item_number, as_of, first_day, ring bytes) for every forecast state, plus the latest ingested day"""
+        session = self.Session()
+        try:
+            latest = session.query(func.max(ItemForecastState.as_of)).scalar()
+            records = session.query(
+                ItemForecastState.item_number,
+                ItemForecastState.as_of,
+                ItemForecastState.first_day,
+                ItemForecastState.ring
+            ).all()
+            return latest, [tuple(record) for record in records]
+        finally:
+            session.close()
+    
+    @track_db
+    def store_item_forecasts(self, forecasts: List[Dict]) -> bool:
+        """Replace the stored catalogue forecasts in one bulk write"""
+        session = self.Session()
+        try:
+            session.query(ItemForecast).delete()
+            session.bulk_insert_mappings(ItemForecast, forecasts)
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error storing item forecasts: {str(e)}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    @track_db
+    def get_top_customers(self, window: Optional[int] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Get customers ranked by precomputed revenue, all-time or over a rolling window"""
+        session = self.ReadSession()
+        try:
+            column = getattr(CustomerMetrics, _window_column(window))
+            records = session.query(CustomerMetrics).filter(
+                column > 0
+            ).order_by(
+                column.desc(), CustomerMetrics.account_number
+            ).offset(offset).limit(limit).all()
+            
+            return [
+                dict(self._customer_metrics_dict(record), rank=offset + position + 1)
+                for position, record in enumerate(records)
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error getting top customers: {str(e)}")
+            return []
+        finally:
+            session.close()
+    
+    @track_db
+    def get_customer_rank(self, account_number: str, window: Optional[int] = None) -> Optional[Dict]:
+        """Get a customer's revenue rank among all customers, all-time or over a rolling window"""
+        session = self.ReadSession()
+        try:
+            record = session.query(CustomerMetrics).filter_by(account_number=account_number).first()
+            if record is None:
+                return None
+            
+            column = getattr(CustomerMetrics, _window_column(window))
+            revenue = getattr(record, _window_column(window)) or 0
+            ahead = session.query(func.count(CustomerMetrics.id)).filter(column > revenue).scalar()
+            total = session.query(func.count(CustomerMetrics.id)).filter(column > 0).scalar()
+            
+            return dict(
+                self._customer_metrics_dict(record),
+                rank=ahead + 1,
+                customers=total,
+                percentile=round(100.0 * (1 - ahead / total), 1) if total else 0.0
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting customer rank: {str(e)}")
+            return None
+        finally:
+            session.close()
+    
+    def _customer_metrics_dict(self, record: CustomerMetrics) -> Dict:
+        return {
+            'account_number': record.account_number,
+            'customer_name': record.customer_name,
+            'total_revenue': record.total_revenue or 0.0,
+            'total_orders': record.total_orders or 0,
+            'last_order_date': record.last_order_date.isoformat() if record.last_order_date else None,
+            'revenue_30d': record.revenue_30d or 0.0,
+            'revenue_90d': record.revenue_90d or 0.0,
+            'revenue_365d': record.revenue_365d or 0.0,
+            'windows_as_of': record.windows_as_of.isoformat() if record.windows_as_of else None
+        }
+    
+    @track_db
     def update_inventory_levels(self, inventory_data: List[Dict]) -> bool:
-        """Update inventory levels in the database"""
+        """Update inventory levels in the database, one row per item per branch"""
         session = self.Session()
         try:
+            branches = {item.get('branch') or DEFAULT_BRANCH for item in inventory_data}
+            records = {
+                (record.item_number, record.branch): record
+                for record in session.query(InventoryLevel).filter(InventoryLevel.branch.in_(branches))
+            }
             for item in inventory_data:
+                branch = item.get('branch') or DEFAULT_BRANCH
                 # Update or create inventory record
-                record = session.query(InventoryLevel).filter_by(
-                    item_number=item['item_number']
-                ).first()
+                record = records.get((item['item_number'], branch))
                 
                 if record:
                     record.qty_available = item['qty_available']
                     record.qty_on_hand = item['qty_on_hand']
                     record.on_order = item.get('on_order', 0)
                     record.last_cost = item.get('cost', 0)
+                    if item.get('lead_time'):
+                        record.lead_time = item['lead_time']
+                    record.track_on_hand = item.get('track_on_hand', True)
                     record.last_updated = datetime.utcnow()
                 else:
                     record = InventoryLevel(
                         item_number=item['item_number'],
+                        branch=branch,
                         description=item.get('description', ''),
                         qty_available=item['qty_available'],
                         qty_on_hand=item['qty_on_hand'],
                         on_order=item.get('on_order', 0),
-                        last_cost=item.get('cost', 0)
+                        last_cost=item.get('cost', 0),
+                        lead_time=item.get('lead_time') or None,
+                        track_on_hand=item.get('track_on_hand', True)
                     )
                     session.add(record)
+                    records[(item['item_number'], branch)] = record
             
             session.commit()
             return True
@@ -138,9 +1399,138 @@ class DatabaseService:
         finally:
             session.close()
     
+    def _inventory_query(self, session, branch: Optional[str] = None):
+        """Inventory per item at one branch, or summed across branches in SQL when branch is None"""
+        if branch is not None:
+            return session.query(
+                InventoryLevel.item_number,
+                InventoryLevel.description,
+                InventoryLevel.qty_available,
+                InventoryLevel.qty_on_hand,
+                InventoryLevel.on_order,
+                InventoryLevel.reorder_point,
+                InventoryLevel.lead_time,
+                InventoryLevel.last_cost,
+                InventoryLevel.days_of_supply
+            ).filter(InventoryLevel.branch == branch)
+        return session.query(
+            InventoryLevel.item_number,
+            func.max(InventoryLevel.description).label('description'),
+            func.sum(InventoryLevel.qty_available).label('qty_available'),
+            func.sum(InventoryLevel.qty_on_hand).label('qty_on_hand'),
+            func.sum(InventoryLevel.on_order).label('on_order'),
+            func.sum(InventoryLevel.reorder_point).label('reorder_point'),
+            # The slowest supplier lead time is the safe one for company-wide planning
+            func.max(InventoryLevel.lead_time).label('lead_time'),
+            func.max(InventoryLevel.last_cost).label('last_cost')
+        ).group_by(InventoryLevel.item_number)
+    
+    def _days_of_supply(self, qty_available, avg_daily_demand):
+        """SQL for whole days of available stock at the forecast demand rate (NO_DEMAND_DAYS_OF_SUPPLY without demand)"""
+        days = case((qty_available > 0, qty_available), else_=0) / case((avg_daily_demand > 0, avg_daily_demand))
+        if self.engine.dialect.name != 'sqlite':
+            # CAST rounds on PostgreSQL; SQLite truncates, and may lack floor()
+            days = func.floor(days)
+        return func.coalesce(cast(days, Integer), NO_DEMAND_DAYS_OF_SUPPLY)
+    
+    def _days_of_supply_update(self):
+        table = InventoryLevel.__table__
+        demand = select(ItemForecast.avg_daily_demand).where(
+            ItemForecast.item_number == table.c.item_number
+        ).scalar_subquery()
+        return table.update().values(days_of_supply=self._days_of_supply(table.c.qty_available, demand))
+    
+    @track_db
+    def refresh_days_of_supply(self) -> bool:
+        """Recompute every inventory row's days of supply in one statement, after inventory or forecasts change"""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self._days_of_supply_update())
+            return True
+        except Exception as e:
+            logger.error(f"Error refreshing days of supply: {str(e)}")
+            return False
+    
+    @track_db
+    def get_inventory_alerts(self, branch: Optional[str] = None, sort: str = 'qty_available',
+                             descending: bool = False, after: Optional[Tuple] = None, limit: int = 50,
+                             search: Optional[str] = None, threshold: int = 10) -> Dict:
+        """One page of tracked items at or below their reorder point (threshold without one).
+
+        Pages are keyset-paginated on (sort value, item_number): pass the
+        previous page's 'next' key as after. For a branch the scan follows
+        the (branch, sort column, item_number) index, so a page costs the
+        same at any depth; with branch None stock is summed across branches
+        first, which reads the whole table.
+        """
+        if sort not in ALERT_SORTS:
+            raise ValueError(f"sort must be one of {', '.join(ALERT_SORTS)}")
+        session = self.Session()
+        try:
+            query = self._inventory_query(session, branch).filter(InventoryLevel.track_on_hand.isnot(False))
+            if search:
+                query = query.filter(func.lower(InventoryLevel.description).contains(search.lower(), autoescape=True))
+            
+            if branch is not None:
+                columns = InventoryLevel.__table__.c
+            else:
+                totals = query.subquery()
+                days = self._days_of_supply(totals.c.qty_available, ItemForecast.avg_daily_demand)
+                query = session.query(totals, days.label('days_of_supply')).outerjoin(
+                    ItemForecast, ItemForecast.item_number == totals.c.item_number
+                )
+                columns = dict({column.name: column for column in totals.c}, days_of_supply=days)
+            query = query.filter(columns['qty_available'] <= func.coalesce(columns['reorder_point'], threshold))
+            
+            key = tuple_(columns[sort], columns['item_number'])
+            if after is not None:
+                query = query.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+            order = [column.desc() if descending else column for column in (columns[sort], columns['item_number'])]
+            rows = query.order_by(*order).limit(limit + 1).all()
+            
+            items = [
+                {
+                    'item_number': row.item_number,
+                    'branch': branch,
+                    'description': row.description,
+                    'qty_available': row.qty_available,
+                    'qty_on_hand': row.qty_on_hand,
+                    'on_order': row.on_order,
+                    'reorder_point': row.reorder_point,
+                    'lead_time': row.lead_time,
+                    'days_of_supply': row.days_of_supply
+                }
+                for row in rows[:limit]
+            ]
+            last = items[-1] if len(rows) > limit else None
+            return {
+                'items': items,
+                'next': (last[sort], last['item_number']) if last else None
+            }
+        except Exception as e:
+            logger.error(f"Error getting inventory alerts: {str(e)}")
+            raise
+        finally:
+            session.close()
+    
+    @track_db
+    def count_inventory_alerts(self, branch: Optional[str] = None, threshold: int = 10) -> int:
+        """Number of tracked items at or below their reorder point, at a branch or summed across branches"""
+        session = self.Session()
+        try:
+            inventory = self._inventory_query(session, branch).filter(
+                InventoryLevel.track_on_hand.isnot(False)
+            ).subquery()
+            return session.query(func.count()).select_from(inventory).filter(
+                inventory.c.qty_available <= func.coalesce(inventory.c.reorder_point, threshold)
+            ).scalar()
+        finally:
+            session.close()
+    
+    @track_db
     def get_item_sales_history(self, item_number: str, days: int = 365) -> List[Dict]:
         """Get sales history for an item"""
-        session = self.Session()
+        session = self.ReadSession()
         try:
             start_date = datetime.now() - timedelta(days=days)
             
@@ -166,17 +1556,47 @@ class DatabaseService:
         finally:
             session.close()
     
-    def get_daily_sales_data(self, target_date: date) -> List[Dict]:
-        """Get all sales data for a specific date"""
-        session = self.Session()
+    def iter_sales_columns(self, invoice_from: datetime, created_from: datetime = None,
+                           batch_size: int = 50000) -> Iterator[List[tuple]]:
+        """Stream the sales columns used by the hot cache in batches of row tuples.
+
+        Rows are (id, invoice_id, invoice_date, account_number, item_number,
+        description, quantity, extended_price, vendor_code, branch, created_at).
+        The hot cache advances a created_at watermark from these rows, so they
+        are read from the primary on a session of their own.
+        """
+        session = self._factories['primary']()
+        try:
+            statement = select(
+                SalesData.id, SalesData.invoice_id, SalesData.invoice_date, SalesData.account_number,
+                SalesData.item_number, SalesData.description, SalesData.quantity,
+                SalesData.extended_price, SalesData.vendor_code, SalesData.branch, SalesData.created_at
+            ).where(SalesData.invoice_date >= invoice_from)
+            if created_from is not None:
+                statement = statement.where(SalesData.created_at >= created_from)
+            
+            # yield_per streams with a server-side cursor where the driver supports it
+            result = session.execute(statement, execution_options={'yield_per': batch_size})
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+        finally:
+            session.close()
+    
+    @track_db
+    def get_daily_sales_data(self, target_date: date, branch: Optional[str] = None) -> List[Dict]:
+        """Get all sales data for a specific date, optionally for one branch"""
+        session = self.ReadSession()
         try:
             start_datetime = datetime.combine(target_date, datetime.min.time())
             end_datetime = datetime.combine(target_date, datetime.max.time())
             
-            sales = session.query(SalesData).filter(
+            query = session.query(SalesData).filter(
                 SalesData.invoice_date >= start_datetime,
                 SalesData.invoice_date <= end_datetime
-            ).all()
+            )
+            if branch:
+                query = query.filter(SalesData.branch == branch)
+            sales = query.all()
             
             return [
                 {
@@ -200,24 +1620,36 @@ class DatabaseService:
         finally:
             session.close()
     
-    def get_low_inventory_items(self, threshold: int = 10) -> List[Dict]:
-        """Get items with inventory below threshold"""
+    @track_db
+    def get_low_inventory_items(self, threshold: int = 10, branch: Optional[str] = None) -> List[Dict]:
+        """Get tracked items at or below their own reorder point (threshold for items without one).
+
+        With a branch, stock and reorder points are that branch's; otherwise
+        both are summed across branches.
+        """
         session = self.Session()
         try:
-            items = session.query(InventoryLevel).filter(
-                InventoryLevel.qty_available < threshold
-            ).order_by(InventoryLevel.qty_available).all()
+            inventory = self._inventory_query(session, branch).filter(
+                InventoryLevel.track_on_hand.isnot(False)
+            ).subquery()
+            items = session.query(inventory, ItemForecast.avg_daily_demand).outerjoin(
+                ItemForecast, ItemForecast.item_number == inventory.c.item_number
+            ).filter(
+                inventory.c.qty_available <= func.coalesce(inventory.c.reorder_point, threshold)
+            ).order_by(inventory.c.qty_available, inventory.c.item_number).all()
             
             return [
                 {
                     'item_number': item.item_number,
+                    'branch': branch,
                     'description': item.description,
                     'qty_available': item.qty_available,
                     'qty_on_hand': item.qty_on_hand,
                     'on_order': item.on_order,
                     'reorder_point': item.reorder_point,
                     'lead_time': item.lead_time,
-                    'days_of_supply': self._calculate_days_of_supply(item.item_number, item.qty_available)
+                    'days_of_supply': int(max(item.qty_available or 0, 0) / item.avg_daily_demand)
+                    if item.avg_daily_demand else NO_DEMAND_DAYS_OF_SUPPLY
                 }
                 for item in items
             ]
@@ -228,23 +1660,222 @@ class DatabaseService:
         finally:
             session.close()
     
-    def get_top_customers_by_date(self, target_date: date, limit: int = 10) -> List[Dict]:
-        """Get top customers for a specific date"""
+    @track_db
+    def get_reorder_inputs(self) -> List[tuple]:
+        """Inventory summed across branches joined with nightly demand rates, one row per SKU, for the reorder engine"""
+        session = self.Session()
+        try:
+            inventory = self._inventory_query(session).subquery()
+            return [tuple(row) for row in session.query(
+                inventory.c.item_number,
+                inventory.c.description,
+                inventory.c.qty_available,
+                inventory.c.qty_on_hand,
+                inventory.c.on_order,
+                inventory.c.reorder_point,
+                inventory.c.lead_time,
+                inventory.c.last_cost,
+                ItemForecast.avg_daily_demand,
+                ItemForecast.trend,
+                ItemForecast.as_of
+            ).outerjoin(ItemForecast, ItemForecast.item_number == inventory.c.item_number)]
+        finally:
+            session.close()
+    
+    @track_db
+    def get_lead_times(self) -> Dict[str, int]:
+        """Supplier lead time in days per item (longest across branches), for items that have one"""
         session = self.Session()
+        try:
+            lead_time = func.max(InventoryLevel.lead_time)
+            return {
+                row.item_number: row.lead_time
+                for row in session.query(InventoryLevel.item_number, lead_time.label('lead_time')).group_by(
+                    InventoryLevel.item_number
+                ).having(lead_time > 0)
+            }
+        finally:
+            session.close()
+    
+    @track_db
+    def get_item_lead_time(self, item_number: str) -> Optional[int]:
+        session = self.Session()
+        try:
+            return session.query(func.max(InventoryLevel.lead_time)).filter(
+                InventoryLevel.item_number == item_number
+            ).scalar()
+        except Exception as e:
+            logger.error(f"Error getting item lead time: {str(e)}")
+            return None
+        finally:
+            session.close()
+    
+    @track_db
+    def get_item_inventory(self, item_number: str) -> Optional[Dict]:
+        """Stock of one item at each branch, with the totals across branches"""
+        session = self.Session()
+        try:
+            records = session.query(InventoryLevel).filter(
+                InventoryLevel.item_number == item_number
+            ).order_by(InventoryLevel.branch).all()
+            if not records:
+                return None
+            totals = self._inventory_query(session).filter(InventoryLevel.item_number == item_number).one()
+            return {
+                'item_number': item_number,
+                'description': totals.description,
+                'totals': {
+                    'qty_available': totals.qty_available,
+                    'qty_on_hand': totals.qty_on_hand,
+                    'on_order': totals.on_order,
+                    'reorder_point': totals.reorder_point,
+                    'lead_time': totals.lead_time
+                },
+                'branches': [
+                    {
+                        'branch': record.branch,
+                        'qty_available': record.qty_available,
+                        'qty_on_hand': record.qty_on_hand,
+                        'on_order': record.on_order,
+                        'reorder_point': record.reorder_point,
+                        'lead_time': record.lead_time,
+                        'last_updated': record.last_updated.isoformat() if record.last_updated else None
+                    }
+                    for record in records
+                ]
+            }
+        except Exception as e:
+            logger.error(f"Error getting item inventory: {str(e)}")
+            raise
+        finally:
+            session.close()
+    
+    @track_db
+    def get_branch_inventory_totals(self, threshold: int = 10) -> List[Dict]:
+        """Stocked items, units, stock value and low-stock count per branch"""
+        session = self.Session()
+        try:
+            low = case(
+                (InventoryLevel.qty_available <= func.coalesce(InventoryLevel.reorder_point, threshold), 1),
+                else_=0
+            )
+            results = session.query(
+                InventoryLevel.branch,
+                func.count(InventoryLevel.id).label('items'),
+                func.sum(InventoryLevel.qty_available).label('qty_available'),
+                func.sum(InventoryLevel.qty_on_hand).label('qty_on_hand'),
+                func.sum(InventoryLevel.on_order).label('on_order'),
+                func.sum(InventoryLevel.qty_on_hand * InventoryLevel.last_cost).label('stock_value'),
+                func.sum(low).label('low_stock_items'),
+                func.max(InventoryLevel.last_updated).label('last_updated')
+            ).group_by(InventoryLevel.branch).order_by(InventoryLevel.branch).all()
+            
+            return [
+                {
+                    'branch': result.branch,
+                    'items': result.items,
+                    'qty_available': float(result.qty_available or 0),
+                    'qty_on_hand': float(result.qty_on_hand or 0),
+                    'on_order': float(result.on_order or 0),
+                    'stock_value': round(float(result.stock_value or 0), 2),
+                    'low_stock_items': int(result.low_stock_items or 0),
+                    'last_updated': result.last_updated.isoformat() if result.last_updated else None
+                }
+                for result in results
+            ]
+        except Exception as e:
+            logger.error(f"Error getting branch inventory totals: {str(e)}")
+            raise
+        finally:
+            session.close()
+    
+    @track_db
+    def get_customer_item_sales(self, account_number: str, start_date: date, end_date: date) -> List[Dict]:
+        """Get item-level sales aggregates for a customer over a date range"""
+        session = self.ReadSession()
+        try:
+            start_datetime = datetime.combine(start_date, datetime.min.time())
+            end_datetime = datetime.combine(end_date, datetime.max.time())
+            
+            # Served by idx_sales_account_date
+            results = session.query(
+                SalesData.item_number,
+                func.max(SalesData.description).label('description'),
+                func.sum(SalesData.quantity).label('quantity'),
+                func.sum(SalesData.extended_price).label('revenue'),
+                func.count(SalesData.id).label('transactions')
+            ).filter(
+                SalesData.account_number == account_number,
+                SalesData.invoice_date >= start_datetime,
+                SalesData.invoice_date <= end_datetime
+            ).group_by(
+                SalesData.item_number
+            ).all()
+            
+            return [
+                {
+                    'item_number': result.item_number,
+                    'description': result.description,
+                    'quantity': float(result.quantity or 0),
+                    'revenue': float(result.revenue or 0),
+                    'transactions': result.transactions
+                }
+                for result in results
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error getting customer item sales: {str(e)}")
+            raise
+        finally:
+            session.close()
+    
+    @track_db
+    def get_customer_totals(self, account_number: str, start_date: date, end_date: date) -> Dict:
+        """Get revenue, quantity and invoice count for a customer over a date range"""
+        session = self.ReadSession()
+        try:
+            start_datetime = datetime.combine(start_date, datetime.min.time())
+            end_datetime = datetime.combine(end_date, datetime.max.time())
+            
+            result = session.query(
+                func.sum(SalesData.extended_price).label('revenue'),
+                func.sum(SalesData.quantity).label('quantity'),
+                func.count(func.distinct(SalesData.invoice_id)).label('transactions')
+            ).filter(
+                SalesData.account_number == account_number,
+                SalesData.invoice_date >= start_datetime,
+                SalesData.invoice_date <= end_datetime
+            ).one()
+            
+            return {
+                'revenue': float(result.revenue or 0),
+                'quantity': float(result.quantity or 0),
+                'transactions': result.transactions or 0
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting customer totals: {str(e)}")
+            raise
+        finally:
+            session.close()
+    
+    @track_db
+    def get_top_customers_by_date(self, target_date: date, limit: int = 10, branch: Optional[str] = None) -> List[Dict]:
+        """Get top customers for a specific date, optionally at one branch"""
+        session = self.ReadSession()
         try:
             start_datetime = datetime.combine(target_date, datetime.min.time())
             end_datetime = datetime.combine(target_date, datetime.max.time())
             
             # Query to get top customers by revenue for the date
-            from sqlalchemy import func
-            
             results = session.query(
                 SalesData.account_number,
                 func.sum(SalesData.extended_price).label('total_revenue'),
                 func.count(func.distinct(SalesData.invoice_id)).label('transactions')
             ).filter(
                 SalesData.invoice_date >= start_datetime,
-                SalesData.invoice_date <= end_datetime
+                SalesData.invoice_date <= end_datetime,
+                *([SalesData.branch == branch] if branch else [])
             ).group_by(
                 SalesData.account_number
             ).order_by(
@@ -266,18 +1897,61 @@ class DatabaseService:
         finally:
             session.close()
     
-    def get_sales_by_vendor(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get sales data grouped by vendor"""
+    @track_db
+    def get_latest_sale_date(self) -> Optional[date]:
+        """Date of the newest stored sale, or None when nothing is stored"""
         session = self.Session()
+        try:
+            return _as_date(session.query(func.max(SalesData.invoice_date)).scalar())
+        finally:
+            session.close()
+    
+    @track_db
+    def get_revenue_series(self, start_date: date, end_date: date, hourly: bool = False,
+                           branch: Optional[str] = None) -> List[Tuple[datetime, float]]:
+        """Stored revenue per day (or per hour) from start_date through end_date, summed in SQL.
+
+        Buckets without sales are omitted; returns (bucket start, revenue) pairs.
+        """
+        session = self.ReadSession()
+        try:
+            if self.engine.dialect.name == 'sqlite':
+                bucket = func.strftime('%Y-%m-%d %H:00:00' if hourly else '%Y-%m-%d', SalesData.invoice_date)
+            else:
+                bucket = func.date_trunc('hour' if hourly else 'day', SalesData.invoice_date)
+            query = session.query(
+                bucket.label('bucket'),
+                func.sum(SalesData.extended_price).label('revenue')
+            ).filter(
+                SalesData.invoice_date >= datetime.combine(start_date, datetime.min.time()),
+                SalesData.invoice_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+            )
+            if branch:
+                query = query.filter(SalesData.branch == branch)
+            return [
+                # SQLite returns the bucket as a string
+                (datetime.fromisoformat(row.bucket) if isinstance(row.bucket, str) else row.bucket, float(row.revenue or 0))
+                for row in query.group_by(bucket).all()
+            ]
+        finally:
+            session.close()
+    
+    @track_db
+    def get_sales_by_vendor(self, start_date: date, end_date: date, branch: Optional[str] = None) -> List[Dict]:
+        """Get sales data grouped by vendor, optionally for one branch"""
+        session = self.ReadSession()
         try:
             start_datetime = datetime.combine(start_date, datetime.min.time())
             end_datetime = datetime.combine(end_date, datetime.max.time())
             
-            sales = session.query(SalesData).filter(
+            query = session.query(SalesData).filter(
                 SalesData.invoice_date >= start_datetime,
                 SalesData.invoice_date <= end_datetime,
                 SalesData.vendor_code.isnot(None)
-            ).all()
+            )
+            if branch:
+                query = query.filter(SalesData.branch == branch)
+            sales = query.all()
             
             return [
                 {
@@ -296,28 +1970,52 @@ class DatabaseService:
         finally:
             session.close()
     
-    def _calculate_days_of_supply(self, item_number: str, current_qty: float) -> int:
-        """Calculate days of supply based on recent sales"""
-        session = self.Session()
+    @track_db
+    def get_item_catalogue(self, days: int = 90) -> List[Dict]:
+        """Get every known item with its description, stock and recent sales counts"""
+        session = self.ReadSession()
         try:
-            # Get last 30 days of sales
-            thirty_days_ago = datetime.now() - timedelta(days=30)
+            start_date = datetime.now() - timedelta(days=days)
             
-            total_sold = session.query(func.sum(SalesData.quantity)).filter(
-                SalesData.item_number == item_number,
-                SalesData.invoice_date >= thirty_days_ago
-            ).scalar() or 0
+            sales = session.query(
+                SalesData.item_number,
+                func.max(SalesData.description).label('description'),
+                func.count(SalesData.id).label('sale_count'),
+                func.sum(SalesData.quantity).label('total_quantity'),
+                func.max(SalesData.invoice_date).label('last_sale')
+            ).filter(
+                SalesData.invoice_date >= start_date
+            ).group_by(SalesData.item_number).all()
             
-            if total_sold > 0:
-                avg_daily_sales = total_sold / 30
-                days_of_supply = int(current_qty / avg_daily_sales) if avg_daily_sales > 0 else 999
-            else:
-                days_of_supply = 999
+            catalogue = {
+                result.item_number: {
+                    'item_number': result.item_number,
+                    'description': result.description or '',
+                    'sale_count': result.sale_count,
+                    'total_quantity': float(result.total_quantity or 0),
+                    'last_sale': result.last_sale.strftime('%Y-%m-%d') if result.last_sale else None,
+                    'qty_available': None
+                }
+                for result in sales
+            }
+            
+            # Stock summed across branches
+            inventory = self._inventory_query(session).all()
+            for record in inventory:
+                item = catalogue.setdefault(record.item_number, {
+                    'item_number': record.item_number,
+                    'description': record.description or '',
+                    'sale_count': 0,
+                    'total_quantity': 0.0,
+                    'last_sale': None
+                })
+                item['description'] = record.description or item['description']
+                item['qty_available'] = record.qty_available
             
-            return days_of_supply
+            return list(catalogue.values())
             
         except Exception as e:
-            logger.error(f"Error calculating days of supply: {str(e)}")
-            return 0
+            logger.error(f"Error getting item catalogue: {str(e)}")
+            raise
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
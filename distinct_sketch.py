@@ -0,0 +1,102 @@
+# distinct_sketch.py
+"""HyperLogLog distinct-count sketches.
+
+A sketch summarises a set of values in 2**PRECISION one-byte registers.
+Sketches of different days merge by taking the register-wise maximum, so
+the distinct count over any date range can be read from daily sketches
+without touching raw rows. Duplicates across days are counted once.
+
+Error bound: with PRECISION = 12 (4096 registers) the relative standard
+error of count() is 1.04 / sqrt(4096), about 1.6%. Roughly 95% of
+estimates fall within 3.3% of the true count. Below about 10,000
+distinct values, linear counting takes over and results are close to
+exact.
+
+Values are hashed with pandas' stable SipHash (pd.util.hash_array), so
+sketches built in different processes and on different days agree.
+"""
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RELATIVE_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_RANK_BITS = 64 - PRECISION
+_SPARSE, _DENSE = b'S', b'D'
+
+
+def hash_values(values) -> np.ndarray:
+    """Stable 64-bit hashes of the values"""
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _leading_zeros(words: np.ndarray) -> np.ndarray:
+    """Leading zero bits of uint64 words (64 for zero), exact via two 32-bit halves"""
+    high = (words >> np.uint64(32)).astype(np.float64)
+    low = (words & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        zeros = np.where(high > 0, 31 - np.floor(np.log2(high)), 63 - np.floor(np.log2(low)))
+    return np.where(words == 0, 64, zeros).astype(np.int64)
+
+
+class HyperLogLog:
+    def __init__(self, registers: Optional[np.ndarray] = None):
+        self.registers = np.zeros(REGISTERS, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def of(cls, values) -> 'HyperLogLog':
+        sketch = cls()
+        sketch.add_hashes(hash_values(values))
+        return sketch
+
+    def add_hashes(self, hashes: np.ndarray):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(_RANK_BITS)).astype(np.int64)
+        rest = hashes << np.uint64(PRECISION)
+        rank = np.minimum(_leading_zeros(rest), _RANK_BITS) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def update(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @classmethod
+    def merge(cls, sketches: Iterable['HyperLogLog']) -> 'HyperLogLog':
+        merged = cls()
+        for sketch in sketches:
+            merged.update(sketch)
+        return merged
+
+    def count(self) -> int:
+        registers = self.registers.astype(np.float64)
+        estimate = _ALPHA * REGISTERS * REGISTERS / np.sum(np.exp2(-registers))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * REGISTERS and empty:
+            # Linear counting is far more accurate for small sets
+            estimate = REGISTERS * math.log(REGISTERS / empty)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        """Sparse (register index, value) pairs while that is smaller, else the dense registers"""
+        used = np.flatnonzero(self.registers)
+        if len(used) * 3 < REGISTERS:
+            return _SPARSE + used.astype('<u2').tobytes() + self.registers[used].tobytes()
+        return _DENSE + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        kind, body = data[:1], data[1:]
+        if kind == _DENSE:
+            return cls(np.frombuffer(body, dtype=np.uint8).copy())
+        sketch = cls()
+        used = len(body) // 3
+        index = np.frombuffer(body[:2 * used], dtype='<u2')
+        sketch.registers[index] = np.frombuffer(body[2 * used:], dtype=np.uint8)
+        return sketch
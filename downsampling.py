@@ -0,0 +1,70 @@
+# downsampling.py
+"""Reduce a time series to a point budget for charting.
+
+Both methods return the sorted positions of the points to keep, always
+including the first and last, so callers can pick matching labels.
+
+- minmax keeps the lowest and highest point of each bucket, so spikes
+  and dips survive; it is fully vectorized.
+- lttb (Largest-Triangle-Three-Buckets) keeps, per bucket, the point that
+  forms the largest triangle with the previous pick and the next bucket's
+  mean, which preserves the visual shape of the line.
+"""
+import numpy as np
+import pandas as pd
+
+MODES = ('lttb', 'minmax', 'none')
+
+
+def _buckets(n: int, count: int) -> np.ndarray:
+    """Edges splitting positions 1..n-2 into count near-equal buckets"""
+    return np.linspace(1, n - 1, count + 1).astype(np.int64)
+
+
+def minmax(values: np.ndarray, budget: int) -> np.ndarray:
+    n = len(values)
+    if budget >= n or budget < 4:
+        return np.arange(n)
+    edges = _buckets(n, (budget - 2) // 2)
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    inner = pd.Series(values[1:n - 1], index=np.arange(1, n - 1))
+    grouped = inner.groupby(bucket)
+    keep = np.concatenate(([0], grouped.idxmin().values, grouped.idxmax().values, [n - 1]))
+    return np.unique(keep)
+
+
+def lttb(values: np.ndarray, budget: int) -> np.ndarray:
+    n = len(values)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    y = np.asarray(values, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    edges = _buckets(n, budget - 2)
+    # Mean of each bucket, plus the last point standing in for the bucket after the final one
+    sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append((edges[:-1] + edges[1:] - 1) / 2.0, n - 1)
+    mean_y = np.append(sums / counts, y[-1])
+
+    keep = np.empty(budget, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for b in range(budget - 2):
+        start, stop = edges[b], edges[b + 1]
+        px, py = x[previous], y[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((px - mean_x[b + 1]) * (y[start:stop] - py) - (px - x[start:stop]) * (mean_y[b + 1] - py))
+        previous = start + int(np.argmax(area))
+        keep[b + 1] = previous
+    return keep
+
+
+def downsample(values: np.ndarray, budget: int, mode: str = 'lttb') -> np.ndarray:
+    """Positions to keep from values under the point budget (all of them for mode 'none')"""
+    if mode not in MODES:
+        raise ValueError(f"downsample must be one of {', '.join(MODES)}")
+    if mode == 'minmax':
+        return minmax(values, budget)
+    if mode == 'lttb':
+        return lttb(values, budget)
+    return np.arange(len(values))
@@ -6,94 +6,226 @@ from datetime import datetime, date, timedelta
 import logging
 from typing import List, Dict, Any, Optional
 import os
+import time
+import hashlib
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import metrics_service
+import profiling_service
+from resilience_service import UpstreamGuard, UpstreamUnavailableError
+from eci_fast_parser import SPECS as FAST_PARSE_SPECS, FastParseError, parse_page
 
 logger = logging.getLogger(__name__)
 
+# Parse GetItems/GetInvoices pages with the streaming parser instead of zeep's object tree
+ECI_FAST_PARSE = os.getenv('ECI_FAST_PARSE', 'true').lower() == 'true'
+DEFAULT_BRANCH = os.getenv('DEFAULT_BRANCH', 'MAIN')
+# Branches whose inventory is ingested, comma-separated; defaults to DEFAULT_BRANCH alone
+ECI_BRANCHES = [branch.strip() for branch in os.getenv('ECI_BRANCHES', DEFAULT_BRANCH).split(',') if branch.strip()]
+# Concurrent GetItems scans during ingestion (0 means one per branch)
+ECI_BRANCH_WORKERS = int(os.getenv('ECI_BRANCH_WORKERS', 0))
+
+def invoice_checksum(invoices: List) -> str:
+    """Order-independent digest of invoice headers (document, total, branch) for change detection"""
+    digest = hashlib.sha1()
+    for line in sorted(
+        f"{invoice.DocID}|{float(invoice.Total or 0):.2f}|{getattr(invoice, 'Branch', None) or ''}"
+        for invoice in invoices
+    ):
+        digest.update(line.encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+class ECIServiceError(Exception):
+    """Raised when the ECI API could not return complete data"""
+
+class ECITransport(Transport):
+    """zeep transport that records the response payload size of each SOAP operation"""
+    
+    def post_xml(self, address, envelope, headers):
+        response = super().post_xml(address, envelope, headers)
+        operation = headers.get('SOAPAction', '').strip('"').rsplit('/', 1)[-1]
+        metrics_service.observe_eci_payload(operation, len(response.content))
+        return response
+
 class ECIApiService:
-    def __init__(self, endpoint: str, api_key: str):
+    def __init__(self, endpoint: str, api_key: str, transport: Optional[Transport] = None,
+                 guard: Optional[UpstreamGuard] = None):
         self.endpoint = endpoint
         self.api_key = api_key
-        self.client = self._create_client()
+        self.guard = guard
+        self.fast_parse = ECI_FAST_PARSE
+        self.client = self._create_client(transport)
         
-    def _create_client(self) -> Client:
+    def _create_client(self, transport: Optional[Transport] = None) -> Client:
         """Create SOAP client for ECI API"""
         wsdl = f"{self.endpoint}?wsdl"
-        transport = Transport(timeout=30, operation_timeout=30)
+        if transport is None:
+            timeout = int(os.getenv('ECI_TIMEOUT', 30))
+            transport = ECITransport(timeout=timeout, operation_timeout=timeout)
         return Client(wsdl=wsdl, transport=transport)
     
-    def get_daily_sales(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get all sales for a date range"""
+    def _call(self, operation: str, **kwargs):
+        """Invoke an ECI SOAP operation through the rate limiter and circuit breaker,
+        recording call count, latency and outcome"""
+        start = time.perf_counter()
         try:
-            # Get invoices for the date range
-            invoice_filter = {
-                'DateRangeStart': start_date.isoformat(),
-                'DateRangeEnd': end_date.isoformat(),
-                'InvoiceTypes': [0, 1, 5],  # Ticket, Invoice, Installed Sale
-                'RowMaxCount': 999,
-                'RowStart': 0
-            }
-            
-            all_invoices = []
-            while True:
-                response = self.client.service.GetInvoices(
-                    apikey=self.api_key,
-                    invoicefilter=invoice_filter
-                )
-                
-                if response.Success:
-                    invoices = response.Invoices
-                    all_invoices.extend(invoices)
-                    
-                    # Check if there are more results
-                    if len(invoices) < 999:
-                        break
-                    else:
-                        invoice_filter['RowStart'] += 999
+            with profiling_service.span(operation, 'eci'):
+                service_call = getattr(self.client.service, operation)
+                spec = FAST_PARSE_SPECS.get(operation) if self.fast_parse else None
+                if spec is not None:
+                    service_call = partial(self._call_streaming, operation, service_call, spec)
+                if self.guard is not None:
+                    response = self.guard.call(service_call, **kwargs)
                 else:
-                    logger.error(f"Error getting invoices: {response.ErrorMessages}")
-                    break
+                    response = service_call(**kwargs)
+        except UpstreamUnavailableError:
+            metrics_service.observe_eci_call(operation, time.perf_counter() - start, 'rejected')
+            raise
+        except Exception:
+            metrics_service.observe_eci_call(operation, time.perf_counter() - start, 'error')
+            raise
+        status = 'success' if response.Success else 'failed'
+        metrics_service.observe_eci_call(operation, time.perf_counter() - start, status)
+        return response
+    
+    def _call_streaming(self, operation: str, service_call, spec, **kwargs):
+        """Fetch the raw reply and parse it with the streaming parser.
+        
+        Faults, HTTP errors and anything the streaming parser does not
+        recognise are handed to zeep's own reply processing, using the same
+        response so the operation is never sent twice.
+        """
+        with self.client.settings(raw_response=True):
+            raw = service_call(**kwargs)
+        if raw.status_code == 200:
+            try:
+                return parse_page(raw.content, spec)
+            except FastParseError as e:
+                logger.warning(f"Streaming parse of {operation} failed, falling back to zeep: {str(e)}")
+        binding = self.client.service._binding
+        return binding.process_reply(self.client, binding.get(operation), raw)
+    
+    def _get_invoice_items(self, doc_id: str) -> List:
+        """Get the line items of an invoice, raising if ECI reports a failure"""
+        detail_response = self._call(
+            'GetInvoiceDetail',
+            apikey=self.api_key,
+            docID=doc_id
+        )
+        
+        if not detail_response.Success:
+            raise ECIServiceError(f"Error getting invoice detail {doc_id}: {detail_response.ErrorMessages}")
+        return detail_response.Items
+    
+    def get_daily_sales(self, start_date: date, end_date: date, account_number: Optional[str] = None,
+                        branch: Optional[str] = None) -> List[Dict]:
+        """Get all sales for a date range, optionally for a single customer account or branch"""
+        try:
+            all_invoices = self._get_invoices(start_date, end_date, account_number)
+            
+            # InvoiceFilter has no branch field; drop other branches before fetching line items
+            if branch:
+                all_invoices = [invoice for invoice in all_invoices if getattr(invoice, 'Branch', None) == branch]
             
             # Get detailed line items for each invoice
             sales_data = []
             for invoice in all_invoices:
-                detail_response = self.client.service.GetInvoiceDetail(
-                    apikey=self.api_key,
-                    docID=invoice.DocID
-                )
-                
-                if detail_response.Success:
-                    invoice_detail = detail_response
-                    for item in invoice_detail.Items:
-                        sales_data.append({
-                            'invoice_id': invoice.DocID,
-                            'invoice_date': invoice.IssueDate,
-                            'account_number': invoice.AccountNumber,
-                            'item_number': item.ItemNumber,
-                            'description': item.Description,
-                            'quantity': float(item.QuantitySold),
-                            'unit_price': float(item.UnitPrice) if hasattr(item, 'UnitPrice') else 0,
-                            'extended_price': float(item.ExtendedPrice),
-                            'branch': invoice.Branch if hasattr(invoice, 'Branch') else None
-                        })
+                for item in self._get_invoice_items(invoice.DocID):
+                    sales_data.append({
+                        'invoice_id': invoice.DocID,
+                        'invoice_date': invoice.IssueDate,
+                        'account_number': invoice.AccountNumber,
+                        'item_number': item.ItemNumber,
+                        'description': item.Description,
+                        'quantity': float(item.QuantitySold),
+                        'unit_price': float(item.UnitPrice) if hasattr(item, 'UnitPrice') else 0,
+                        'extended_price': float(item.ExtendedPrice),
+                        'branch': invoice.Branch if hasattr(invoice, 'Branch') else None
+                    })
             
             return sales_data
             
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Error in get_daily_sales: {str(e)}")
-            return []
+            raise ECIServiceError(f"Error in get_daily_sales: {str(e)}") from e
     
-    def get_inventory_alerts(self, reorder_threshold: int = 10) -> List[Dict]:
-        """Get items that need reordering"""
+    def get_invoice_summaries(self, start_date: date, end_date: date) -> Dict[date, Dict]:
+        """Invoice count, total, header checksum and sorted document ids for every day in a range.
+
+        Reads invoice headers only (one GetInvoices page per 999 invoices, no
+        line-item calls), so whole ranges can be compared with what is stored.
+        Days without invoices are included with zero counts.
+        """
         try:
+            by_day = {start_date + timedelta(days=offset): [] for offset in range((end_date - start_date).days + 1)}
+            for invoice in self._get_invoices(start_date, end_date):
+                by_day.setdefault(invoice.IssueDate.date(), []).append(invoice)
+            return {
+                day: {
+                    'invoices': len(invoices),
+                    'total': round(sum(float(invoice.Total or 0) for invoice in invoices), 2),
+                    'checksum': invoice_checksum(invoices),
+                    'documents': sorted(str(invoice.DocID) for invoice in invoices)
+                }
+                for day, invoices in by_day.items()
+            }
+            
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
+        except Exception as e:
+            logger.error(f"Error in get_invoice_summaries: {str(e)}")
+            raise ECIServiceError(f"Error in get_invoice_summaries: {str(e)}") from e
+    
+    def _get_invoices(self, start_date: date, end_date: date, account_number: Optional[str] = None) -> List:
+        """Invoice headers for a date range, paged 999 at a time"""
+        invoice_filter = {
+            'DateRangeStart': start_date.isoformat(),
+            'DateRangeEnd': end_date.isoformat(),
+            'InvoiceTypes': [0, 1, 5],  # Ticket, Invoice, Installed Sale
+            'RowMaxCount': 999,
+            'RowStart': 0
+        }
+        if account_number:
+            invoice_filter['AccountNumber'] = account_number
+        
+        all_invoices = []
+        while True:
+            response = self._call(
+                'GetInvoices',
+                apikey=self.api_key,
+                invoicefilter=invoice_filter
+            )
+            
+            if response.Success:
+                invoices = response.Invoices
+                all_invoices.extend(invoices)
+                
+                # Check if there are more results
+                if len(invoices) < 999:
+                    break
+                else:
+                    invoice_filter['RowStart'] += 999
+            else:
+                raise ECIServiceError(f"Error getting invoices: {response.ErrorMessages}")
+        return all_invoices
+    
+    def get_inventory_alerts(self, reorder_threshold: int = 10, branch: Optional[str] = None) -> List[Dict]:
+        """Get items that need reordering at one branch (DEFAULT_BRANCH when not given)"""
+        try:
+            branch = branch or DEFAULT_BRANCH
             item_filter = {
                 'RowMaxCount': 999,
                 'RowStart': 0,
-                'Branch': os.getenv('DEFAULT_BRANCH', 'MAIN')
+                'Branch': branch
             }
             
             alerts = []
             while True:
-                response = self.client.service.GetItems(
+                response = self._call(
+                    'GetItems',
                     apikey=self.api_key,
                     itemFilter=item_filter
                 )
@@ -108,6 +240,7 @@ class ECIApiService:
                         if qty_available < reorder_threshold and item.TrackOnHand:
                             alerts.append({
                                 'item_number': item.ItemNumber,
+                                'branch': branch,
                                 'description': item.Description,
                                 'qty_available': qty_available,
                                 'qty_on_hand': float(item.QtyOnHand),
@@ -121,14 +254,15 @@ class ECIApiService:
                     else:
                         item_filter['RowStart'] += 999
                 else:
-                    logger.error(f"Error getting items: {response.ErrorMessages}")
-                    break
+                    raise ECIServiceError(f"Error getting items: {response.ErrorMessages}")
                     
             return sorted(alerts, key=lambda x: x['qty_available'])
             
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Error in get_inventory_alerts: {str(e)}")
-            return []
+            raise ECIServiceError(f"Error in get_inventory_alerts: {str(e)}") from e
     
     def get_customer_sales(self, account_number: str, start_date: date, end_date: date) -> Dict:
         """Get sales data for a specific customer"""
@@ -141,41 +275,35 @@ class ECIApiService:
                 'RowMaxCount': 999
             }
             
-            response = self.client.service.GetInvoices(
+            response = self._call(
+                'GetInvoices',
                 apikey=self.api_key,
                 invoicefilter=invoice_filter
             )
             
             if not response.Success:
-                logger.error(f"Error getting customer invoices: {response.ErrorMessages}")
-                return {}
+                raise ECIServiceError(f"Error getting customer invoices: {response.ErrorMessages}")
             
             # Aggregate sales by item
             item_sales = {}
             total_revenue = 0
             
             for invoice in response.Invoices:
-                detail_response = self.client.service.GetInvoiceDetail(
-                    apikey=self.api_key,
-                    docID=invoice.DocID
-                )
-                
-                if detail_response.Success:
-                    for item in detail_response.Items:
-                        item_number = item.ItemNumber
-                        
-                        if item_number not in item_sales:
-                            item_sales[item_number] = {
-                                'description': item.Description,
-                                'quantity': 0,
-                                'revenue': 0,
-                                'transactions': 0
-                            }
-                        
-                        item_sales[item_number]['quantity'] += float(item.QuantitySold)
-                        item_sales[item_number]['revenue'] += float(item.ExtendedPrice)
-                        item_sales[item_number]['transactions'] += 1
-                        total_revenue += float(item.ExtendedPrice)
+                for item in self._get_invoice_items(invoice.DocID):
+                    item_number = item.ItemNumber
+                    
+                    if item_number not in item_sales:
+                        item_sales[item_number] = {
+                            'description': item.Description,
+                            'quantity': 0,
+                            'revenue': 0,
+                            'transactions': 0
+                        }
+                    
+                    item_sales[item_number]['quantity'] += float(item.QuantitySold)
+                    item_sales[item_number]['revenue'] += float(item.ExtendedPrice)
+                    item_sales[item_number]['transactions'] += 1
+                    total_revenue += float(item.ExtendedPrice)
             
             # Sort by revenue
             top_items = sorted(
@@ -197,22 +325,26 @@ class ECIApiService:
                 ]
             }
             
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Error in get_customer_sales: {str(e)}")
-            return {}
+            raise ECIServiceError(f"Error in get_customer_sales: {str(e)}") from e
     
-    def get_all_inventory(self) -> List[Dict]:
-        """Get all inventory items with current levels"""
+    def get_all_inventory(self, branch: Optional[str] = None) -> List[Dict]:
+        """Get all inventory items with current levels at one branch (DEFAULT_BRANCH when not given)"""
         try:
+            branch = branch or DEFAULT_BRANCH
             item_filter = {
                 'RowMaxCount': 999,
                 'RowStart': 0,
-                'Branch': os.getenv('DEFAULT_BRANCH', 'MAIN')
+                'Branch': branch
             }
             
             all_items = []
             while True:
-                response = self.client.service.GetItems(
+                response = self._call(
+                    'GetItems',
                     apikey=self.api_key,
                     itemFilter=item_filter
                 )
@@ -223,12 +355,15 @@ class ECIApiService:
                     for item in items:
                         all_items.append({
                             'item_number': item.ItemNumber,
+                            'branch': branch,
                             'description': item.Description,
                             'qty_available': float(item.QtyAvailable) if item.QtyAvailable >= 0 else 0,
                             'qty_on_hand': float(item.QtyOnHand),
                             'on_order': float(item.OnOrder) if hasattr(item, 'OnOrder') else 0,
                             'price': float(item.CustomerPrice),
                             'cost': float(item.SOAverageCost) if hasattr(item, 'SOAverageCost') else 0,
+                            'lead_time': item.LeadTime if hasattr(item, 'LeadTime') else 0,
+                            'track_on_hand': getattr(item, 'TrackOnHand', None) is not False,
                             'last_modified': datetime.now().isoformat()
                         })
                     
@@ -237,14 +372,15 @@ class ECIApiService:
                     else:
                         item_filter['RowStart'] += 999
                 else:
-                    logger.error(f"Error getting all inventory: {response.ErrorMessages}")
-                    break
+                    raise ECIServiceError(f"Error getting all inventory: {response.ErrorMessages}")
                     
             return all_items
             
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Error in get_all_inventory: {str(e)}")
-            return []
+            raise ECIServiceError(f"Error in get_all_inventory: {str(e)}") from e
     
     def get_item_sales_history(self, item_number: str, days: int = 365) -> List[Dict]:
         """Get sales history for a specific item"""
@@ -261,33 +397,54 @@ class ECIApiService:
                 'SearchText': item_number
             }
             
-            response = self.client.service.GetInvoices(
+            response = self._call(
+                'GetInvoices',
                 apikey=self.api_key,
                 invoicefilter=invoice_filter
             )
             
-            sales_history = []
+            if not response.Success:
+                raise ECIServiceError(f"Error getting item invoices: {response.ErrorMessages}")
             
-            if response.Success:
-                for invoice in response.Invoices:
-                    detail_response = self.client.service.GetInvoiceDetail(
-                        apikey=self.api_key,
-                        docID=invoice.DocID
-                    )
-                    
-                    if detail_response.Success:
-                        for item in detail_response.Items:
-                            if item.ItemNumber == item_number:
-                                sales_history.append({
-                                    'date': invoice.IssueDate,
-                                    'quantity': float(item.QuantitySold),
-                                    'unit_price': float(item.UnitPrice) if hasattr(item, 'UnitPrice') else 0,
-                                    'extended_price': float(item.ExtendedPrice),
-                                    'account_number': invoice.AccountNumber
-                                })
+            sales_history = []
+            for invoice in response.Invoices:
+                for item in self._get_invoice_items(invoice.DocID):
+                    if item.ItemNumber == item_number:
+                        sales_history.append({
+                            'date': invoice.IssueDate,
+                            'quantity': float(item.QuantitySold),
+                            'unit_price': float(item.UnitPrice) if hasattr(item, 'UnitPrice') else 0,
+                            'extended_price': float(item.ExtendedPrice),
+                            'account_number': invoice.AccountNumber
+                        })
             
             return sorted(sales_history, key=lambda x: x['date'])
             
+        except (ECIServiceError, UpstreamUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Error in get_item_sales_history: {str(e)}")
-            return []
\ No newline at end of file
+            raise ECIServiceError(f"Error in get_item_sales_history: {str(e)}") from e
+    
+    def get_inventory_by_branch(self, branches: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """Inventory per branch for every configured branch, scanned concurrently.
+
+        Each branch is a separate paged GetItems scan, so they run on a
+        thread pool. Branches that fail are logged and left out so the rest
+        can still be stored; if every branch fails the first error is raised.
+        """
+        branches = branches or ECI_BRANCHES
+        workers = min(ECI_BRANCH_WORKERS or len(branches), len(branches))
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = {branch: executor.submit(self.get_all_inventory, branch) for branch in branches}
+        
+        inventory, errors = {}, []
+        for branch, future in futures.items():
+            try:
+                inventory[branch] = future.result()
+            except (ECIServiceError, UpstreamUnavailableError) as e:
+                logger.error(f"Error getting inventory for branch {branch}: {str(e)}")
+                errors.append(e)
+        if errors and not inventory:
+            raise errors[0]
+        return inventory
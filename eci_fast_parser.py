@@ -0,0 +1,125 @@
+# eci_fast_parser.py
+"""Streaming parser for high-volume ECI SOAP responses.
+
+zeep materializes every row of a 999-row GetItems or GetInvoices page as a
+tree of zeep objects before the service copies it into dicts. For these
+operations the raw response is instead read with lxml iterparse, each
+record element is converted straight into a compact namedtuple carrying
+the same attribute names and Python types zeep would produce, and the
+element is freed before the next one is read.
+"""
+from collections import namedtuple
+from datetime import datetime
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Callable, Dict, NamedTuple, Tuple
+
+from lxml import etree
+from zeep.xsd.types import builtins as xsd
+
+SOAP_FAULT = 'Fault'
+
+
+class FastParseError(Exception):
+    """The response is not a plain successful page; callers fall back to zeep"""
+
+
+class RecordSpec(NamedTuple):
+    tag: str
+    record: type
+    converters: Tuple[Callable, ...]
+
+
+# Native conversions giving the same values as zeep's XSD types, which
+# collapse whitespace with a regex and parse dates through isodate
+def _string(text: str) -> str:
+    return text
+
+
+def _boolean(text: str) -> bool:
+    return text.strip() in ('true', '1')
+
+
+def _datetime(text: str) -> datetime:
+    try:
+        return datetime.fromisoformat(text.strip())
+    except ValueError:
+        return xsd.DateTime().pythonvalue(text)
+
+
+def _spec(tag: str, name: str, fields: Dict[str, Callable]) -> RecordSpec:
+    return RecordSpec(tag, namedtuple(name, list(fields)), tuple(fields.values()))
+
+
+# Record element and the fields read from it, converted to the types zeep would produce
+SPECS = {
+    'GetItems': _spec('Items', 'ItemRecord', {
+        'ItemNumber': _string,
+        'Description': _string,
+        'QtyAvailable': float,
+        'QtyOnHand': float,
+        'OnOrder': float,
+        'CustomerPrice': float,
+        'SOAverageCost': float,
+        'TrackOnHand': _boolean,
+        'LastModifiedDateTime': _datetime,
+        'LeadTime': int,
+    }),
+    'GetInvoices': _spec('Invoices', 'InvoiceRecord', {
+        'DocID': _string,
+        'IssueDate': _datetime,
+        'AccountNumber': _string,
+        'Branch': _string,
+        'Total': float,
+    }),
+}
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def parse_page(content: bytes, spec: RecordSpec) -> SimpleNamespace:
+    """Parse one response page into Success, ErrorMessages and the spec's record list.
+
+    The result has the attributes callers read from the zeep result object,
+    with the records under spec.tag (e.g. response.Items).
+    """
+    names = {name: position for position, name in enumerate(spec.record._fields)}
+    # Child positions keyed by the namespaced tag, resolved once per distinct tag
+    positions = {}
+    empty = [None] * len(names)
+    make, converters = spec.record._make, spec.converters
+    records = []
+    success = None
+    errors = []
+    tags = ('{*}' + spec.tag, '{*}Success', '{*}ErrorMessages', '{*}' + SOAP_FAULT)
+    try:
+        for _, element in etree.iterparse(BytesIO(content), events=('end',), tag=tags, huge_tree=True):
+            name = _local(element.tag)
+            if name == spec.tag:
+                values = list(empty)
+                for child in element:
+                    tag = child.tag
+                    position = positions.get(tag, -1)
+                    if position == -1:
+                        position = positions[tag] = names.get(_local(tag)) if isinstance(tag, str) else None
+                    if position is not None and child.text is not None:
+                        values[position] = converters[position](child.text)
+                records.append(make(values))
+                # Drop the finished record and any siblings already consumed
+                element.clear()
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+            elif name == 'Success' and success is None:
+                success = _boolean(element.text or '')
+            elif name == 'ErrorMessages':
+                errors.append(element.text)
+            elif name == SOAP_FAULT:
+                raise FastParseError('SOAP fault')
+    except (etree.XMLSyntaxError, ValueError) as e:
+        raise FastParseError(str(e)) from e
+    if success is None:
+        raise FastParseError('No Success element in response')
+    return SimpleNamespace(**{'Success': success, 'ErrorMessages': errors, spec.tag: records})
@@ -0,0 +1,426 @@
+# forecast_service.py
+"""Per-item demand forecast state and the whole-catalogue forecast refresh.
+
+Usage:
+    python forecast_service.py refresh [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 365
+WINDOWS = (7, 30, 90)
+EPOCH = date(1970, 1, 1)
+LEAD_TIME_DAYS = 7
+SAFETY_STOCK_DAYS = 3
+MIN_SALES_DAYS = 7
+# Days of supply reported for items with no forecast demand
+NO_DEMAND_DAYS_OF_SUPPLY = 999
+
+# 0 uses every core
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', 0))
+# Smaller catalogues are computed in-process; pool start-up would dominate
+PARALLEL_MIN_ITEMS = int(os.getenv('FORECAST_PARALLEL_MIN_ITEMS', 5000))
+# Seconds before a refresh run in its own process is killed
+FORECAST_REFRESH_TIMEOUT = float(os.getenv('FORECAST_REFRESH_TIMEOUT', 1800))
+# first-day marker for items with no sales left in the window
+NO_SALES = np.iinfo(np.int64).min
+
+
+def _day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+class ForecastState:
+    """Running demand statistics for one item, updated in O(1) per day.
+
+    Holds a ring of the last HISTORY_DAYS daily quantities ending at
+    as_of, running sums over the 7/30/90-day windows, least-squares
+    sufficient statistics over the days with sales (the same points the
+    full-history polyfit used), and per-weekday quantity sums. Advancing
+    a day retires the values leaving each window from the ring; a late
+    line for an earlier day adjusts the same statistics in place.
+    """
+
+    def __init__(self, as_of: date, first_day: Optional[date] = None):
+        self.as_of = as_of
+        self.first_day = first_day
+        self.ring = np.zeros(HISTORY_DAYS, dtype=np.float64)
+        self.window_sums = {days: 0.0 for days in WINDOWS}
+        # n, sum x, sum y, sum xy, sum xx over days with positive quantity; x is days since EPOCH
+        self.regression = np.zeros(5, dtype=np.float64)
+        self.dow_sums = np.zeros(7, dtype=np.float64)
+
+    def _slot(self, day: int) -> int:
+        return day % HISTORY_DAYS
+
+    def _regress(self, day: int, quantity: float, sign: float):
+        if quantity > 0:
+            x = float(day)
+            self.regression += sign * np.array([1.0, x, quantity, x * quantity, x * x])
+
+    def advance_to(self, target: date):
+        """Move as_of forward to target, treating the new days as having no sales"""
+        if target <= self.as_of:
+            return
+        current, last = _day(self.as_of), _day(target)
+        if last - current >= HISTORY_DAYS:
+            self.ring[:] = 0
+            self.window_sums = {days: 0.0 for days in WINDOWS}
+            self.regression[:] = 0
+            self.dow_sums[:] = 0
+            self.first_day = None
+            self.as_of = target
+            return
+        for day in range(current + 1, last + 1):
+            for days in WINDOWS:
+                self.window_sums[days] -= self.ring[self._slot(day - days)]
+            expiring = day - HISTORY_DAYS
+            value = self.ring[self._slot(expiring)]
+            if value:
+                self._regress(expiring, value, -1)
+                self.dow_sums[(expiring + 3) % 7] -= value  # 1970-01-01 was a Thursday (weekday 3)
+            self.ring[self._slot(day)] = 0.0
+        self.as_of = target
+        if self.first_day is not None and _day(self.first_day) <= last - HISTORY_DAYS:
+            # The series restarts at the next day with sales; each sale day expires once, so this stays amortized O(1)
+            days = np.arange(last - HISTORY_DAYS + 1, last + 1)
+            sold = np.flatnonzero(self.ring[days % HISTORY_DAYS])
+            self.first_day = EPOCH + timedelta(days=int(days[sold[0]])) if len(sold) else None
+
+    def add(self, sale_date: date, quantity: float):
+        """Record quantity sold on sale_date, advancing first if it is a new day"""
+        if sale_date > self.as_of:
+            self.advance_to(sale_date)
+        day, current = _day(sale_date), _day(self.as_of)
+        if day <= current - HISTORY_DAYS or not quantity:
+            return
+        slot = self._slot(day)
+        old = self.ring[slot]
+        new = old + quantity
+        self.ring[slot] = new
+        for days in WINDOWS:
+            if day > current - days:
+                self.window_sums[days] += quantity
+        self._regress(day, old, -1)
+        self._regress(day, new, 1)
+        self.dow_sums[(day + 3) % 7] += quantity
+        if self.first_day is None or sale_date < self.first_day:
+            self.first_day = sale_date
+
+    def copy(self) -> 'ForecastState':
+        state = ForecastState(self.as_of, self.first_day)
+        state.ring = self.ring.copy()
+        state.window_sums = dict(self.window_sums)
+        state.regression = self.regression.copy()
+        state.dow_sums = self.dow_sums.copy()
+        return state
+
+    @property
+    def span_days(self) -> int:
+        """Days from the first sale in the history window through as_of"""
+        if self.first_day is None:
+            return 0
+        return (self.as_of - self.first_day).days + 1
+
+    @property
+    def sales_days(self) -> int:
+        return int(round(self.regression[0]))
+
+    def trend_slope(self) -> float:
+        n, sx, sy, sxy, sxx = self.regression
+        denominator = n * sxx - sx * sx
+        if self.span_days < 30 or self.sales_days <= 10 or denominator <= 0:
+            return 0.0
+        return float((n * sxy - sx * sy) / denominator)
+
+    def daily_series(self) -> np.ndarray:
+        """Daily quantities from first_day through as_of, oldest first"""
+        span = self.span_days
+        if not span:
+            return np.zeros(0)
+        days = np.arange(_day(self.as_of) - span + 1, _day(self.as_of) + 1)
+        return self.ring[days % HISTORY_DAYS]
+
+    def day_of_week_pattern(self) -> Dict[int, float]:
+        """Mean daily quantity per weekday (Monday=0) over the span"""
+        span = self.span_days
+        if not span:
+            return {}
+        first_weekday = self.first_day.weekday()
+        counts = np.full(7, span // 7)
+        for offset in range(span % 7):
+            counts[(first_weekday + offset) % 7] += 1
+        return {dow: float(self.dow_sums[dow] / counts[dow]) for dow in range(7) if counts[dow]}
+
+    def to_record(self) -> Dict:
+        return {
+            'as_of': self.as_of,
+            'first_day': self.first_day,
+            'ring': self.ring.astype(np.float64).tobytes(),
+            'sum_7d': self.window_sums[7],
+            'sum_30d': self.window_sums[30],
+            'sum_90d': self.window_sums[90],
+            'regression': self.regression.tobytes(),
+            'dow_sums': self.dow_sums.tobytes()
+        }
+
+    @classmethod
+    def from_record(cls, record) -> 'ForecastState':
+        state = cls(record.as_of, record.first_day)
+        state.ring = np.frombuffer(record.ring, dtype=np.float64).copy()
+        state.window_sums = {7: record.sum_7d, 30: record.sum_30d, 90: record.sum_90d}
+        state.regression = np.frombuffer(record.regression, dtype=np.float64).copy()
+        state.dow_sums = np.frombuffer(record.dow_sums, dtype=np.float64).copy()
+        return state
+
+
+def forecast_summary(avg_daily: float, avg_monthly: float, trend_slope: float, lead_time: int = None) -> Dict:
+    """Forecast and inventory-planning figures shared by the API and the catalogue refresh.
+
+    lead_time is the item's supplier lead time in days; LEAD_TIME_DAYS when unknown.
+    """
+    lead_time_demand = avg_daily * (lead_time if lead_time and lead_time > 0 else LEAD_TIME_DAYS)
+    safety_stock = avg_daily * SAFETY_STOCK_DAYS
+    return {
+        'current_metrics': {
+            'avg_daily_demand': round(avg_daily, 2),
+            'avg_weekly_demand': round(avg_daily * 7, 2),
+            'avg_monthly_demand': round(avg_monthly, 2)
+        },
+        'forecast': {
+            'next_7_days': round(avg_daily * 7, 2),
+            'next_30_days': round(avg_daily * 30 * (1 + trend_slope * 0.1), 2),  # Adjust for trend
+            'trend': 'increasing' if trend_slope > 0.1 else 'decreasing' if trend_slope < -0.1 else 'stable',
+            'trend_percentage': round(trend_slope * 100, 2)
+        },
+        'inventory_planning': {
+            'reorder_point': round(lead_time_demand + safety_stock, 0),
+            'safety_stock': round(safety_stock, 0),
+            'lead_time_demand': round(lead_time_demand, 0)
+        }
+    }
+
+
+def demand_matrix(rings: np.ndarray, as_of_days: np.ndarray, first_days: np.ndarray,
+                  latest: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Roll stored rings forward to latest, vectorized over items.
+
+    Returns each item's daily quantities for the HISTORY_DAYS ending at
+    latest (oldest first) and its span, exactly as ForecastState.advance_to
+    would leave them: days after an item's own as_of are zero, and a first
+    sale that fell out of the window moves to the next day with sales.
+    """
+    days = np.arange(latest - HISTORY_DAYS + 1, latest + 1)
+    demand = rings[:, days % HISTORY_DAYS]
+    demand[days[np.newaxis, :] > as_of_days[:, np.newaxis]] = 0.0
+    first = first_days.copy()
+    expired = first <= latest - HISTORY_DAYS
+    if expired.any():
+        sold = demand[expired] != 0
+        first[expired] = np.where(sold.any(axis=1), days[0] + sold.argmax(axis=1), NO_SALES)
+    spans = np.where(first == NO_SALES, 0, latest - first + 1)
+    return demand, spans
+
+
+def compute_forecasts(demand: np.ndarray, spans: np.ndarray) -> Dict[str, np.ndarray]:
+    """Vectorized ForecastState metrics for a block of items.
+
+    demand holds one row per item of daily quantities, oldest first, all
+    ending on the same day; spans is each item's number of days since its
+    first sale in the window. Matches what ForecastState computes per item.
+    """
+    days = demand.shape[1]
+    avg_daily = np.where(spans >= 7, demand[:, -7:].sum(axis=1) / 7, 0.0)
+    avg_monthly = np.where(spans >= 30, demand[:, -30:].sum(axis=1), 0.0)
+
+    # Least squares over days with sales; x is shift-invariant, so column positions will do
+    sold = demand > 0
+    x = np.arange(days, dtype=np.float64)
+    y = np.where(sold, demand, 0.0)
+    n = sold.sum(axis=1).astype(np.float64)
+    sx = sold @ x
+    sy = y.sum(axis=1)
+    sxy = y @ x
+    sxx = sold @ (x * x)
+    denominator = n * sxx - sx * sx
+    valid = (spans >= 30) & (n > 10) & (denominator > 0)
+    slope = np.zeros(len(demand))
+    slope[valid] = (n[valid] * sxy[valid] - sx[valid] * sy[valid]) / denominator[valid]
+    return {'avg_daily': avg_daily, 'avg_monthly': avg_monthly, 'trend_slope': slope, 'sales_days': n}
+
+
+def _forecast_shard(shm_name: str, shape: Tuple[int, int], start: int, stop: int, as_of_days: np.ndarray,
+                    first_days: np.ndarray, latest: int) -> Tuple[int, Dict[str, np.ndarray]]:
+    """Pool worker: compute rows [start, stop) of the shared ring matrix"""
+    shm = SharedMemory(name=shm_name)
+    try:
+        rings = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[start:stop]
+        demand, spans = demand_matrix(rings, as_of_days, first_days, latest)
+        del rings
+        return start, compute_forecasts(demand, spans)
+    finally:
+        shm.close()
+
+
+class ForecastRunner:
+    """Recomputes the stored forecast for every item across a process pool.
+
+    The stored rings are copied once, as raw bytes, into an items x
+    HISTORY_DAYS matrix in a shared memory segment. Workers attach to it by
+    name and roll forward and forecast a shard of rows each, so only row
+    ranges, two small day arrays and the per-item results cross the process
+    boundary. Results are written to item_forecasts in one bulk replace.
+    """
+
+    def __init__(self, db_service, workers: int = None):
+        self.db_service = db_service
+        self.workers = workers or FORECAST_WORKERS or os.cpu_count() or 1
+
+    def run(self) -> Dict:
+        """Refresh item_forecasts; returns counts and timings"""
+        started = time.perf_counter()
+        as_of, records = self.db_service.get_forecast_rings()
+        lead_times = self.db_service.get_lead_times()
+        count = len(records)
+        if not count:
+            return {'items': 0, 'workers': 0}
+
+        shape = (count, HISTORY_DAYS)
+        parallel = self.workers > 1 and count >= PARALLEL_MIN_ITEMS
+        shm = SharedMemory(create=True, size=count * HISTORY_DAYS * 8) if parallel else None
+        try:
+            rings = np.ndarray(shape, dtype=np.float64, buffer=shm.buf) if shm else np.empty(shape)
+            as_of_days = np.empty(count, dtype=np.int64)
+            first_days = np.empty(count, dtype=np.int64)
+            for row, (_, item_as_of, first_day, ring) in enumerate(records):
+                rings[row] = np.frombuffer(ring, dtype=np.float64)
+                as_of_days[row] = _day(item_as_of)
+                first_days[row] = _day(first_day) if first_day is not None else NO_SALES
+            latest = _day(as_of)
+            loaded = time.perf_counter()
+
+            if parallel:
+                results = self._compute_parallel(shm.name, shape, as_of_days, first_days, latest)
+            else:
+                results = compute_forecasts(*demand_matrix(rings, as_of_days, first_days, latest))
+            del rings
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        computed = time.perf_counter()
+
+        computed_at = datetime.utcnow()
+        rows = []
+        for row, (item_number, _, _, _) in enumerate(records):
+            sales_days = int(results['sales_days'][row])
+            if sales_days < MIN_SALES_DAYS:
+                summary = forecast_summary(0.0, 0.0, 0.0)
+                summary['forecast']['trend'] = 'insufficient_data'
+            else:
+                summary = forecast_summary(
+                    float(results['avg_daily'][row]),
+                    float(results['avg_monthly'][row]),
+                    float(results['trend_slope'][row]),
+                    lead_times.get(item_number)
+                )
+            rows.append({
+                'item_number': item_number,
+                **summary['current_metrics'],
+                **summary['forecast'],
+                **summary['inventory_planning'],
+                'sales_days': sales_days,
+                'as_of': as_of,
+                'computed_at': computed_at
+            })
+        if not self.db_service.store_item_forecasts(rows):
+            raise RuntimeError('Failed to store item forecasts')
+
+        stats = {
+            'items': count,
+            'workers': self.workers if parallel else 1,
+            'load_seconds': round(loaded - started, 3),
+            'compute_seconds': round(computed - loaded, 3),
+            'store_seconds': round(time.perf_counter() - computed, 3)
+        }
+        logger.info(f"Refreshed item forecasts: {stats}")
+        return stats
+
+    def _compute_parallel(self, shm_name: str, shape: Tuple[int, int], as_of_days: np.ndarray,
+                          first_days: np.ndarray, latest: int) -> Dict[str, np.ndarray]:
+        count = shape[0]
+        # A few shards per worker keeps the cores busy when shards finish unevenly
+        shard_size = max(1, -(-count // (self.workers * 4)))
+        results = {}
+        # Never fork: the caller may have threads (scheduler, request handlers, pools) holding locks.
+        # Fresh workers re-import __main__, so run this from the CLI rather than inside app.py
+        # (see refresh_in_subprocess)
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context(start_method)) as pool:
+            futures = [
+                pool.submit(_forecast_shard, shm_name, shape, start, min(start + shard_size, count),
+                            as_of_days[start:start + shard_size], first_days[start:start + shard_size], latest)
+                for start in range(0, count, shard_size)
+            ]
+            for future in futures:
+                start, shard = future.result()
+                for name, values in shard.items():
+                    results.setdefault(name, np.zeros(count))[start:start + len(values)] = values
+        return results
+
+
+def refresh_in_subprocess(database_url: str, workers: int = None,
+                          timeout: float = FORECAST_REFRESH_TIMEOUT) -> Dict:
+    """Run ForecastRunner in a fresh interpreter (`python forecast_service.py refresh`).
+
+    Keeps the process pool out of multi-threaded web workers and stops it
+    from re-importing the app. Returns the runner's stats; raises
+    RuntimeError if the run fails or is killed after timeout seconds.
+    """
+    command = [sys.executable, os.path.abspath(__file__), 'refresh']
+    if workers:
+        command += ['--workers', str(workers)]
+    # The URL goes through the environment so credentials stay out of the process list.
+    # Its own session lets a timeout kill the refresh together with its worker pool.
+    with subprocess.Popen(command, env=dict(os.environ, DATABASE_URL=database_url), stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, text=True, start_new_session=True) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            raise RuntimeError(f"Forecast refresh timed out after {timeout:g} s")
+    if process.returncode != 0:
+        raise RuntimeError(f"Forecast refresh failed: {stderr.strip()[-2000:]}")
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str]):
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    from database_service import DatabaseService
+
+    command = argv[1] if len(argv) > 1 else 'refresh'
+    workers = int(argv[argv.index('--workers') + 1]) if '--workers' in argv else None
+    if command == 'refresh':
+        print(json.dumps(ForecastRunner(DatabaseService(), workers).run()))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
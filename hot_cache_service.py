@@ -0,0 +1,612 @@
+# hot_cache_service.py
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import snapshot_service
+
+logger = logging.getLogger(__name__)
+
+HOT_CACHE_ENABLED = os.getenv('HOT_CACHE_ENABLED', 'true').lower() == 'true'
+HOT_CACHE_DAYS = int(os.getenv('HOT_CACHE_DAYS', 90))
+HOT_CACHE_MAX_ROWS = int(os.getenv('HOT_CACHE_MAX_ROWS', 2_000_000))
+HOT_CACHE_REFRESH_SECONDS = float(os.getenv('HOT_CACHE_REFRESH_SECONDS', 30))
+# Rows committed late with an older created_at are still picked up within this lag
+HOT_CACHE_LOOKBACK_SECONDS = float(os.getenv('HOT_CACHE_LOOKBACK_SECONDS', 120))
+
+EPOCH = date(1970, 1, 1)
+
+COLUMNS = {
+    'id': np.int64,
+    'day': np.int32,        # days since 1970-01-01
+    'hour': np.int8,
+    'item': np.int32,       # codes into the item dictionary
+    'account': np.int32,
+    'vendor': np.int32,     # -1 when the vendor is unknown
+    'branch': np.int32,     # -1 when the branch is unknown
+    'invoice': np.uint64,   # hashed invoice id; only ever compared for distinct counts
+    'quantity': np.float64,
+    'revenue': np.float64
+}
+
+_PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def day_number(value: date) -> int:
+    return (value - EPOCH).days
+
+
+def live_ranges(stored_days, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+    """Contiguous (first, last) runs of days from start_date through end_date that are not stored"""
+    ranges = []
+    day = start_date
+    while day <= end_date:
+        if day in stored_days:
+            day += timedelta(days=1)
+            continue
+        first = day
+        while day + timedelta(days=1) <= end_date and day + timedelta(days=1) not in stored_days:
+            day += timedelta(days=1)
+        ranges.append((first, day))
+        day += timedelta(days=1)
+    return ranges
+
+
+def _distinct(keys: np.ndarray) -> np.ndarray:
+    """Mask selecting the first occurrence of each key (hash-based, no sort)"""
+    return ~pd.Series(keys).duplicated().values
+
+
+class StringList:
+    """Strings by code: an optional shared (mapped) base plus worker-local additions and overrides"""
+
+    def __init__(self, base: Sequence[str] = ()):
+        self._base = base
+        self._extra: List[str] = []
+        self._overrides: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._extra)
+
+    def __getitem__(self, code: int) -> str:
+        if code in self._overrides:
+            return self._overrides[code]
+        if code < len(self._base):
+            return self._base[code]
+        return self._extra[code - len(self._base)]
+
+    def __setitem__(self, code: int, value: str):
+        if code < len(self._base):
+            self._overrides[code] = value
+        else:
+            self._extra[code - len(self._base)] = value
+
+    def append(self, value: str):
+        self._extra.append(value)
+
+    def __iter__(self):
+        return (self[code] for code in range(len(self)))
+
+
+class Dictionary:
+    """Append-only string dictionary; codes stay valid for the life of the process.
+
+    With a snapshot base the value-to-code map is only built when a lookup
+    or encode needs it.
+    """
+
+    def __init__(self, base: Sequence[str] = ()):
+        self.values = StringList(base)
+        self._codes: Optional[Dict[str, int]] = None
+
+    @property
+    def codes(self) -> Dict[str, int]:
+        if self._codes is None:
+            self._codes = {value: code for code, value in enumerate(self.values)}
+        return self._codes
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def code(self, value: str) -> Optional[int]:
+        return self.codes.get(value)
+
+    def encode(self, values) -> np.ndarray:
+        inverse, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1  # factorize marks None as -1, which indexes the last slot
+        codes = self.codes
+        for i, value in enumerate(uniques):
+            code = codes.get(value)
+            if code is None:
+                code = len(self.values)
+                codes[value] = code
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[inverse]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SalesColumns:
+    """Growable column buffers; appends are amortized by over-allocating"""
+
+    def __init__(self, capacity: int = 0):
+        self.arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.arrays['id'])
+
+    def append(self, chunk: Dict[str, np.ndarray]):
+        count = len(chunk['id'])
+        needed = self.size + count
+        if needed > self.capacity:
+            capacity = max(needed, int(self.capacity * 1.5), 1024)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        for name, array in self.arrays.items():
+            array[self.size:needed] = chunk[name]
+        self.size = needed
+
+    def select(self, keep: np.ndarray) -> 'SalesColumns':
+        columns = SalesColumns()
+        columns.arrays = {name: array[:self.size][keep] for name, array in self.arrays.items()}
+        columns.size = len(columns.arrays['id'])
+        return columns
+
+    def views(self) -> Dict[str, np.ndarray]:
+        return {name: array[:self.size] for name, array in self.arrays.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+class SalesView:
+    """Immutable snapshot of the hot cache with vectorized aggregations.
+
+    Rows live in one or more segments (a mapped shared snapshot and the
+    worker's own newer rows). Date ranges are inclusive and given as dates;
+    rows are selected with a boolean mask over the day column (and the
+    branch column when a branch is given), then grouped with np.bincount
+    over the dictionary codes.
+
+    Only days in stored_days (ingested per the coverage ledger) are
+    aggregated; the rest of a period is reported by live_ranges and comes
+    from ECI, so a day is never zero-filled or counted from both sources.
+    """
+
+    def __init__(self, segments: List[Dict[str, np.ndarray]], items: Dictionary, item_descriptions: StringList,
+                 accounts: Dictionary, vendors: Dictionary, branches: Dictionary, covered_from: date,
+                 through: Optional[date], stored_days: frozenset = frozenset()):
+        self.segments = segments
+        self.items = items
+        self.item_descriptions = item_descriptions
+        self.accounts = accounts
+        self.vendors = vendors
+        self.branches = branches
+        self.covered_from = covered_from
+        self.through = through
+        self.stored_days = stored_days
+        # stored_days as a lookup indexed by day number minus covered_from's
+        self._first_day = day_number(covered_from)
+        offsets = [day_number(day) - self._first_day for day in stored_days if day >= covered_from]
+        self._stored = np.zeros(max(offsets) + 1 if offsets else 0, dtype=bool)
+        self._stored[offsets] = True
+        self._item_count = len(items)
+        self._vendor_count = len(vendors)
+
+    @property
+    def row_count(self) -> int:
+        return sum(len(segment['id']) for segment in self.segments)
+
+    def live_ranges(self, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        """Runs of days in the period that are not ingested yet and have to come from ECI"""
+        return live_ranges(self.stored_days, start_date, end_date)
+
+    def _stored_mask(self, day: np.ndarray, first: int, last: int) -> Optional[np.ndarray]:
+        """Mask of rows on stored days, or None when every day from first to last is stored"""
+        lo, hi = first - self._first_day, last - self._first_day + 1
+        if lo >= 0 and hi <= len(self._stored) and self._stored[lo:hi].all():
+            return None
+        if not len(self._stored):
+            return np.zeros(len(day), dtype=bool)
+        offset = day.astype(np.int64) - self._first_day
+        inside = (offset >= 0) & (offset < len(self._stored))
+        return inside & self._stored[np.clip(offset, 0, len(self._stored) - 1)]
+
+    def _rows(self, start_date: date, end_date: date, *names: str, known_vendor: bool = False,
+              branch: Optional[str] = None) -> List[np.ndarray]:
+        """The named columns for rows dated start_date to end_date, across all segments"""
+        first, last = day_number(start_date), day_number(end_date)
+        if branch is not None:
+            # A branch with no cached sales gets a code no row carries
+            branch_code = self.branches.code(branch)
+            branch_code = -2 if branch_code is None else branch_code
+        selected = {name: [] for name in names}
+        for segment in self.segments:
+            day = segment['day']
+            mask = (day >= first) & (day <= last)
+            stored = self._stored_mask(day, first, last)
+            if stored is not None:
+                mask &= stored
+            if known_vendor:
+                mask &= segment['vendor'] >= 0
+            if branch is not None:
+                mask &= segment['branch'] == branch_code
+            for name in names:
+                selected[name].append(segment[name][mask])
+        return [
+            np.concatenate(parts) if len(parts) != 1 else parts[0]
+            for parts in selected.values()
+        ]
+
+    def summary(self, start_date: date, end_date: date, branch: Optional[str] = None) -> Dict:
+        """Revenue, distinct invoices, average invoice value and units sold"""
+        revenue, quantity, invoice = self._rows(start_date, end_date, 'revenue', 'quantity', 'invoice', branch=branch)
+        total = float(revenue.sum())
+        transactions = int(_distinct(invoice).sum())
+        return {
+            'total_revenue': total,
+            'total_transactions': transactions,
+            'average_transaction': total / transactions if transactions else 0,
+            'items_sold': int(quantity.sum())
+        }
+
+    def daily_revenue(self, start_date: date, end_date: date, branch: Optional[str] = None) -> np.ndarray:
+        """Revenue per day from start_date to end_date, zero-filled"""
+        day, revenue = self._rows(start_date, end_date, 'day', 'revenue', branch=branch)
+        days = (end_date - start_date).days + 1
+        return np.bincount(day - day_number(start_date), weights=revenue, minlength=days)[:days]
+
+    def revenue_by_hour(self, start_date: date, end_date: date, branch: Optional[str] = None) -> np.ndarray:
+        """Revenue per hour from start_date 00:00 through end_date 23:00, zero-filled"""
+        day, hour, revenue = self._rows(start_date, end_date, 'day', 'hour', 'revenue', branch=branch)
+        hours = ((end_date - start_date).days + 1) * 24
+        slot = (day - day_number(start_date)).astype(np.int64) * 24 + hour
+        return np.bincount(slot, weights=revenue, minlength=hours)[:hours]
+
+    def hourly_revenue(self, start_date: date, end_date: date, branch: Optional[str] = None) -> np.ndarray:
+        hour, revenue = self._rows(start_date, end_date, 'hour', 'revenue', branch=branch)
+        return np.bincount(hour, weights=revenue, minlength=24)
+
+    def item_totals(self, start_date: date, end_date: date, branch: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Revenue, quantity and distinct invoices per item code"""
+        item, revenue, quantity, invoice = self._rows(
+            start_date, end_date, 'item', 'revenue', 'quantity', 'invoice', branch=branch
+        )
+        size = self._item_count
+        pairs = invoice ^ (item.astype(np.uint64) * _PAIR_MULTIPLIER)
+        return {
+            'revenue': np.bincount(item, weights=revenue, minlength=size),
+            'quantity': np.bincount(item, weights=quantity, minlength=size),
+            'transactions': np.bincount(item[_distinct(pairs)], minlength=size)
+        }
+
+    def top_items(self, start_date: date, end_date: date, limit: int = 10, branch: Optional[str] = None) -> List[Dict]:
+        """Top items by revenue, in the shape of AnalyticsService.get_top_items"""
+        totals = self.item_totals(start_date, end_date, branch)
+        revenue = totals['revenue']
+        sold = np.flatnonzero(totals['transactions'])
+        if len(sold) > limit:
+            sold = sold[np.argpartition(-revenue[sold], limit - 1)[:limit]]
+        sold = sold[np.argsort(-revenue[sold], kind='stable')]
+        return [
+            {
+                'item_number': self.items[code],
+                'description': self.item_descriptions[code],
+                'quantity_sold': float(totals['quantity'][code]),
+                'revenue': float(revenue[code]),
+                'transactions': int(totals['transactions'][code])
+            }
+            for code in sold
+        ]
+
+    def description_revenue(self, start_date: date, end_date: date, limit: int = 10,
+                            branch: Optional[str] = None) -> List[tuple]:
+        """Top (description, revenue) pairs, merging items that share a description"""
+        revenue = self.item_totals(start_date, end_date, branch)['revenue']
+        by_description: Dict[str, float] = {}
+        for code in np.flatnonzero(revenue):
+            description = self.item_descriptions[code]
+            by_description[description] = by_description.get(description, 0.0) + float(revenue[code])
+        return sorted(by_description.items(), key=lambda pair: pair[1], reverse=True)[:limit]
+
+    def brand_summary(self, start_date: date, end_date: date, branch: Optional[str] = None) -> List[Dict]:
+        """Sales per vendor, in the shape of AnalyticsService.get_sales_by_brand"""
+        vendor, item, line_revenue, quantity, invoice = self._rows(
+            start_date, end_date, 'vendor', 'item', 'revenue', 'quantity', 'invoice', known_vendor=True, branch=branch
+        )
+        size = self._vendor_count
+        revenue = np.bincount(vendor, weights=line_revenue, minlength=size)
+        units = np.bincount(vendor, weights=quantity, minlength=size)
+        item_pairs = vendor.astype(np.int64) * max(self._item_count, 1) + item
+        invoice_pairs = invoice ^ (vendor.astype(np.uint64) * _PAIR_MULTIPLIER)
+        unique_items = np.bincount(vendor[_distinct(item_pairs)], minlength=size)
+        transactions = np.bincount(vendor[_distinct(invoice_pairs)], minlength=size)
+
+        total_revenue = revenue.sum()
+        sold = np.flatnonzero(transactions)
+        sold = sold[np.argsort(-revenue[sold], kind='stable')]
+        return [
+            {
+                'brand': self.vendors[code] or 'Unknown',
+                'units_sold': float(units[code]),
+                'revenue': float(revenue[code]),
+                'unique_items': int(unique_items[code]),
+                'transactions': int(transactions[code]),
+                'revenue_percentage': round(float(revenue[code] / total_revenue * 100), 2) if total_revenue else 0.0
+            }
+            for code in sold
+        ]
+
+
+class HotSalesCache:
+    """Per-worker columnar cache of the last HOT_CACHE_DAYS of sales_data.
+
+    The first use loads the window from the database. Later refreshes (at
+    most every HOT_CACHE_REFRESH_SECONDS, on access) fetch only rows whose
+    created_at is past the high-water mark. Rows older than the window are
+    evicted as the days roll over. If the window holds more than max_rows,
+    the oldest days are dropped and covered_from moves forward, so callers
+    asking for earlier days fall back to the database. Each refresh also
+    reads which days of the window are ingested from the coverage ledger;
+    the view reports the other days as live, to be fetched from ECI. When
+    the ledger shows a day's stored rows were replaced since the window was
+    loaded, the window is reloaded, as held rows may no longer exist.
+
+    With SALES_SNAPSHOT_DIR set, the window is instead mapped from the
+    latest published snapshot, which every worker on the host shares, and
+    only rows newer than the snapshot are held privately. Each refresh
+    checks the snapshot pointer and swaps to a newer version when one has
+    been published.
+    """
+
+    def __init__(self, db_service, days: int = HOT_CACHE_DAYS, max_rows: int = HOT_CACHE_MAX_ROWS,
+                 refresh_seconds: float = HOT_CACHE_REFRESH_SECONDS, enabled: bool = HOT_CACHE_ENABLED,
+                 snapshot_dir: str = None):
+        self.db_service = db_service
+        self.days = days
+        self.max_rows = max_rows
+        self.refresh_seconds = refresh_seconds
+        self.enabled = enabled
+        self.snapshot_dir = snapshot_service.SNAPSHOT_DIR if snapshot_dir is None else snapshot_dir
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self, snapshot: 'snapshot_service.Snapshot' = None):
+        self._snapshot = snapshot
+        self._columns = SalesColumns()
+        self._high_water: Optional[datetime] = None
+        self._recent_ids: Dict[int, datetime] = {}
+        self._replaced_at: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._view: Optional[SalesView] = None
+        if snapshot is None:
+            self._items = Dictionary()
+            self._item_descriptions = StringList()
+            self._accounts = Dictionary()
+            self._vendors = Dictionary()
+            self._branches = Dictionary()
+            self._covered_from: Optional[date] = None
+        else:
+            meta = snapshot.meta
+            self._items = Dictionary(snapshot.strings['items'])
+            self._item_descriptions = StringList(snapshot.strings['item_descriptions'])
+            self._accounts = Dictionary(snapshot.strings['accounts'])
+            self._vendors = Dictionary(snapshot.strings['vendors'])
+            self._branches = Dictionary(snapshot.strings['branches'])
+            self._covered_from = date.fromisoformat(meta['covered_from'])
+            if meta['high_water']:
+                self._high_water = datetime.fromisoformat(meta['high_water'])
+            self._recent_ids = {int(i): datetime.fromisoformat(c) for i, c in meta['recent_ids']}
+            if meta.get('replaced_at'):
+                self._replaced_at = datetime.fromisoformat(meta['replaced_at'])
+
+    def view(self, start_date: date = None) -> Optional[SalesView]:
+        """Current snapshot, or None if the cache is off, failed to load, or starts after start_date"""
+        if not self.enabled:
+            return None
+        if time.monotonic() - self._refreshed_at > self.refresh_seconds:
+            # One thread refreshes while others keep reading the previous snapshot
+            if self._lock.acquire(blocking=self._view is None):
+                try:
+                    if time.monotonic() - self._refreshed_at > self.refresh_seconds:
+                        self._refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing hot sales cache: {str(e)}")
+                    if self._view is None:
+                        # Discard a partial first load so the retry starts clean
+                        self._reset()
+                    self._refreshed_at = time.monotonic()
+                finally:
+                    self._lock.release()
+        view = self._view
+        if view is None or (start_date is not None and start_date < view.covered_from):
+            return None
+        return view
+
+    def refresh(self) -> Optional[SalesView]:
+        """Refresh now, waiting for any refresh in progress; errors propagate to the caller"""
+        with self._lock:
+            self._refresh()
+        return self._view
+
+    def invalidate(self):
+        """Drop everything; the next access reloads the window"""
+        with self._lock:
+            self._reset()
+
+    def _swap_snapshot(self, replaced_at: Optional[datetime]) -> bool:
+        """Map a newly published snapshot, if there is one; returns whether the base changed"""
+        if not self.snapshot_dir:
+            return False
+        version = snapshot_service.current_version(self.snapshot_dir)
+        if version is None or (self._snapshot is not None and self._snapshot.version == version):
+            return False
+        snapshot = snapshot_service.load(version, self.snapshot_dir)
+        if not set(COLUMNS) <= set(snapshot.columns):
+            # Published by an older release; keep reading the database until a current one appears
+            logger.info(f"Skipping sales snapshot {version} with an older column layout")
+            return False
+        published_replaced_at = snapshot.meta.get('replaced_at')
+        if replaced_at is not None and published_replaced_at != replaced_at.isoformat():
+            # Published before stored rows were replaced; keep reading the database until a newer one appears
+            logger.info(f"Skipping sales snapshot {version} that predates replaced sales rows")
+            return False
+        self._reset(snapshot)
+        logger.info(f"Mapped sales snapshot {version}")
+        return True
+
+    def _refresh(self):
+        start = time.perf_counter()
+        window_start = date.today() - timedelta(days=self.days)
+        with self.db_service.primary_reads():
+            replaced_at = self.db_service.get_last_replacement()
+        if self._view is not None and replaced_at != self._replaced_at:
+            logger.info("Stored sales rows were replaced; reloading the hot sales cache")
+            self._reset()
+        swapped = self._swap_snapshot(replaced_at)
+        full_load = self._view is None and self._snapshot is None
+        if full_load:
+            self._covered_from = window_start
+            chunks = self.db_service.iter_sales_columns(
+                datetime.combine(window_start, datetime.min.time())
+            )
+        else:
+            created_from = None
+            if self._high_water is not None:
+                created_from = self._high_water - timedelta(seconds=HOT_CACHE_LOOKBACK_SECONDS)
+            chunks = self.db_service.iter_sales_columns(
+                datetime.combine(self._covered_from, datetime.min.time()),
+                created_from=created_from
+            )
+
+        # Read the ledger before the rows: a day ingested in between stays live (from ECI) until
+        # the next refresh rather than being counted from both sources
+        with self.db_service.primary_reads():
+            stored_days = frozenset(self.db_service.get_stored_days(self._covered_from, date.today()))
+
+        added = 0
+        for rows in chunks:
+            added += self._append(rows)
+
+        if window_start > self._covered_from:
+            self._evict_before(window_start)
+        if self._snapshot is None and self._columns.size > self.max_rows:
+            self._trim_to_max_rows()
+
+        segments = [self._columns.views()]
+        if self._snapshot is not None:
+            segments.insert(0, self._snapshot.columns)
+        last_days = [int(segment['day'].max()) for segment in segments if len(segment['day'])]
+        through = EPOCH + timedelta(days=max(last_days)) if last_days else None
+        self._view = SalesView(
+            segments, self._items, self._item_descriptions, self._accounts, self._vendors, self._branches,
+            self._covered_from, through, stored_days
+        )
+        self._replaced_at = replaced_at
+        self._refreshed_at = time.monotonic()
+        if full_load or swapped or added:
+            source = 'loaded' if full_load else f'mapped {self._snapshot.version}' if swapped else 'refreshed'
+            logger.info(f"Hot sales cache {source}: +{added} rows, {self._view.row_count} total, "
+                        f"{self._columns.nbytes / 1e6:.1f} MB private, "
+                        f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _append(self, rows: List[tuple]) -> int:
+        df = pd.DataFrame.from_records(rows, columns=[
+            'id', 'invoice_id', 'invoice_date', 'account_number', 'item_number',
+            'description', 'quantity', 'extended_price', 'vendor_code', 'branch', 'created_at'
+        ])
+        if self._recent_ids:
+            df = df[~df['id'].isin(list(self._recent_ids))]
+        if df.empty:
+            return 0
+
+        invoice_dates = pd.to_datetime(df['invoice_date'])
+        items = self._items.encode(df['item_number'].values)
+        while len(self._item_descriptions) < len(self._items):
+            self._item_descriptions.append('')
+        latest = pd.DataFrame({'item': items, 'description': df['description'].values}).drop_duplicates('item', keep='last')
+        for code, description in zip(latest['item'].values, latest['description'].values):
+            if self._item_descriptions[code] != (description or ''):
+                self._item_descriptions[code] = description or ''
+
+        self._columns.append({
+            'id': df['id'].values,
+            'day': invoice_dates.values.astype('datetime64[D]').astype(np.int64),
+            'hour': invoice_dates.dt.hour.values,
+            'item': items,
+            'account': self._accounts.encode(df['account_number'].values),
+            'vendor': self._vendors.encode(df['vendor_code'].values),
+            'branch': self._branches.encode(df['branch'].values),
+            'invoice': pd.util.hash_array(df['invoice_id'].values.astype(object)),
+            'quantity': df['quantity'].fillna(0).values,
+            'revenue': df['extended_price'].fillna(0).values
+        })
+
+        # Track the created_at high-water mark and the ids inside the lookback lag
+        created = pd.to_datetime(df['created_at'])
+        newest = created.max().to_pydatetime()
+        self._high_water = max(self._high_water or newest, newest)
+        horizon = self._high_water - timedelta(seconds=HOT_CACHE_LOOKBACK_SECONDS)
+        self._recent_ids.update((int(i), c) for i, c in zip(df['id'].values, created) if c >= horizon)
+        self._recent_ids = {i: c for i, c in self._recent_ids.items() if c >= horizon}
+        return len(df)
+
+    def _evict_before(self, window_start: date):
+        # Mapped snapshot rows cannot be dropped; moving covered_from keeps them out of every query
+        keep = self._columns.views()['day'] >= day_number(window_start)
+        if not keep.all():
+            self._columns = self._columns.select(keep)
+        self._covered_from = window_start
+
+    def _trim_to_max_rows(self):
+        """Drop the oldest whole days until the cache fits in max_rows"""
+        day = self._columns.views()['day']
+        first = int(day.min())
+        per_day = np.bincount(day - first)
+        newest_first = np.cumsum(per_day[::-1])
+        kept_days = int(np.searchsorted(newest_first, self.max_rows, side='right'))
+        cutoff = EPOCH + timedelta(days=first + len(per_day) - max(kept_days, 1))
+        self._evict_before(cutoff)
+        logger.info(f"Hot sales cache over {self.max_rows} rows; now covering from {cutoff}")
+
+    def publish_snapshot(self, directory: str = None) -> str:
+        """Write the current window as a shared snapshot for every worker to map"""
+        directory = directory or self.snapshot_dir
+        view = self.refresh()
+        if view is None:
+            raise RuntimeError('Hot sales cache could not be loaded')
+
+        first = day_number(view.covered_from)
+        columns = {}
+        for name in COLUMNS:
+            parts = [segment[name][segment['day'] >= first] for segment in view.segments]
+            columns[name] = np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+        meta = {
+            'covered_from': view.covered_from.isoformat(),
+            'through': view.through.isoformat() if view.through else None,
+            'high_water': self._high_water.isoformat() if self._high_water else None,
+            'recent_ids': [[i, c.isoformat()] for i, c in self._recent_ids.items()],
+            'replaced_at': self._replaced_at.isoformat() if self._replaced_at else None
+        }
+        strings = {
+            'items': list(view.items.values),
+            'item_descriptions': list(view.item_descriptions),
+            'accounts': list(view.accounts.values),
+            'vendors': list(view.vendors.values),
+            'branches': list(view.branches.values)
+        }
+        return snapshot_service.publish(columns, strings, meta, directory)
@@ -0,0 +1,159 @@
+# item_search_service.py
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from bisect import bisect_left
+from typing import List, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+ITEM_INDEX_TTL = int(os.getenv('ITEM_INDEX_TTL', 3600))
+ITEM_INDEX_SALES_DAYS = int(os.getenv('ITEM_INDEX_SALES_DAYS', 90))
+
+# One- and two-character prefixes match a large share of the catalogue, so their
+# best-ranked items are precomputed instead of scanned per keystroke
+SHORT_PREFIX_LENGTH = 2
+SHORT_PREFIX_TOP = 100
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+class ItemSearchIndex:
+    """In-memory prefix index over item numbers and description words.
+
+    Items are stored in sales-rank order (most sold first), so an item's
+    position doubles as its rank and the best matches for a query are
+    simply the smallest positions among the matching keys. Keys live in
+    one sorted list; a prefix lookup is a bisect plus a scan of the
+    matching run, except for very short prefixes whose top matches are
+    precomputed.
+    """
+
+    def __init__(self, db_service, ttl: int = ITEM_INDEX_TTL, sales_days: int = ITEM_INDEX_SALES_DAYS):
+        self.db_service = db_service
+        self.ttl = ttl
+        self.sales_days = sales_days
+        # Swapped as a whole so readers never see a half-built index
+        self._state = _IndexState([], [], [], [], {})
+        self._built_at = 0.0
+        self._build_lock = threading.Lock()
+
+    def build(self) -> int:
+        """Rebuild the index from the database and return the number of items"""
+        start = time.perf_counter()
+        catalogue = self.db_service.get_item_catalogue(self.sales_days)
+        items = sorted(catalogue, key=lambda item: (-item['sale_count'], -item['total_quantity'], item['item_number']))
+
+        entries = []
+        item_keys = []
+        short = {}
+        for position, item in enumerate(items):
+            item['rank'] = position + 1
+            keys = {item['item_number'].lower()}
+            keys.update(_tokens(item['item_number']))
+            keys.update(_tokens(item['description']))
+            item_keys.append(tuple(keys))
+            entries.extend((key, position) for key in keys)
+            # Items arrive in rank order, so each bucket fills with the best matches
+            for prefix in {key[:n] for key in keys for n in range(1, SHORT_PREFIX_LENGTH + 1)}:
+                bucket = short.setdefault(prefix, [])
+                if len(bucket) < SHORT_PREFIX_TOP:
+                    bucket.append(position)
+        entries.sort()
+
+        self._state = _IndexState(
+            items, item_keys,
+            [key for key, _ in entries], [position for _, position in entries],
+            short
+        )
+        self._built_at = time.monotonic()
+
+        logger.info(f"Built item search index: {len(items)} items, {len(entries)} keys "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(items)
+
+    def _ensure_fresh(self) -> '_IndexState':
+        if not self._built_at or time.monotonic() - self._built_at > self.ttl:
+            # One thread rebuilds an expired index while the others keep using the old one;
+            # with no index yet, everyone waits for the first build
+            if self._build_lock.acquire(blocking=not self._built_at):
+                try:
+                    if not self._built_at or time.monotonic() - self._built_at > self.ttl:
+                        self.build()
+                except Exception as e:
+                    logger.error(f"Error building item search index: {str(e)}")
+                    if not self._built_at:
+                        raise
+                finally:
+                    self._build_lock.release()
+        return self._state
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Items matching every word of the query as a prefix, best sellers first.
+
+        The whole query is also tried as an item-number prefix, so part
+        numbers containing punctuation match as typed.
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return self.top(limit)
+        state = self._ensure_fresh()
+
+        # Candidates come from the most selective (longest) word; the other
+        # words are checked against each candidate's own keys
+        words = sorted(set(_tokens(query)), key=len, reverse=True)
+        matches = set()
+        if words:
+            others = words[1:]
+            matches = {
+                position for position in state.prefix_positions(words[0])
+                if all(any(key.startswith(word) for key in state.item_keys[position]) for word in others)
+            }
+            if others and len(words[0]) <= SHORT_PREFIX_LENGTH and len(matches) < limit:
+                # The precomputed top list was too narrow for this combination
+                matches = {
+                    position for position in state.prefix_positions(words[0], exhaustive=True)
+                    if all(any(key.startswith(word) for key in state.item_keys[position]) for word in others)
+                }
+        matches |= state.prefix_positions(query)
+        return [state.items[position] for position in heapq.nsmallest(limit, matches)]
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Best-selling items over the index's sales window"""
+        items = self._ensure_fresh().items
+        return [item for item in items[:limit] if item['sale_count'] > 0]
+
+
+class _IndexState:
+    __slots__ = ('items', 'item_keys', 'keys', 'positions', 'short')
+
+    def __init__(self, items: List[Dict], item_keys: List[Tuple[str, ...]], keys: List[str],
+                 positions: List[int], short: Dict[str, List[int]]):
+        self.items = items
+        self.item_keys = item_keys
+        self.keys = keys
+        self.positions = positions
+        self.short = short
+
+    def prefix_positions(self, prefix: str, exhaustive: bool = False) -> set:
+        """Positions of items with a key starting with prefix.
+
+        For short prefixes only the best-ranked SHORT_PREFIX_TOP are
+        returned unless exhaustive is set.
+        """
+        if len(prefix) <= SHORT_PREFIX_LENGTH and not exhaustive:
+            return set(self.short.get(prefix, ()))
+        keys, positions = self.keys, self.positions
+        matches = set()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            matches.add(positions[i])
+            i += 1
+        return matches
@@ -0,0 +1,141 @@
+# metrics_service.py
+import os
+import time
+import logging
+import functools
+from typing import Callable, Tuple
+
+from flask import has_request_context, request
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAYLOAD_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+# ECI SOAP operations, labelled with the Flask endpoint that triggered them
+ECI_REQUESTS = Counter(
+    'eci_requests_total', 'ECI API calls by operation and outcome',
+    ['operation', 'endpoint', 'status']
+)
+ECI_LATENCY = Histogram(
+    'eci_request_duration_seconds', 'ECI API call latency',
+    ['operation'], buckets=LATENCY_BUCKETS
+)
+ECI_PAYLOAD_BYTES = Histogram(
+    'eci_response_bytes', 'ECI API response payload size',
+    ['operation'], buckets=PAYLOAD_BUCKETS
+)
+
+# Database
+DB_LATENCY = Histogram(
+    'db_method_duration_seconds', 'DatabaseService method latency',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time a checkout waited for a pooled connection (including connecting)',
+    ['pool'], buckets=POOL_WAIT_BUCKETS
+)
+DB_CONNECTION_HELD = Histogram(
+    'db_connection_held_seconds', 'Time a pooled connection stayed checked out',
+    ['pool'], buckets=LATENCY_BUCKETS
+)
+
+# HTTP routes
+ROUTE_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Flask route latency',
+    ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+
+# flask_caching
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by endpoint and result',
+    ['endpoint', 'result']
+)
+
+CACHE_VALUE_BYTES = Counter(
+    'cache_value_bytes_total', 'Cache values written, serialized and as stored after compression',
+    ['endpoint', 'stage']
+)
+
+
+def current_endpoint() -> str:
+    """Flask endpoint handling the current request, or 'background' outside requests"""
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+def observe_eci_call(operation: str, duration: float, status: str):
+    ECI_REQUESTS.labels(operation, current_endpoint(), status).inc()
+    ECI_LATENCY.labels(operation).observe(duration)
+
+
+def observe_eci_payload(operation: str, size: int):
+    ECI_PAYLOAD_BYTES.labels(operation).observe(size)
+
+
+def track_db(fn: Callable) -> Callable:
+    """Decorator recording the latency of a DatabaseService method"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            DB_LATENCY.labels(fn.__name__).observe(time.perf_counter() - start)
+    return wrapper
+
+
+def observe_cache_value(serialized: int, stored: int):
+    endpoint = current_endpoint()
+    CACHE_VALUE_BYTES.labels(endpoint, 'serialized').inc(serialized)
+    CACHE_VALUE_BYTES.labels(endpoint, 'stored').inc(stored)
+
+
+def observe_pool_wait(pool: str, duration: float):
+    DB_POOL_WAIT.labels(pool).observe(duration)
+
+
+def observe_connection_held(pool: str, duration: float):
+    DB_CONNECTION_HELD.labels(pool).observe(duration)
+
+
+def observe_route(endpoint: str, method: str, status: int, duration: float):
+    ROUTE_LATENCY.labels(endpoint, method, str(status)).observe(duration)
+
+
+def instrument_cache(backend):
+    """Wrap a flask_caching backend's get() to count hits and misses"""
+    original_get = backend.get
+
+    @functools.wraps(original_get)
+    def get(key):
+        try:
+            value = original_get(key)
+        except Exception:
+            CACHE_REQUESTS.labels(current_endpoint(), 'error').inc()
+            raise
+        CACHE_REQUESTS.labels(current_endpoint(), 'hit' if value is not None else 'miss').inc()
+        return value
+
+    backend.get = get
+    return backend
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Render all metrics in Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set (gunicorn with several workers) the
+    samples of every worker are aggregated from the shared directory.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
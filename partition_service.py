@@ -0,0 +1,284 @@
+# partition_service.py
+"""Monthly range partitioning of sales_data on PostgreSQL.
+
+Usage:
+    python partition_service.py status
+    python partition_service.py migrate      # convert an existing plain sales_data table
+                                             # (add --drop-old to drop the unpartitioned copy)
+    python partition_service.py maintain     # create upcoming partitions, archive expired ones
+"""
+import os
+import sys
+import logging
+from datetime import date
+from typing import List, Dict, Iterable, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+SALES_TABLE = 'sales_data'
+DEFAULT_PARTITION = f'{SALES_TABLE}_default'
+PARTITIONING_ENABLED = os.getenv('SALES_PARTITIONING', 'true').lower() == 'true'
+MONTHS_AHEAD = int(os.getenv('SALES_PARTITION_MONTHS_AHEAD', 3))
+# 0 keeps every partition attached
+RETENTION_MONTHS = int(os.getenv('SALES_RETENTION_MONTHS', 0))
+ARCHIVE_SCHEMA = os.getenv('SALES_ARCHIVE_SCHEMA', 'archive')
+# 'schema' moves detached partitions to ARCHIVE_SCHEMA, 'drop' deletes them
+ARCHIVE_MODE = os.getenv('SALES_ARCHIVE_MODE', 'schema')
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{SALES_TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+class PartitionManager:
+    """Keeps sales_data range-partitioned by invoice_date month on PostgreSQL.
+
+    The parent table is created from the SalesData model with a primary key
+    of (id, invoice_date), since PostgreSQL requires the partition key in
+    every unique constraint. Indexes are declared on the parent and cascade
+    to each partition. Range filters on invoice_date are pruned to the
+    matching months by the planner. A default partition catches rows
+    outside every explicit range. On SQLite, or with
+    SALES_PARTITIONING=false, every method is a no-op and sales_data stays
+    a single table.
+    """
+
+    def __init__(self, engine, table=None):
+        if table is None:
+            from database_service import SalesData
+            table = SalesData.__table__
+        self.engine = engine
+        self.table = table
+        self.enabled = PARTITIONING_ENABLED and engine.dialect.name == 'postgresql'
+        self._months = set()
+
+    def _is_partitioned(self, conn) -> Optional[bool]:
+        """True/False for an existing table, None when sales_data does not exist"""
+        kind = conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {'name': SALES_TABLE}
+        ).scalar()
+        if kind is None:
+            return None
+        return kind == 'p'
+
+    def _create_parent(self, conn):
+        dialect = self.engine.dialect
+        columns = ['id BIGSERIAL']
+        columns += [
+            f'{column.name} {column.type.compile(dialect=dialect)}'
+            for column in self.table.columns if column.name != 'id'
+        ]
+        conn.execute(text(
+            f"CREATE TABLE {SALES_TABLE} ({', '.join(columns)}, PRIMARY KEY (id, invoice_date)) "
+            f"PARTITION BY RANGE (invoice_date)"
+        ))
+        for index in self.table.indexes:
+            index.create(conn)
+        conn.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {SALES_TABLE} DEFAULT'))
+
+    def _create_partition(self, conn, month: date):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {SALES_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+
+    def prepare(self) -> bool:
+        """Create the partitioned parent if sales_data does not exist yet, plus upcoming partitions.
+
+        An existing plain table is left alone (see migrate()). Returns
+        whether sales_data is partitioned.
+        """
+        if not self.enabled:
+            return False
+        with self.engine.begin() as conn:
+            partitioned = self._is_partitioned(conn)
+            if partitioned is None:
+                self._create_parent(conn)
+                partitioned = True
+                logger.info(f"Created partitioned {SALES_TABLE} table")
+            elif not partitioned:
+                logger.info(f"{SALES_TABLE} is not partitioned; run `python partition_service.py migrate` to convert it")
+                self.enabled = False
+                return False
+        self.ensure_future_partitions()
+        return True
+
+    def ensure_months(self, months: Iterable[date]):
+        """Make sure a partition exists for each month, so rows never land in the default partition"""
+        if not self.enabled:
+            return
+        missing = sorted({month_start(m) for m in months} - self._months)
+        if not missing:
+            return
+        with self.engine.begin() as conn:
+            existing = {p['month'] for p in self._list(conn)}
+            for month in missing:
+                if month not in existing:
+                    self._create_partition(conn, month)
+                    logger.info(f"Created partition {partition_name(month)}")
+        self._months.update(missing)
+
+    def ensure_future_partitions(self, months_ahead: int = MONTHS_AHEAD, today: date = None):
+        current = month_start(today or date.today())
+        self.ensure_months(add_months(current, n) for n in range(months_ahead + 1))
+
+    def _list(self, conn) -> List[Dict]:
+        results = conn.execute(text(
+            "SELECT child.relname AS name, pg_get_expr(child.relpartbound, child.oid) AS bound, "
+            "pg_total_relation_size(child.oid) AS bytes "
+            "FROM pg_inherits JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent ORDER BY child.relname"
+        ), {'parent': SALES_TABLE}).all()
+        partitions = []
+        for result in results:
+            month = None
+            if result.name.startswith(f'{SALES_TABLE}_y'):
+                suffix = result.name[len(SALES_TABLE) + 2:]
+                month = date(int(suffix[:4]), int(suffix[5:7]), 1)
+            partitions.append({'name': result.name, 'month': month, 'bound': result.bound, 'bytes': result.bytes})
+        return partitions
+
+    def list_partitions(self) -> List[Dict]:
+        if not self.enabled:
+            return []
+        with self.engine.connect() as conn:
+            return self._list(conn)
+
+    def archive(self, retention_months: int = RETENTION_MONTHS, today: date = None) -> List[str]:
+        """Detach partitions whose whole month is older than the retention period.
+
+        Detached partitions are moved to ARCHIVE_SCHEMA (still queryable
+        for audits) or dropped when SALES_ARCHIVE_MODE=drop.
+        """
+        if not self.enabled or retention_months <= 0:
+            return []
+        cutoff = add_months(month_start(today or date.today()), -retention_months)
+        archived = []
+        with self.engine.begin() as conn:
+            if ARCHIVE_MODE != 'drop':
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}'))
+            for partition in self._list(conn):
+                if partition['month'] is None or partition['month'] >= cutoff:
+                    continue
+                conn.execute(text(f"ALTER TABLE {SALES_TABLE} DETACH PARTITION {partition['name']}"))
+                if ARCHIVE_MODE == 'drop':
+                    conn.execute(text(f"DROP TABLE {partition['name']}"))
+                else:
+                    conn.execute(text(f"ALTER TABLE {partition['name']} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                self._months.discard(partition['month'])
+                archived.append(partition['name'])
+                logger.info(f"Archived partition {partition['name']} ({ARCHIVE_MODE})")
+        return archived
+
+    def maintain(self) -> Dict:
+        """Scheduled upkeep: create upcoming partitions and archive expired ones"""
+        if not self.enabled:
+            return {'partitioned': False}
+        self.ensure_future_partitions()
+        archived = self.archive()
+        return {'partitioned': True, 'archived': archived, 'partitions': len(self.list_partitions())}
+
+    def migrate(self, drop_old: bool = False) -> bool:
+        """Convert an existing plain sales_data table into the partitioned layout.
+
+        Runs in one transaction: the old table, its indexes and its id
+        sequence are renamed out of the way, the partitioned table is
+        created with partitions covering the data, rows are copied over and
+        the id sequence is advanced past the copied ids. The old table is
+        kept as sales_data_unpartitioned unless drop_old is set.
+
+        Refuses to run while rows have no invoice_date: the partition key is
+        part of the primary key, so they cannot be moved.
+        """
+        if self.engine.dialect.name != 'postgresql':
+            logger.error("Partitioning is only supported on PostgreSQL")
+            return False
+        legacy = f'{SALES_TABLE}_unpartitioned'
+        with self.engine.connect() as conn:
+            partitioned = self._is_partitioned(conn)
+        self.enabled = True
+        if partitioned is not False:
+            # Already partitioned, or no table yet: prepare() handles both
+            return self.prepare()
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f'LOCK TABLE {SALES_TABLE} IN ACCESS EXCLUSIVE MODE'))
+            undated = conn.execute(text(f'SELECT count(*) FROM {SALES_TABLE} WHERE invoice_date IS NULL')).scalar()
+            if undated:
+                logger.error(f"{undated} {SALES_TABLE} rows have no invoice_date; fix or delete them before migrating")
+                self.enabled = False
+                return False
+            total = conn.execute(text(f'SELECT count(*) FROM {SALES_TABLE}')).scalar()
+            conn.execute(text(f'ALTER TABLE {SALES_TABLE} RENAME TO {legacy}'))
+            for index in [*self.table.indexes, f'{SALES_TABLE}_pkey']:
+                name = index if isinstance(index, str) else index.name
+                conn.execute(text(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_unpartitioned'))
+            conn.execute(text(f'ALTER SEQUENCE IF EXISTS {SALES_TABLE}_id_seq RENAME TO {legacy}_id_seq'))
+
+            self._create_parent(conn)
+            bounds = conn.execute(text(f'SELECT min(invoice_date), max(invoice_date) FROM {legacy}')).one()
+            if bounds[0] is not None:
+                month, last = month_start(bounds[0].date()), month_start(bounds[1].date())
+                while month <= last:
+                    self._create_partition(conn, month)
+                    self._months.add(month)
+                    month = add_months(month, 1)
+
+            columns = ', '.join(column.name for column in self.table.columns)
+            copied = conn.execute(text(
+                f'INSERT INTO {SALES_TABLE} ({columns}) SELECT {columns} FROM {legacy}'
+            )).rowcount
+            if copied != total:
+                # Raising rolls the whole migration back
+                raise RuntimeError(f"Copied {copied} of {total} {SALES_TABLE} rows; migration rolled back")
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{SALES_TABLE}', 'id'), "
+                f"GREATEST((SELECT max(id) FROM {SALES_TABLE}), 1))"
+            ))
+            if drop_old:
+                conn.execute(text(f'DROP TABLE {legacy}'))
+            logger.info(f"Migrated {copied} rows into partitioned {SALES_TABLE}"
+                        f"{'' if drop_old else f'; the old table is kept as {legacy}'}")
+
+        self.ensure_future_partitions()
+        return True
+
+
+def main(argv: List[str]):
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    command = argv[1] if len(argv) > 1 else 'status'
+    engine = create_engine(os.getenv('DATABASE_URL', 'sqlite:///eci_dashboard.db'))
+    manager = PartitionManager(engine)
+
+    if command == 'migrate':
+        manager.migrate(drop_old='--drop-old' in argv)
+    elif command == 'maintain':
+        manager.prepare()
+        print(manager.maintain())
+    else:
+        manager.prepare()
+        if not manager.enabled:
+            print(f'{SALES_TABLE} is a single table ({engine.dialect.name})')
+        for partition in manager.list_partitions():
+            print(f"{partition['name']:<28} {partition['bytes'] / 1e6:>10.1f} MB  {partition['bound']}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,249 @@
+# profiling_service.py
+import os
+import json
+import time
+import hmac
+import uuid
+import logging
+import tempfile
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_ARG = '_profile'
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+# On-demand profiling and reading captured profiles need this token; both are off when it is unset
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'spruce-profiles'))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 1000))
+PROFILE_ALWAYS = os.getenv('PROFILE_ALWAYS', '').lower() in ('1', 'true', 'yes')
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
+
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'category', 'attrs', 'start', 'end', 'children')
+
+    def __init__(self, name: str, category: str, attrs: Dict[str, Any] = None):
+        self.name = name
+        self.category = category
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children: List['Span'] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict:
+        return {
+            'name': self.name,
+            'category': self.category,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3),
+            **({'attrs': self.attrs} if self.attrs else {}),
+            **({'children': [c.to_dict(origin) for c in self.children]} if self.children else {})
+        }
+
+
+class RequestProfile:
+    """Span tree for one request, optionally with a cProfile/pyinstrument profiler attached"""
+
+    def __init__(self, name: str, mode: str = 'spans'):
+        self.id = uuid.uuid4().hex[:16]
+        self.mode = mode
+        self.root = Span(name, 'request')
+        self._stack = [self.root]
+        self.profiler = None
+
+        if mode == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+                self.profiler.start()
+            except ImportError:
+                logger.error("pyinstrument is not installed; falling back to span profiling")
+                self.mode = 'spans'
+
+    def push(self, name: str, category: str, attrs: Dict[str, Any] = None) -> Span:
+        span = Span(name, category, attrs)
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        return span
+
+    def pop(self, span: Span):
+        span.end = time.perf_counter()
+        if self._stack[-1] is span:
+            self._stack.pop()
+
+    def finish(self):
+        self.root.end = time.perf_counter()
+        if self.profiler is not None:
+            if self.mode == 'cprofile':
+                self.profiler.disable()
+            else:
+                self.profiler.stop()
+
+    def breakdown(self) -> Dict[str, float]:
+        """Total milliseconds per category, counting only the outermost span of each category"""
+        totals: Dict[str, float] = {}
+
+        def walk(span: Span, parent_category: Optional[str]):
+            if span.category != parent_category and span is not self.root:
+                totals[span.category] = totals.get(span.category, 0.0) + span.duration_ms
+            for child in span.children:
+                walk(child, span.category)
+
+        walk(self.root, None)
+        totals['total'] = self.root.duration_ms
+        return totals
+
+    def server_timing(self) -> str:
+        return ', '.join(f'{name};dur={ms:.1f}' for name, ms in self.breakdown().items())
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'breakdown_ms': {k: round(v, 3) for k, v in self.breakdown().items()},
+            'tree': self.root.to_dict(self.root.start)
+        }
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """Persist the span tree (and profiler output) and return the trace id"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        with open(f'{base}.json', 'w') as f:
+            json.dump(self.to_dict(), f)
+        if self.profiler is not None:
+            if self.mode == 'cprofile':
+                self.profiler.dump_stats(f'{base}.prof')
+            else:
+                with open(f'{base}.html', 'w') as f:
+                    f.write(self.profiler.output_html())
+        _prune(directory)
+        return self.id
+
+
+def _prune(directory: str):
+    """Keep only the newest PROFILE_MAX_FILES traces"""
+    try:
+        traces = sorted(
+            (e for e in os.scandir(directory) if e.name.endswith('.json')),
+            key=lambda e: e.stat().st_mtime
+        )
+        for entry in traces[:-PROFILE_MAX_FILES]:
+            stem = entry.path[:-len('.json')]
+            for ext in ('.json', '.prof', '.html'):
+                if os.path.exists(stem + ext):
+                    os.remove(stem + ext)
+    except OSError as e:
+        logger.error(f"Error pruning profiles: {str(e)}")
+
+
+def load_profile(profile_id: str, directory: str = PROFILE_DIR) -> Optional[Dict]:
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(directory, f'{profile_id}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def authorized(request) -> bool:
+    """True when PROFILE_TOKEN is set and the request carries it in X-Profile-Token"""
+    supplied = request.headers.get(PROFILE_TOKEN_HEADER, '')
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+
+def requested_mode(request) -> Optional[str]:
+    """Profiling mode asked for by an authorized request: 'spans', 'cprofile' or 'pyinstrument'"""
+    value = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+    if not value or not authorized(request):
+        return None
+    return value if value in ('cprofile', 'pyinstrument') else 'spans'
+
+
+def start(name: str, mode: str = 'spans') -> RequestProfile:
+    profile = RequestProfile(name, mode)
+    _current_profile.set(profile)
+    return profile
+
+
+def finish() -> Optional[RequestProfile]:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.finish()
+        _current_profile.set(None)
+    return profile
+
+
+def current() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+@contextmanager
+def span(name: str, category: str = 'app', **attrs):
+    """Record a span in the active request profile; a no-op when profiling is off"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield None
+        return
+    s = profile.push(name, category, attrs)
+    try:
+        yield s
+    finally:
+        profile.pop(s)
+
+
+def profiled(category: str, name: str = None) -> Callable:
+    """Decorator recording a span around each call of the wrapped function"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_profile.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine):
+    """Record a span for every SQL statement executed on the engine"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is not None:
+            context._profile_span = profile.push('query', 'sql', {'statement': statement[:200]})
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        s = getattr(context, '_profile_span', None)
+        if profile is not None and s is not None:
+            profile.pop(s)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        profile = _current_profile.get()
+        s = getattr(exception_context.execution_context, '_profile_span', None)
+        if profile is not None and s is not None:
+            s.attrs['error'] = str(exception_context.original_exception)[:200]
+            profile.pop(s)
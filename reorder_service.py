@@ -0,0 +1,134 @@
+# reorder_service.py
+import os
+import time
+import logging
+import threading
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+from forecast_service import LEAD_TIME_DAYS, SAFETY_STOCK_DAYS, NO_DEMAND_DAYS_OF_SUPPLY
+
+logger = logging.getLogger(__name__)
+
+REORDER_TTL = int(os.getenv('REORDER_TTL', 900))
+# Suggested orders bring stock up to the reorder level plus this many days of demand
+REORDER_REVIEW_DAYS = int(os.getenv('REORDER_REVIEW_DAYS', 30))
+
+SORT_COLUMNS = (
+    'item_number', 'days_of_supply', 'suggested_order_qty', 'suggested_order_value',
+    'qty_available', 'avg_daily_demand', 'reorder_level'
+)
+STATUSES = ('stockout', 'reorder', 'ok')
+
+
+def compute_recommendations(inputs: pd.DataFrame, review_days: int = REORDER_REVIEW_DAYS) -> pd.DataFrame:
+    """Days of supply, safety stock and suggested order quantity for every SKU at once.
+
+    The reorder level is the item's stored reorder point or its lead-time
+    demand plus safety stock, whichever is higher. Items at or below it
+    are ordered up to the reorder level plus review_days of demand, net of
+    stock on hand and on order.
+    """
+    frame = inputs.copy()
+    demand = frame['avg_daily_demand'].fillna(0).clip(lower=0)
+    lead_time = frame['lead_time'].where(frame['lead_time'] > 0, LEAD_TIME_DAYS).fillna(LEAD_TIME_DAYS)
+    available = frame['qty_available'].fillna(0).clip(lower=0)
+    position = available + frame['on_order'].fillna(0)
+
+    safety_stock = demand * SAFETY_STOCK_DAYS
+    lead_time_demand = demand * lead_time
+    reorder_level = np.maximum(frame['reorder_point'].fillna(0), lead_time_demand + safety_stock)
+    needs_reorder = position <= reorder_level
+    order_up_to = reorder_level + demand * review_days
+    suggested = np.where(needs_reorder, np.ceil((order_up_to - position).clip(lower=0)), 0)
+
+    frame['avg_daily_demand'] = demand.round(2)
+    frame['lead_time'] = lead_time.astype(int)
+    frame['days_of_supply'] = np.where(
+        demand > 0, np.floor(available / demand.where(demand > 0, 1)), NO_DEMAND_DAYS_OF_SUPPLY
+    ).astype(int)
+    frame['safety_stock'] = np.round(safety_stock, 0)
+    frame['lead_time_demand'] = np.round(lead_time_demand, 0)
+    frame['reorder_level'] = np.round(reorder_level, 0)
+    frame['suggested_order_qty'] = suggested
+    frame['suggested_order_value'] = np.round(suggested * frame['last_cost'].fillna(0), 2)
+    frame['status'] = np.select([available <= 0, needs_reorder], ['stockout', 'reorder'], 'ok')
+    return frame
+
+
+class ReorderEngine:
+    """Reorder recommendations for the whole catalogue, recomputed in one vectorized pass.
+
+    Current inventory is joined with the nightly demand rates from
+    item_forecasts and each item's lead time; the resulting frame is kept
+    in memory and served sorted and paginated until it expires.
+    """
+
+    def __init__(self, db_service, ttl: int = REORDER_TTL, review_days: int = REORDER_REVIEW_DAYS):
+        self.db_service = db_service
+        self.ttl = ttl
+        self.review_days = review_days
+        self._frame = None
+        self._built_at = 0.0
+        self._build_lock = threading.Lock()
+
+    def build(self) -> int:
+        """Recompute recommendations from the database and return the number of SKUs"""
+        start = time.perf_counter()
+        inputs = pd.DataFrame(self.db_service.get_reorder_inputs(), columns=[
+            'item_number', 'description', 'qty_available', 'qty_on_hand', 'on_order', 'reorder_point',
+            'lead_time', 'last_cost', 'avg_daily_demand', 'trend', 'forecast_as_of'
+        ])
+        self._frame = compute_recommendations(inputs, self.review_days)
+        self._built_at = time.monotonic()
+        logger.info(f"Computed reorder recommendations for {len(self._frame)} SKUs "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(self._frame)
+
+    def invalidate(self):
+        """Expire the current frame, e.g. after inventory or forecasts change"""
+        self._built_at = float('-inf')
+
+    def _ensure_fresh(self) -> pd.DataFrame:
+        expired = self._frame is None or time.monotonic() - self._built_at > self.ttl
+        if expired:
+            # As with the item index, one thread recomputes while others read the previous frame
+            if self._build_lock.acquire(blocking=self._frame is None):
+                try:
+                    if self._frame is None or time.monotonic() - self._built_at > self.ttl:
+                        self.build()
+                except Exception as e:
+                    logger.error(f"Error computing reorder recommendations: {str(e)}")
+                    if self._frame is None:
+                        raise
+                finally:
+                    self._build_lock.release()
+        return self._frame
+
+    def recommendations(self, sort: str = 'days_of_supply', descending: bool = False, status: str = 'reorder',
+                        limit: int = 50, offset: int = 0) -> Dict:
+        """One page of recommendations, optionally limited to a status ('reorder' includes stockouts)"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+        if status not in STATUSES + ('all',):
+            raise ValueError(f"status must be one of {', '.join(STATUSES)} or 'all'")
+        frame = self._ensure_fresh()
+        if status == 'reorder':
+            frame = frame[frame['status'] != 'ok']
+        elif status != 'all':
+            frame = frame[frame['status'] == status]
+        frame = frame.sort_values([sort, 'item_number'], ascending=[not descending, True], kind='stable')
+        page = frame.iloc[offset:offset + limit]
+        return {
+            'total': len(frame),
+            'items': self._records(page)
+        }
+
+    def _records(self, page: pd.DataFrame) -> List[Dict]:
+        records = page.astype(object).where(page.notna(), None).to_dict('records')
+        for record in records:
+            if record['forecast_as_of'] is not None:
+                record['forecast_as_of'] = record['forecast_as_of'].isoformat()
+        return records
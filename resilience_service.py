@@ -0,0 +1,216 @@
+# resilience_service.py
+import os
+import time
+import logging
+from typing import Optional, Callable, Any
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling an upstream that is rate limited or known to be failing"""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(UpstreamUnavailableError):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    pass
+
+
+# Refill the bucket for the elapsed time, then take one token if available.
+# Returns 0 when a token was taken, otherwise the milliseconds until one is.
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by all workers through Redis"""
+
+    def __init__(self, client: redis.Redis, key: str, rate: float, capacity: int, max_wait: float = 0.5):
+        self.client = client
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self):
+        """Take a token, waiting up to max_wait seconds; raise RateLimitExceeded otherwise"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait_ms = int(self._script(keys=[self.key], args=[self.rate, self.capacity, int(time.time() * 1000)]))
+            if wait_ms == 0:
+                return
+            if time.monotonic() + wait_ms / 1000.0 > deadline:
+                raise RateLimitExceeded(f'Rate limit exceeded for {self.key}', retry_after=wait_ms / 1000.0)
+            time.sleep(wait_ms / 1000.0)
+
+
+class CircuitBreaker:
+    """Circuit breaker whose state lives in Redis so all workers trip and recover together.
+
+    Closed: calls pass, failures are counted over a sliding window.
+    Open: calls fail fast until reset_timeout expires.
+    Half-open: a single worker probes the upstream; success closes the
+    circuit, failure re-opens it.
+    """
+
+    def __init__(self, client: redis.Redis, name: str, failure_threshold: int = 5,
+                 window: int = 60, reset_timeout: int = 30):
+        self.client = client
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._open_key = f'{name}:open'
+        self._tripped_key = f'{name}:tripped'
+        self._failures_key = f'{name}:failures'
+        self._probe_key = f'{name}:probe'
+
+    def state(self) -> str:
+        if self.client.exists(self._open_key):
+            return 'open'
+        if self.client.exists(self._tripped_key):
+            return 'half_open'
+        return 'closed'
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless this call may proceed; returns whether it is the half-open probe"""
+        state = self.state()
+        if state == 'open':
+            retry_after = max(self.client.ttl(self._open_key), 1)
+            raise CircuitOpenError(f'Circuit {self.name} is open', retry_after=retry_after)
+        if state == 'half_open':
+            if not self.client.set(self._probe_key, 1, nx=True, ex=self.reset_timeout):
+                raise CircuitOpenError(f'Circuit {self.name} is half-open; probe in progress',
+                                       retry_after=self.reset_timeout)
+            return True
+        return False
+
+    def release_probe(self):
+        """Give up the half-open probe without a result, so another call can take it"""
+        self.client.delete(self._probe_key)
+
+    def record_success(self):
+        if self.client.exists(self._tripped_key):
+            self.client.delete(self._tripped_key, self._probe_key, self._failures_key)
+            logger.info(f"Circuit {self.name} closed")
+
+    def record_failure(self):
+        pipe = self.client.pipeline()
+        pipe.incr(self._failures_key)
+        pipe.expire(self._failures_key, self.window)
+        failures, _ = pipe.execute()
+        if failures >= self.failure_threshold or self.client.exists(self._tripped_key):
+            pipe = self.client.pipeline()
+            pipe.set(self._open_key, 1, ex=self.reset_timeout)
+            pipe.set(self._tripped_key, 1, ex=self.reset_timeout * 10)
+            pipe.delete(self._failures_key, self._probe_key)
+            pipe.execute()
+            logger.error(f"Circuit {self.name} opened after {failures} failures")
+
+
+class UpstreamGuard:
+    """Applies a shared rate limit and circuit breaker around upstream calls.
+
+    If Redis itself is unreachable the guard fails open, so a Redis outage
+    does not take the upstream API down with it.
+    """
+
+    def __init__(self, bucket: Optional[TokenBucket], breaker: Optional[CircuitBreaker]):
+        self.bucket = bucket
+        self.breaker = breaker
+        self._last_redis_error = 0.0
+
+    @classmethod
+    def from_env(cls, name: str, redis_url: str = None) -> 'UpstreamGuard':
+        client = redis.Redis.from_url(
+            redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379'),
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+        prefix = f'upstream:{name}'
+        bucket = TokenBucket(
+            client, f'{prefix}:bucket',
+            rate=float(os.getenv('ECI_RATE_LIMIT_PER_SEC', 10)),
+            capacity=int(os.getenv('ECI_RATE_LIMIT_BURST', 20)),
+            max_wait=float(os.getenv('ECI_RATE_LIMIT_MAX_WAIT', 0.5))
+        )
+        breaker = CircuitBreaker(
+            client, f'{prefix}:circuit',
+            failure_threshold=int(os.getenv('ECI_CIRCUIT_FAILURES', 5)),
+            window=int(os.getenv('ECI_CIRCUIT_WINDOW', 60)),
+            reset_timeout=int(os.getenv('ECI_CIRCUIT_RESET', 30))
+        )
+        return cls(bucket, breaker)
+
+    def _redis_unavailable(self, e: Exception):
+        # Log at most once a minute while Redis is down
+        if time.monotonic() - self._last_redis_error > 60:
+            logger.error(f"Redis unavailable for upstream guard, failing open: {str(e)}")
+            self._last_redis_error = time.monotonic()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        probe = False
+        try:
+            if self.breaker is not None:
+                probe = self.breaker.before_call()
+            if self.bucket is not None:
+                self.bucket.acquire()
+        except RateLimitExceeded:
+            if probe:
+                # The probe never reached the upstream; free it rather than blocking probes until it expires
+                self._release_probe()
+            raise
+        except redis.RedisError as e:
+            self._redis_unavailable(e)
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(success=False)
+            raise
+        self._record(success=True)
+        return result
+
+    def _release_probe(self):
+        try:
+            self.breaker.release_probe()
+        except redis.RedisError as e:
+            self._redis_unavailable(e)
+
+    def _record(self, success: bool):
+        if self.breaker is None:
+            return
+        try:
+            if success:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        except redis.RedisError as e:
+            self._redis_unavailable(e)
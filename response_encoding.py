@@ -0,0 +1,117 @@
+# response_encoding.py
+import json
+import math
+import logging
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+COMPACT_CHART_FORMAT = 'compact-v1'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+
+def _clean_values(values, precision: Optional[int] = None) -> List:
+    """Convert a numeric array to a JSON-safe list, mapping NaN/inf to None"""
+    arr = np.asarray(values, dtype=float)
+    if precision is not None:
+        arr = np.round(arr, precision)
+    result = arr.tolist()
+    if not np.isfinite(arr).all():
+        result = [v if math.isfinite(v) else None for v in result]
+    return result
+
+
+def encode_date_axis(index) -> Dict:
+    """Delta-encode a date axis as a start date plus a step or per-point day deltas"""
+    index = pd.DatetimeIndex(index)
+    if len(index) == 0:
+        return {'start': None, 'unit': 'D', 'length': 0, 'step': 1}
+
+    days = (index.normalize() - index[0].normalize()).days.to_numpy()
+    deltas = np.diff(days)
+    axis = {
+        'start': index[0].strftime('%Y-%m-%d'),
+        'unit': 'D',
+        'length': len(index)
+    }
+    if len(deltas) == 0 or (deltas == deltas[0]).all():
+        axis['step'] = int(deltas[0]) if len(deltas) else 1
+    else:
+        axis['deltas'] = deltas.astype(int).tolist()
+    return axis
+
+
+def decode_date_axis(axis: Dict) -> List[str]:
+    """Expand a delta-encoded date axis back to ISO date strings"""
+    if not axis.get('length'):
+        return []
+    start = pd.Timestamp(axis['start'])
+    if 'deltas' in axis:
+        offsets = np.concatenate([[0], np.cumsum(axis['deltas'])])
+    else:
+        offsets = np.arange(axis['length']) * axis.get('step', 1)
+    return [(start + pd.Timedelta(days=int(d))).strftime('%Y-%m-%d') for d in offsets]
+
+
+def compact_chart(index, traces: List[Dict], precision: Optional[int] = None) -> Dict:
+    """Build a compact chart payload where all traces share one date axis.
+
+    Each trace dict carries its plotting attributes plus a ``y`` array; the
+    ``y`` values are rounded to ``precision`` decimals when given.
+    """
+    return {
+        'format': COMPACT_CHART_FORMAT,
+        'x': encode_date_axis(index),
+        'traces': [
+            {**{k: v for k, v in trace.items() if k != 'y'},
+             'y': _clean_values(trace['y'], precision)}
+            for trace in traces
+        ]
+    }
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """Fallback encoder for values msgpack does not handle natively"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def wants_msgpack(request) -> bool:
+    """Check whether the client opted in to MessagePack responses"""
+    if request.args.get('encoding') == 'msgpack':
+        return True
+    accept = request.accept_mimetypes
+    return accept[MSGPACK_MIMETYPE] > 0 and accept[MSGPACK_MIMETYPE] >= accept['application/json']
+
+
+def negotiate_encoding(request, response):
+    """Re-encode a JSON response as MessagePack when the client asked for it.
+
+    Runs after caching so cached entries stay JSON and are shared by both
+    kinds of clients; only opted-in requests pay for the re-encode.
+    """
+    if response.mimetype != 'application/json' or response.direct_passthrough:
+        return response
+    response.vary.add('Accept')
+    if not wants_msgpack(request):
+        return response
+
+    try:
+        payload = json.loads(response.get_data())
+        response.set_data(msgpack.packb(payload, default=_msgpack_default, use_bin_type=True))
+        response.mimetype = MSGPACK_MIMETYPE
+    except Exception as e:
+        logger.error(f"Error encoding msgpack response: {str(e)}")
+    return response
@@ -0,0 +1,165 @@
+# snapshot_service.py
+"""Memory-mapped sales snapshots shared by all workers on a host.
+
+A snapshot is a directory of .npy column files plus string dictionaries
+stored as one UTF-8 blob with an offsets array. Workers open every file
+with mmap, so they share one page-cache copy and pay no deserialization
+cost. Publishing writes a new version directory and then atomically
+replaces the CURRENT pointer file; readers notice the new version and swap.
+
+Usage:
+    python snapshot_service.py publish    # build a snapshot from the database
+    python snapshot_service.py status
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv('SALES_SNAPSHOT_DIR', '')
+SNAPSHOT_KEEP = int(os.getenv('SALES_SNAPSHOT_KEEP', 2))
+CURRENT_FILE = 'CURRENT'
+
+
+class MappedStrings(Sequence):
+    """Read-only sequence of strings decoded on access from a mapped UTF-8 blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._blob[start:end].tobytes().decode('utf-8')
+
+
+def _save_strings(directory: str, name: str, values: Sequence[str]):
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+    np.save(os.path.join(directory, f'{name}.blob.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+def _load_strings(directory: str, name: str) -> MappedStrings:
+    return MappedStrings(
+        np.load(os.path.join(directory, f'{name}.blob.npy'), mmap_mode='r'),
+        np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r')
+    )
+
+
+class Snapshot:
+    def __init__(self, version: str, columns: Dict[str, np.ndarray], strings: Dict[str, MappedStrings], meta: Dict):
+        self.version = version
+        self.columns = columns
+        self.strings = strings
+        self.meta = meta
+
+
+def publish(columns: Dict[str, np.ndarray], strings: Dict[str, Sequence[str]], meta: Dict,
+            directory: str = None) -> str:
+    """Write a new snapshot version and point CURRENT at it; returns the version"""
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    version = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    staging = os.path.join(directory, f'.{version}.tmp')
+    os.makedirs(staging)
+    try:
+        for name, array in columns.items():
+            np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+        for name, values in strings.items():
+            _save_strings(staging, name, values)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(dict(meta, columns=list(columns), strings=list(strings)), f)
+        os.rename(staging, os.path.join(directory, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f'.{CURRENT_FILE}.{os.getpid()}')
+    with open(pointer, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+    _prune(directory, version)
+    logger.info(f"Published sales snapshot {version}")
+    return version
+
+
+def _prune(directory: str, current: str):
+    """Remove all but the newest SNAPSHOT_KEEP versions.
+
+    Workers still mapping a removed version keep their mapping valid until
+    they swap, since unlinked files stay alive while mapped.
+    """
+    versions = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.is_dir() and not entry.name.startswith('.')
+    )
+    for version in versions[:-max(SNAPSHOT_KEEP, 1)]:
+        if version != current:
+            shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
+
+
+def current_version(directory: str = None) -> Optional[str]:
+    directory = directory or SNAPSHOT_DIR
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load(version: str, directory: str = None) -> Snapshot:
+    """Map a snapshot version read-only"""
+    path = os.path.join(directory or SNAPSHOT_DIR, version)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in meta['columns']}
+    strings = {name: _load_strings(path, name) for name in meta['strings']}
+    return Snapshot(version, columns, strings, meta)
+
+
+def main(argv: List[str]):
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    from database_service import DatabaseService
+    from hot_cache_service import HotSalesCache
+
+    directory = os.getenv('SALES_SNAPSHOT_DIR', SNAPSHOT_DIR)
+    if not directory:
+        print('SALES_SNAPSHOT_DIR is not set')
+        return
+    command = argv[1] if len(argv) > 1 else 'status'
+    if command == 'publish':
+        cache = HotSalesCache(DatabaseService(), snapshot_dir='')
+        print(cache.publish_snapshot(directory))
+    else:
+        version = current_version(directory)
+        if version is None:
+            print('No snapshot published')
+            return
+        snapshot = load(version, directory)
+        rows = len(next(iter(snapshot.columns.values()))) if snapshot.columns else 0
+        print(f"{version}: {rows} rows, covering from {snapshot.meta['covered_from']}, "
+              f"through {snapshot.meta['through']}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
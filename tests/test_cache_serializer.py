@@ -0,0 +1,83 @@
+# tests/test_cache_serializer.py
+import pickle
+from datetime import date, datetime
+
+import pytest
+from flask import Response
+
+from cache_serializer import CacheSerializer
+
+
+@pytest.fixture
+def serializer():
+    return CacheSerializer(compression='none')
+
+
+def records(count):
+    return [
+        {
+            'invoice_id': f'INV{n}', 'invoice_date': datetime(2025, 1, 1, 9, n % 60), 'quantity': float(n),
+            'line': n, 'branch': None if n % 2 else 'MAIN'
+        }
+        for n in range(count)
+    ]
+
+
+def test_records_round_trip_column_by_column(serializer):
+    value = {'sales': records(50), 'as_of': date(2025, 1, 2), 'key': ('qty_available', 3)}
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_mixed_records_fall_back_to_plain_values(serializer):
+    value = [{'a': 1, 'b': 1.5}, {'a': 2.5, 'b': 'x'}]
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_large_integers_are_not_truncated(serializer):
+    value = [{'id': 2 ** 70}, {'id': 1}]
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_response_round_trip(serializer):
+    restored = serializer.loads(serializer.dumps(Response(b'{"ok": true}', status=201, mimetype='application/json')))
+    assert restored.status_code == 201
+    assert restored.get_data() == b'{"ok": true}'
+    assert restored.headers['Content-Type'] == 'application/json'
+
+
+def test_unsupported_values_are_pickled(serializer):
+    data = serializer.dumps({1, 2, 3})
+    assert data[:1] == b'p'
+    assert serializer.loads(data) == {1, 2, 3}
+
+
+def test_legacy_pickle_entries_are_read(serializer):
+    legacy = b'!' + pickle.dumps({'total': 12.5, 'day': date(2025, 1, 1)})
+    assert serializer.loads(legacy) == {'total': 12.5, 'day': date(2025, 1, 1)}
+
+
+def test_corrupt_legacy_entries_are_a_miss(serializer):
+    assert serializer.loads(b'!' + b'\x80\x04not a pickle') is None
+
+
+def test_plain_integers_stay_counters(serializer):
+    assert serializer.dumps(7) == b'7'
+    assert serializer.loads(b'42') == 42
+    assert serializer.loads(None) is None
+
+
+@pytest.mark.parametrize('compression', ['zstd', 'lz4'])
+def test_compressed_entries_round_trip(compression):
+    pytest.importorskip('zstandard' if compression == 'zstd' else 'lz4')
+    serializer = CacheSerializer(compression=compression, min_size=16)
+    value = records(500)
+    data = serializer.dumps(value)
+    assert data[1:2] != b'-'
+    assert serializer.loads(data) == value
+    # A reader configured without compression still decodes the entry
+    assert CacheSerializer(compression='none').loads(data) == value
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError):
+        CacheSerializer(compression='gzip')
@@ -0,0 +1,78 @@
+# tests/test_distinct_sketch.py
+import numpy as np
+import pytest
+
+from distinct_sketch import HyperLogLog, REGISTERS, RELATIVE_ERROR, hash_values
+
+
+def values(start, stop):
+    return [f'INV{n}' for n in range(start, stop)]
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+    assert HyperLogLog.of([]).count() == 0
+
+
+def test_small_sets_use_linear_counting():
+    assert HyperLogLog.of(values(0, 1)).count() == 1
+    assert HyperLogLog.of(values(0, 100)).count() == 100
+    assert abs(HyperLogLog.of(values(0, 1000)).count() - 1000) / 1000 < 3 * RELATIVE_ERROR
+
+
+@pytest.mark.parametrize('distinct', [20_000, 200_000])
+def test_large_sets_within_error_bound(distinct):
+    estimate = HyperLogLog.of(values(0, distinct)).count()
+    assert abs(estimate - distinct) / distinct < 3 * RELATIVE_ERROR
+
+
+def test_duplicates_are_counted_once():
+    sketch = HyperLogLog.of(values(0, 5000) * 3)
+    assert sketch.registers.tolist() == HyperLogLog.of(values(0, 5000)).registers.tolist()
+
+
+def test_merge_counts_overlap_once():
+    monday, tuesday = HyperLogLog.of(values(0, 30_000)), HyperLogLog.of(values(20_000, 50_000))
+    merged = HyperLogLog.merge([monday, tuesday])
+    np.testing.assert_array_equal(merged.registers, HyperLogLog.of(values(0, 50_000)).registers)
+    # Merging is a register maximum: order and repetition do not matter
+    np.testing.assert_array_equal(HyperLogLog.merge([tuesday, monday, monday]).registers, merged.registers)
+    assert monday.count() < 35_000
+
+
+def test_update_merges_in_place():
+    sketch = HyperLogLog.of(values(0, 100))
+    assert sketch.update(HyperLogLog.of(values(100, 200))) is sketch
+    assert abs(sketch.count() - 200) <= 4
+
+
+def test_hashes_are_stable():
+    first, second = hash_values(['A1', 'A2']), hash_values(['A1', 'A2'])
+    np.testing.assert_array_equal(first, second)
+    assert first.dtype == np.uint64 and first[0] != first[1]
+
+
+def test_sparse_serialization_round_trip():
+    sketch = HyperLogLog.of(values(0, 50))
+    data = sketch.to_bytes()
+    assert data[:1] == b'S' and len(data) < REGISTERS
+    np.testing.assert_array_equal(HyperLogLog.from_bytes(data).registers, sketch.registers)
+
+
+def test_dense_serialization_round_trip():
+    sketch = HyperLogLog.of(values(0, 100_000))
+    data = sketch.to_bytes()
+    assert data[:1] == b'D' and len(data) == REGISTERS + 1
+    np.testing.assert_array_equal(HyperLogLog.from_bytes(data).registers, sketch.registers)
+
+
+def test_empty_sketch_round_trip():
+    restored = HyperLogLog.from_bytes(HyperLogLog().to_bytes())
+    assert restored.count() == 0 and not restored.registers.any()
+
+
+def test_deserialized_sketches_merge_and_stay_writable():
+    restored = HyperLogLog.from_bytes(HyperLogLog.of(values(0, 100_000)).to_bytes())
+    restored.update(HyperLogLog.of(values(100_000, 110_000)))
+    restored.add_hashes(hash_values(values(110_000, 120_000)))
+    assert abs(restored.count() - 120_000) / 120_000 < 3 * RELATIVE_ERROR
@@ -0,0 +1,174 @@
+# tests/test_forecast_state.py
+import random
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from database_service import DatabaseService, ItemForecastState
+from forecast_service import ForecastState, HISTORY_DAYS, WINDOWS, _day
+
+START = date(2025, 1, 1)
+
+
+def reference(quantities, as_of):
+    """Statistics recomputed from scratch over {date: quantity} for the history ending at as_of"""
+    history = {day: qty for day, qty in quantities.items() if as_of - timedelta(days=HISTORY_DAYS) < day <= as_of and qty}
+    sold = {day: qty for day, qty in history.items() if qty > 0}
+    regression = np.zeros(5)
+    for day, qty in sold.items():
+        x = float(_day(day))
+        regression += [1.0, x, qty, x * qty, x * x]
+    dow = np.zeros(7)
+    for day, qty in history.items():
+        dow[day.weekday()] += qty
+    return {
+        'windows': {days: sum(qty for day, qty in history.items() if day > as_of - timedelta(days=days)) for days in WINDOWS},
+        'regression': regression,
+        'dow': dow,
+        'first_day': min(history) if history else None
+    }
+
+
+def assert_matches(state, quantities):
+    expected = reference(quantities, state.as_of)
+    for days in WINDOWS:
+        assert state.window_sums[days] == pytest.approx(expected['windows'][days], abs=1e-6)
+    np.testing.assert_allclose(state.regression, expected['regression'], rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(state.dow_sums, expected['dow'], atol=1e-6)
+    assert state.first_day == expected['first_day']
+
+
+def test_in_order_days_match_recomputation():
+    rng = random.Random(1)
+    state = ForecastState(START)
+    quantities = {}
+    day = START
+    for _ in range(500):
+        day += timedelta(days=rng.choice([1, 1, 1, 2, 5]))
+        qty = float(rng.randint(1, 20))
+        state.add(day, qty)
+        quantities[day] = quantities.get(day, 0) + qty
+    assert state.as_of == day
+    assert_matches(state, quantities)
+
+
+def test_late_lines_adjust_earlier_days_in_place():
+    rng = random.Random(2)
+    state = ForecastState(START)
+    quantities = {}
+    for offset in range(200):
+        day = START + timedelta(days=offset)
+        state.add(day, 3.0)
+        quantities[day] = quantities.get(day, 0) + 3.0
+        # A line arriving late for an earlier day, sometimes outside the shorter windows
+        late = day - timedelta(days=rng.randint(0, 120))
+        state.add(late, 2.0)
+        if late > state.as_of - timedelta(days=HISTORY_DAYS):
+            quantities[late] = quantities.get(late, 0) + 2.0
+    assert_matches(state, quantities)
+
+
+def test_lines_older_than_the_history_are_ignored():
+    state = ForecastState(START)
+    state.add(START, 4.0)
+    before = state.copy()
+    state.add(START - timedelta(days=HISTORY_DAYS), 100.0)
+    assert state.window_sums == before.window_sums
+    np.testing.assert_array_equal(state.ring, before.ring)
+
+
+def test_advance_retires_days_leaving_each_window():
+    state = ForecastState(START)
+    state.add(START, 10.0)
+    state.advance_to(START + timedelta(days=7))
+    assert state.window_sums[7] == 0
+    assert state.window_sums[30] == 10.0
+    state.advance_to(START + timedelta(days=HISTORY_DAYS - 1))
+    assert state.first_day == START and state.sales_days == 1
+    state.advance_to(START + timedelta(days=HISTORY_DAYS))
+    assert state.first_day is None and state.sales_days == 0
+    assert not state.dow_sums.any()
+
+
+def test_advance_past_the_whole_history_resets():
+    state = ForecastState(START)
+    for offset in range(30):
+        state.add(START + timedelta(days=offset), 1.0)
+    state.advance_to(START + timedelta(days=3 * HISTORY_DAYS))
+    assert not state.ring.any() and not state.regression.any()
+    assert all(value == 0 for value in state.window_sums.values())
+    assert state.first_day is None
+
+
+def test_first_day_restarts_at_next_sale_day_when_it_expires():
+    state = ForecastState(START)
+    state.add(START, 1.0)
+    state.add(START + timedelta(days=10), 1.0)
+    state.advance_to(START + timedelta(days=HISTORY_DAYS))
+    assert state.first_day == START + timedelta(days=10)
+
+
+def test_negative_quantities_undo_an_add():
+    state = ForecastState(START)
+    state.add(START, 5.0)
+    state.add(START + timedelta(days=1), 2.0)
+    state.add(START + timedelta(days=1), -2.0)
+    assert_matches(state, {START: 5.0})
+
+
+def test_record_round_trip():
+    state = ForecastState(START)
+    for offset in range(40):
+        state.add(START + timedelta(days=offset), float(offset % 6))
+    restored = ForecastState.from_record(SimpleNamespace(**state.to_record()))
+    assert restored.as_of == state.as_of and restored.first_day == state.first_day
+    assert restored.window_sums == state.window_sums
+    np.testing.assert_array_equal(restored.ring, state.ring)
+    np.testing.assert_array_equal(restored.regression, state.regression)
+    np.testing.assert_array_equal(restored.dow_sums, state.dow_sums)
+
+
+def _sale(invoice_id, day, item, quantity):
+    return {
+        'invoice_id': invoice_id, 'invoice_date': datetime.combine(day, datetime.min.time()) + timedelta(hours=9),
+        'account_number': 'A1', 'item_number': item, 'description': item,
+        'quantity': quantity, 'extended_price': quantity * 2.0
+    }
+
+
+def _states(db):
+    session = db.Session()
+    try:
+        return {record.item_number: ForecastState.from_record(record) for record in session.query(ItemForecastState)}
+    finally:
+        session.close()
+
+
+def test_stored_sales_fold_into_states_like_a_rebuild(tmp_path):
+    db = DatabaseService(f"sqlite:///{tmp_path / 'forecast.db'}")
+    as_of = START + timedelta(days=60)
+    rng = random.Random(3)
+    batches = [[] for _ in range(4)]
+    for n in range(300):
+        day = START + timedelta(days=rng.randint(0, 60))
+        batches[n % 4].append(_sale(f'INV{n}', day, f'SKU{n % 7}', float(rng.randint(1, 9))))
+    # Every batch spans the whole range, so later batches carry late lines for days already folded in
+    for batch in batches:
+        assert db.store_sales_data(batch)
+    # Replacing a day takes its old lines back out
+    replaced = START + timedelta(days=30)
+    assert db.replace_sales_day(replaced, [_sale('NEW1', replaced, 'SKU1', 4.0)])
+
+    incremental = _states(db)
+    assert db.rebuild_forecast_states(as_of)
+    rebuilt = _states(db)
+    assert set(incremental) == set(rebuilt)
+    for item, state in incremental.items():
+        state.advance_to(as_of)
+        rebuilt[item].advance_to(as_of)
+        np.testing.assert_allclose(state.ring, rebuilt[item].ring, atol=1e-9)
+        for days in WINDOWS:
+            assert state.window_sums[days] == pytest.approx(rebuilt[item].window_sums[days])
+        np.testing.assert_allclose(state.regression, rebuilt[item].regression, rtol=1e-9)
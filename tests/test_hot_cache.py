@@ -0,0 +1,120 @@
+# tests/test_hot_cache.py
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from database_service import DatabaseService
+from hot_cache_service import HotSalesCache, live_ranges
+
+TODAY = date.today()
+
+
+def _sale(invoice_id, day, item, quantity, branch='MAIN', hour=9):
+    return {
+        'invoice_id': invoice_id, 'invoice_date': datetime.combine(day, datetime.min.time()) + timedelta(hours=hour),
+        'account_number': 'A1', 'item_number': item, 'description': item,
+        'quantity': quantity, 'extended_price': quantity * 2.5, 'branch': branch
+    }
+
+
+def expected(sales, start, end, branch=None):
+    rows = [
+        sale for sale in sales
+        if start <= sale['invoice_date'].date() <= end and (branch is None or sale['branch'] == branch)
+    ]
+    return {
+        'total_revenue': sum(sale['extended_price'] for sale in rows),
+        'total_transactions': len({sale['invoice_id'] for sale in rows}),
+        'items_sold': sum(int(sale['quantity']) for sale in rows)
+    }
+
+
+def summary(view, start, end, branch=None):
+    result = view.summary(start, end, branch)
+    return {key: result[key] for key in ('total_revenue', 'total_transactions', 'items_sold')}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseService(f"sqlite:///{tmp_path / 'hot.db'}")
+
+
+def test_live_ranges_are_contiguous_unstored_runs():
+    start = date(2025, 3, 1)
+    stored = {start + timedelta(days=n) for n in (0, 1, 4, 6)}
+    assert live_ranges(stored, start, start + timedelta(days=8)) == [
+        (start + timedelta(days=2), start + timedelta(days=3)),
+        (start + timedelta(days=5), start + timedelta(days=5)),
+        (start + timedelta(days=7), start + timedelta(days=8))
+    ]
+    assert live_ranges(stored, start, start + timedelta(days=1)) == []
+    assert live_ranges(set(), start, start) == [(start, start)]
+
+
+def test_load_then_incremental_refresh_matches_the_database(db):
+    sales = [
+        _sale(f'INV{n}', TODAY - timedelta(days=n % 10), f'SKU{n % 4}', float(n % 5 + 1), 'MAIN' if n % 3 else 'EAST')
+        for n in range(40)
+    ]
+    assert db.store_sales_data(sales[:30])
+    cache = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir='')
+    start = TODAY - timedelta(days=9)
+    assert summary(cache.refresh(), start, TODAY) == expected(sales[:30], start, TODAY)
+
+    assert db.store_sales_data(sales[30:])
+    view = cache.refresh()
+    assert view.row_count == len(sales)
+    assert summary(view, start, TODAY) == expected(sales, start, TODAY)
+    assert summary(view, start, TODAY, 'EAST') == expected(sales, start, TODAY, 'EAST')
+    # A refresh inside the lookback lag fetches the same rows again without double counting them
+    assert cache.refresh().row_count == len(sales)
+
+
+def test_days_missing_from_the_ledger_are_live_not_zero(db):
+    stored_day, missing_day = TODAY - timedelta(days=2), TODAY - timedelta(days=1)
+    assert db.store_sales_data([_sale('INV1', stored_day, 'SKU1', 2.0)])
+    view = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir='').refresh()
+    assert view.live_ranges(stored_day, TODAY) == [(missing_day, TODAY)]
+    assert summary(view, stored_day, TODAY)['total_revenue'] == 5.0
+
+
+def test_replaced_day_reloads_the_window(db):
+    day = TODAY - timedelta(days=3)
+    old = [_sale('INV1', day, 'SKU1', 4.0), _sale('INV2', day, 'SKU2', 6.0), _sale('INV3', TODAY, 'SKU1', 1.0)]
+    assert db.store_sales_data(old)
+    cache = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir='')
+    assert summary(cache.refresh(), day, day) == expected(old, day, day)
+
+    new = [_sale('INV2', day, 'SKU2', 3.0)]
+    assert db.replace_sales_day(day, new)
+    view = cache.refresh()
+    assert summary(view, day, day) == expected(new, day, day)
+    assert summary(view, day, TODAY) == expected(new + old[2:], day, TODAY)
+
+
+def test_workers_map_the_published_snapshot(db, tmp_path):
+    sales = [_sale(f'INV{n}', TODAY - timedelta(days=n % 5), 'SKU1', 1.0) for n in range(20)]
+    assert db.store_sales_data(sales[:10])
+    publisher = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir=str(tmp_path / 'snapshots'))
+    publisher.publish_snapshot()
+
+    assert db.store_sales_data(sales[10:])
+    worker = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir=str(tmp_path / 'snapshots'))
+    view = worker.refresh()
+    # The snapshot's rows are shared and only the newer rows are held privately
+    assert worker._snapshot is not None and worker._columns.size == 10
+    start = TODAY - timedelta(days=4)
+    assert summary(view, start, TODAY) == expected(sales, start, TODAY)
+
+
+def test_snapshot_published_before_a_replacement_is_skipped(db, tmp_path):
+    day = TODAY - timedelta(days=1)
+    assert db.store_sales_data([_sale('INV1', day, 'SKU1', 4.0), _sale('INV2', TODAY, 'SKU1', 1.0)])
+    HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir=str(tmp_path)).publish_snapshot()
+
+    new = [_sale('INV3', day, 'SKU1', 2.0)]
+    assert db.replace_sales_day(day, new)
+    worker = HotSalesCache(db, days=30, refresh_seconds=3600, snapshot_dir=str(tmp_path))
+    view = worker.refresh()
+    assert worker._snapshot is None
+    assert summary(view, day, day) == expected(new, day, day)
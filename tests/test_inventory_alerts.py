@@ -0,0 +1,71 @@
+# tests/test_inventory_alerts.py
+import json
+
+import pytest
+
+from database_service import DatabaseService, ALERT_SORTS
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db = DatabaseService(f"sqlite:///{tmp_path_factory.mktemp('alerts') / 'alerts.db'}")
+    inventory = []
+    for n in range(60):
+        for branch in ('MAIN', 'EAST'):
+            inventory.append({
+                'item_number': f'SKU{n:03d}', 'branch': branch, 'description': f'Item {n}',
+                # Few distinct values, so pages break inside runs of equal sort values
+                'qty_available': float(n % 4), 'qty_on_hand': float(n % 4),
+                'track_on_hand': n % 10 != 9
+            })
+    assert db.update_inventory_levels(inventory)
+    assert db.store_item_forecasts([
+        {'item_number': f'SKU{n:03d}', 'avg_daily_demand': 0.5 * (n % 3)} for n in range(0, 60, 2)
+    ])
+    assert db.refresh_days_of_supply()
+    return db
+
+
+def walk(db, branch, sort, descending, limit):
+    """Every page in turn, with each key passed through the JSON cursor encoding"""
+    items, after = [], None
+    while True:
+        page = db.get_inventory_alerts(branch, sort, descending, after, limit)
+        assert len(page['items']) <= limit
+        items.extend(page['items'])
+        if page['next'] is None:
+            return items
+        after = tuple(json.loads(json.dumps([sort, *page['next']]))[1:])
+
+
+@pytest.mark.parametrize('branch', ['MAIN', None])
+@pytest.mark.parametrize('sort', ALERT_SORTS)
+@pytest.mark.parametrize('descending', [False, True])
+def test_pages_cover_the_full_ordering_once(db, branch, sort, descending):
+    full = db.get_inventory_alerts(branch, sort, descending, None, 1000)['items']
+    assert full and db.get_inventory_alerts(branch, sort, descending, None, 1000)['next'] is None
+    keys = [(item[sort], item['item_number']) for item in full]
+    assert keys == sorted(keys, reverse=descending)
+    for limit in (1, 7, len(full)):
+        assert walk(db, branch, sort, descending, limit) == full
+
+
+def test_untracked_items_are_excluded(db):
+    items = db.get_inventory_alerts('MAIN', limit=1000)['items']
+    assert 'SKU009' not in {item['item_number'] for item in items}
+
+
+def test_all_branches_sum_stock(db):
+    items = {item['item_number']: item for item in db.get_inventory_alerts(None, limit=1000)['items']}
+    assert items['SKU003']['qty_available'] == 6.0
+
+
+def test_search_filters_pages(db):
+    items = walk(db, 'MAIN', 'qty_available', False, 2)
+    searched = db.get_inventory_alerts('MAIN', search='item 1', limit=1000)['items']
+    assert searched == [item for item in items if item['description'].lower().startswith('item 1')]
+
+
+def test_unknown_sort_is_rejected(db):
+    with pytest.raises(ValueError):
+        db.get_inventory_alerts('MAIN', sort='description')